@@ -7,9 +7,13 @@ for list of commands try, `tsar --help`
 import requests
 import click
 import os
+import time
 from subprocess import run
 
 PORT = 8137
+# seconds between job status requests, when following a job
+POLL_SECONDS = 0.5
+FINISHED_STATUSES = ("done", "failed", "cancelled")
 RUN_PATH = os.path.realpath(__file__)
 RUN_DIR = os.path.dirname(RUN_PATH)
 
@@ -65,17 +69,77 @@ def add(collection_id, document_id):
     click.echo()
 
 
+def format_progress(progress):
+    """Return one line summary of a job progress dict."""
+    if not progress:
+        return "starting..."
+    eta = "?" if progress["eta"] is None else f"{progress['eta']:.0f}s"
+    line = (
+        f"{progress['done']}/{progress['total']} docs "
+        f"({progress['failed']} failed), "
+        f"{progress['docs_per_sec']:.1f} docs/sec, eta {eta}"
+    )
+    return line
+
+
+def echo_job(job):
+    click.secho(f"job {job['job_id']}: {job['name']}", bold=True)
+    click.echo(f"status: {job['status']}  {format_progress(job['progress'])}")
+    if job["error"]:
+        click.echo(f"error: {job['error']}")
+
+
+def status_line(job):
+    """Return job status line, overwriting the current terminal line."""
+    return f"\r{job['status']}: {format_progress(job['progress'])}\033[K"
+
+
+def follow_job(job):
+    """Show progress of a job until it finishes; ctrl-c cancels the job."""
+    url = f"http://0.0.0.0:{PORT}/jobs/{job['job_id']}"
+    click.secho(f"job {job['job_id']}: {job['name']}", bold=True)
+    try:
+        while job["status"] not in FINISHED_STATUSES:
+            click.echo(status_line(job), nl=False)
+            time.sleep(POLL_SECONDS)
+            job = requests.get(url=url).json()
+    except KeyboardInterrupt:
+        click.echo("\ncancelling...")
+        job = requests.post(url=f"{url}/cancel").json()
+        # the job stops at its next progress report
+        while job["status"] not in FINISHED_STATUSES:
+            time.sleep(POLL_SECONDS)
+            job = requests.get(url=url).json()
+    click.echo(status_line(job))
+    if job["error"]:
+        click.echo(f"error: {job['error']}")
+    click.echo()
+
+
+def echo_or_follow(res, follow):
+    """Follow a job response (see follow_job), else echo the response."""
+    response = res.json()
+    if not isinstance(response, dict):
+        click.echo(response)
+        click.echo()
+    elif follow:
+        follow_job(response)
+    else:
+        click.echo(f"started job {response['job_id']}; see `tsar jobs`")
+        click.echo()
+
+
 @cli.command(help="Add documents to a collection from a source")
 @click.argument("collection_id")
 @click.argument("doctype")
 @click.argument("source_id")
-def add_source(collection_id, doctype, source_id):
+@click.option("--follow/--no-follow", default=True, help="show progress until done")
+def add_source(collection_id, doctype, source_id, follow):
     res = requests.post(
         url=f"http://0.0.0.0:8137/add_source/{collection_id}",
         json={"doctype": doctype, "source_id": source_id},
     )
-    click.echo(res.json())
-    click.echo()
+    echo_or_follow(res, follow)
 
 
 @cli.command(
@@ -84,12 +148,39 @@ def add_source(collection_id, doctype, source_id):
 @click.argument("collection_id")
 @click.argument("doctype")
 @click.argument("source_id")
-def rm_source(collection_id, doctype, source_id):
+@click.option("--follow/--no-follow", default=True, help="show progress until done")
+def rm_source(collection_id, doctype, source_id, follow):
     res = requests.post(
         url=f"http://0.0.0.0:8137/rm_source/{collection_id}",
         json={"doctype": doctype, "source_id": source_id},
     )
-    click.echo(res.json())
+    echo_or_follow(res, follow)
+
+
+@cli.command(help="Status of jobs (e.g. add_source), or follow one job")
+@click.argument("job_id", default="")
+def jobs(job_id):
+    if job_id:
+        res = requests.get(url=f"http://0.0.0.0:{PORT}/jobs/{job_id}")
+        if res.status_code == 404:
+            click.echo(res.json())
+            return
+        follow_job(res.json())
+        return
+    res = requests.get(url=f"http://0.0.0.0:{PORT}/jobs")
+    for job in res.json():
+        echo_job(job)
+    click.echo()
+
+
+@cli.command(help="Cancel a job")
+@click.argument("job_id")
+def cancel(job_id):
+    res = requests.post(url=f"http://0.0.0.0:{PORT}/jobs/{job_id}/cancel")
+    if res.status_code == 404:
+        click.echo(res.json())
+        return
+    echo_job(res.json())
     click.echo()
 
 
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+host-side file server for the tsar container (stdlib only).
+
+Serves files under --directory (default: home folder) like `python -m http.server`, and:
+- GET /_tree/<path>?ext=.md: recursive listing of files under path (a folder or file)
+  with stat metadata, streamed as newline-delimited json in one response:
+  {"path": <path relative to directory>, "st_atime", "st_mtime", "st_ctime", "st_size"}
+- POST /_bulk {"paths": [<path relative to directory>, ...]}: contents of many files,
+  streamed in one response.  Per path, a json header line {"path", "size"} followed by
+  size bytes of content, or {"path", "error"} if the file can't be read.
+
+usage: python3 file_server.py --bind 127.0.0.1 --directory $HOME
+"""
+import argparse
+import json
+import os
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+PORT = 8139
+TREE_ROUTE = "/_tree"
+BULK_ROUTE = "/_bulk"
+# listing entries per chunk of the streamed response
+TREE_CHUNK_ENTRIES = 500
+# bytes per chunk of streamed file content
+READ_CHUNK_BYTES = 256 * 1024
+
+
+def stat_meta(stat):
+    """Return file metadata dict from os.stat_result (as parse_lib.file_meta_data)."""
+    meta = {
+        "st_atime": stat.st_atime,
+        "st_mtime": stat.st_mtime,
+        "st_ctime": stat.st_ctime,
+        "st_size": stat.st_size,
+    }
+    return meta
+
+
+def walk_files(path, extensions=()):
+    """Yield (file path, os.stat_result) for files under path, recursively.
+
+    extensions: e.g. [".md"]; if empty, all files.  Symlinked folders aren't followed.
+    """
+    extensions = set(ext.lstrip(".") for ext in extensions)
+    if os.path.isfile(path):
+        yield path, os.stat(path)
+        return
+    folders = [path]
+    while folders:
+        folder = folders.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except (PermissionError, FileNotFoundError):
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(entry.path)
+                continue
+            if extensions and os.path.splitext(entry.name)[1][1:] not in extensions:
+                continue
+            try:
+                yield entry.path, entry.stat()
+            except FileNotFoundError:
+                continue
+
+
+class FileHandler(SimpleHTTPRequestHandler):
+    """Static file handler with streamed listing and bulk content endpoints."""
+
+    # keep-alive, so clients can reuse connections
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == TREE_ROUTE or url.path.startswith(TREE_ROUTE + "/"):
+            self.send_tree(url)
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        if urlsplit(self.path).path == BULK_ROUTE:
+            self.send_bulk()
+        else:
+            self.send_error(404, "File not found")
+
+    def _local_path(self, rel_path):
+        """Return local path of a path relative to the served directory, else None."""
+        root = os.path.abspath(self.directory)
+        path = os.path.abspath(os.path.join(root, rel_path.lstrip("/")))
+        inside_root = path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+        return path if inside_root else None
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def send_tree(self, url):
+        root = os.path.abspath(self.directory)
+        path = self._local_path(unquote(url.path[len(TREE_ROUTE) :]))
+        if path is None or not os.path.exists(path):
+            self.send_error(404, "File not found")
+            return
+        extensions = parse_qs(url.query).get("ext", [])
+
+        self._start_stream("application/x-ndjson")
+        lines = []
+        for file_path, stat in walk_files(path, extensions):
+            entry = {"path": os.path.relpath(file_path, root), **stat_meta(stat)}
+            lines.append(json.dumps(entry) + "\n")
+            if len(lines) >= TREE_CHUNK_ENTRIES:
+                self._write_chunk("".join(lines).encode())
+                lines = []
+        if lines:
+            self._write_chunk("".join(lines).encode())
+        self.wfile.write(b"0\r\n\r\n")
+
+    def send_bulk(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            paths = json.loads(self.rfile.read(length))["paths"]
+        except (ValueError, KeyError):
+            self.send_error(400, "expected json body: {'paths': [...]}")
+            return
+
+        self._start_stream("application/octet-stream")
+        for rel_path in paths:
+            path = self._local_path(rel_path)
+            try:
+                if path is None:
+                    raise FileNotFoundError(rel_path)
+                fp = open(path, "rb")
+            except OSError as e:
+                header = {"path": rel_path, "error": str(e)}
+                self._write_chunk(json.dumps(header).encode() + b"\n")
+                continue
+            with fp:
+                size = os.fstat(fp.fileno()).st_size
+                header = {"path": rel_path, "size": size}
+                self._write_chunk(json.dumps(header).encode() + b"\n")
+                remaining = size
+                while remaining > 0:
+                    chunk = fp.read(min(READ_CHUNK_BYTES, remaining))
+                    if not chunk:
+                        # truncated since fstat; pad to the announced size
+                        chunk = b"\0" * remaining
+                    self._write_chunk(chunk)
+                    remaining -= len(chunk)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def serve(bind="127.0.0.1", port=PORT, directory=None):
+    directory = directory or os.path.expanduser("~")
+    handler = partial(FileHandler, directory=directory)
+    with ThreadingHTTPServer((bind, port), handler) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--bind", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--directory", default=os.path.expanduser("~"))
+    args = parser.parse_args()
+    serve(bind=args.bind, port=args.port, directory=args.directory)
@@ -9,7 +9,7 @@ nargs="$#"
 if ! [ "$(docker ps -f "name=$container" --format '{{.Names}}')" = "$container" ]; then
 echo "starting tsar..."
 (cd $tsar_folder && docker compose up -d app && \
-python3 -m http.server 8139 --bind 127.0.0.1 --directory $HOME &)
+python3 "$tsar_folder/file_server.py" --port 8139 --bind 127.0.0.1 --directory $HOME &)
 fi
 
 # if tsar already running, no args provided, attach to container
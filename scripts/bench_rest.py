@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Load test of the tsar REST CLI server (run with the app running).
+
+Requests are sent from concurrent clients, each keeping its connection alive, and
+throughput and latency percentiles are reported per endpoint:
+- GET /collection_info
+- GET /search/<collection>?q=<query>
+- POST /add_doc/<collection> (only with --document-id; re-adds the same document)
+
+usage: python3 scripts/bench_rest.py pkb --query "attention" --clients 8 --requests 200
+"""
+import argparse
+import threading
+import time
+import requests
+
+BASE_URL = "http://0.0.0.0:8137"
+
+
+def percentile(values, q):
+    """Return the q-quantile (0 <= q <= 1) of values, nearest rank."""
+    values = sorted(values)
+    return values[round(q * (len(values) - 1))]
+
+
+def run_client(request_func, n_requests, latencies, errors):
+    """Send n_requests with one (keep-alive) session; record latencies (seconds)."""
+    with requests.Session() as session:
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            try:
+                res = request_func(session)
+                res.raise_for_status()
+            except requests.RequestException:
+                errors.append(1)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+
+def bench(name, request_func, n_clients, n_requests):
+    """Run n_clients concurrent clients, n_requests each; print a summary line."""
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(
+            target=run_client, args=(request_func, n_requests, latencies, errors)
+        )
+        for _ in range(n_clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        print(f"{name:<20} all {len(errors)} requests failed")
+        return
+    p50, p95 = percentile(latencies, 0.5), percentile(latencies, 0.95)
+    print(
+        f"{name:<20} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {1000 * p50:7.1f} ms  p95 {1000 * p95:7.1f} ms  "
+        f"errors {len(errors)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("collection_id")
+    parser.add_argument("--query", default="*")
+    parser.add_argument("--document-id", default=None)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="per client")
+    parser.add_argument("--url", default=BASE_URL)
+    args = parser.parse_args()
+
+    url = args.url
+    endpoints = {
+        "collection_info": lambda s: s.get(f"{url}/collection_info"),
+        "search": lambda s: s.get(
+            f"{url}/search/{args.collection_id}", params={"q": args.query}
+        ),
+    }
+    if args.document_id:
+        endpoints["add_doc"] = lambda s: s.post(
+            f"{url}/add_doc/{args.collection_id}",
+            json={"document_id": args.document_id},
+        )
+    print(f"{args.clients} clients x {args.requests} requests")
+    for name, request_func in endpoints.items():
+        bench(name, request_func, args.clients, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from types import SimpleNamespace
+from tsar.app.rest import return_flask_app
+
+
+class FakeCollection(object):
+    def query_page(self, query_str, primary_docs_only=True, size=10, after=None):
+        return {"doc": 1.0}, [1.0, "doc"]
+
+
+def test_search_invalid_after():
+    tsar_app = SimpleNamespace(state={"collections": {"test": FakeCollection()}})
+    client = return_flask_app(tsar_app).test_client()
+    res = client.get("/search/test", query_string={"q": "bert", "after": "[1.0, "})
+    assert res.status_code == 400
+    res = client.get("/search/test", query_string={"q": "bert", "after": "[1.0]"})
+    assert res.get_json()["after"] == [1.0, "doc"]
@@ -0,0 +1,87 @@
+import threading
+import time
+import pytest
+import requests
+from flask import Flask
+from tsar.app.server import RestServer
+
+
+@pytest.fixture
+def server():
+    app = Flask(__name__)
+    release = threading.Event()
+
+    @app.route("/fast")
+    def fast():
+        return "fast"
+
+    @app.route("/post", methods=["POST"])
+    def post():
+        # request body left unread
+        return "posted"
+
+    @app.route("/slow")
+    def slow():
+        release.wait(timeout=5)
+        return "slow"
+
+    server = RestServer(app, "127.0.0.1", 0, workers=4, request_timeout=1)
+    server.release = release
+    server.start()
+    yield server
+    release.set()
+    server.stop()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.port}{path}"
+
+
+def test_concurrent_requests(server):
+    slow = {}
+    thread = threading.Thread(
+        target=lambda: slow.update(res=requests.get(url(server, "/slow")))
+    )
+    thread.start()
+    # a slow request doesn't hold up others
+    start = time.time()
+    assert requests.get(url(server, "/fast")).text == "fast"
+    assert time.time() - start < 1
+    server.release.set()
+    thread.join()
+    assert slow["res"].text == "slow"
+
+
+def test_keep_alive(server):
+    accepted = []
+    process_request = server.server.process_request
+
+    def count_request(request, client_address):
+        accepted.append(client_address)
+        process_request(request, client_address)
+
+    server.server.process_request = count_request
+    with requests.Session() as session:
+        for _ in range(3):
+            assert session.post(url(server, "/post"), data="x" * 1000).text == "posted"
+            res = session.get(url(server, "/fast"))
+            assert res.text == "fast"
+        assert res.headers.get("Connection", "").lower() != "close"
+    # one connection for all requests, unread request bodies are drained
+    assert len(accepted) == 1
+
+
+def test_graceful_stop(server):
+    slow = {}
+    thread = threading.Thread(
+        target=lambda: slow.update(res=requests.get(url(server, "/slow")))
+    )
+    thread.start()
+    time.sleep(0.2)
+    threading.Timer(0.2, server.release.set).start()
+    # the request in progress finishes, new connections are refused
+    server.stop()
+    thread.join()
+    assert slow["res"].text == "slow"
+    with pytest.raises(requests.ConnectionError):
+        requests.get(url(server, "/fast"), timeout=1)
@@ -1,4 +1,8 @@
-from tsar.doctypes.arxiv_doc import ArxivDoc
+from tsar.doctypes.arxiv_doc import (
+    ArxivDoc,
+    gen_arxiv_record_from_result,
+    parse_arxiv_feed,
+)
 from tsar.doctypes.doctype import DocType
 from tests.resources.parsed_docs import PARSED_ARXIV_DOC
 
@@ -15,3 +19,39 @@ def test_gen_record():
     """Verify record generation matches expected output."""
     record = ArxivDoc.gen_record(ARIXV_DOC_ID, primary_doc=True, gen_links=True)
     assert PARSED_ARXIV_DOC == record
+
+
+ARXIV_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <id>http://arxiv.org/abs/1311.5600v1</id>
+    <published>2013-11-21T22:24:37Z</published>
+    <title>Model for the Atomic Dielectric Response in Time Dependent Laser
+  Fields</title>
+    <summary>  A nonlocal quantum model is presented for calculating the atomic dielectric
+response to a strong laser electric field. By replacing the Coulomb potential
+with a nonlocal potential in the Schrodinger equation, a 3+1D calculation of the
+time-dependent electric dipole moment can be replaced with a 0+1D integral
+equation, offering significant computational savings. The model is benchmarked
+against an established ionization model and \\textit{ab initio} simulation of
+the time-dependent Schrodinger equation. The reduced computational overhead makes the
+model a promising candidate to incorporate full quantum mechanical time dynamics
+in laser pulse propagation simulations.
+</summary>
+    <author><name>T. C. Rensink</name></author>
+    <author><name>T. M. Antonsen Jr.</name></author>
+    <author><name>J. P. Palastro</name></author>
+    <author><name>D. Gordon</name></author>
+  </entry>
+</feed>
+"""
+
+
+def test_parse_arxiv_feed():
+    """Verify api response parsing without a network call."""
+    (result,) = parse_arxiv_feed(ARXIV_FEED)
+    record = gen_arxiv_record_from_result(result, primary_doc=True)
+    assert record["document_id"] == PARSED_ARXIV_DOC["document_id"]
+    assert record["document_name"] == PARSED_ARXIV_DOC["document_name"]
+    assert record["authors"] == PARSED_ARXIV_DOC["authors"]
+    assert record["content"] == PARSED_ARXIV_DOC["content"]
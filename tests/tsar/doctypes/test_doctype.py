@@ -0,0 +1,42 @@
+from tsar.doctypes.doctype import DocTypeManager
+
+
+class FakeDocType(object):
+    """Doctype stub: valid ids have a given suffix and are in `existing`."""
+
+    def __init__(self, name, suffix, existing):
+        self.__name__ = name
+        self.suffix = suffix
+        self.existing = existing
+        self.exist_calls = []
+
+    def is_candidate(self, document_id):
+        return document_id.endswith(self.suffix)
+
+    def exist(self, document_ids):
+        self.exist_calls.append(list(document_ids))
+        return [document_id in self.existing for document_id in document_ids]
+
+
+def test_return_doctypes():
+    note = FakeDocType("NoteDoc", ".md", existing={"a.md", "b.md"})
+    page = FakeDocType("PageDoc", "", existing={"a.md", "c.html"})
+    mgr = DocTypeManager({"NoteDoc": note, "PageDoc": page})
+
+    doctypes = mgr.return_doctypes(["a.md", "b.md", "c.html", "d.md", "e.txt"])
+    assert doctypes == {
+        "a.md": note,
+        "b.md": note,
+        "c.html": page,
+        "d.md": None,
+        "e.txt": None,
+    }
+    # one batch per doctype; doctypes tried in order
+    assert note.exist_calls == [["a.md", "b.md", "d.md"]]
+    assert page.exist_calls == [["c.html", "d.md", "e.txt"]]
+
+    # resolved ids are memoized; failed existence checks are retried
+    mgr.return_doctypes(["a.md", "c.html", "d.md"])
+    assert note.exist_calls[-1] == ["d.md"]
+    assert page.exist_calls[-1] == ["d.md"]
+    assert mgr.return_doctype("b.md") is note
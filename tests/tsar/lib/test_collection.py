@@ -1,4 +1,5 @@
 import os
+import threading
 import pandas as pd
 import pathlib
 from pathlib import Path
@@ -8,6 +9,8 @@ from tsar.lib.collection import Data, Register, REGISTER_PATH
 from tsar.lib.collection import Collection as ProdCollection
 from tsar import TESTS_FOLDER, COLLECTIONS_FOLDER
 from tsar.doctypes import DOCTYPES
+from tsar.lib import search
+from tsar.lib.manifest import SourceManifest
 
 
 @pytest.fixture
@@ -103,6 +106,84 @@ def test_data_read_write(tmpdir, data):
     assert data.df.equals(data2.df)
 
 
+def test_data_log_replay(tmpdir, data, arxiv_record2):
+    path = str(tmpdir.join("test_db_log.pkl"))
+    data.write(path)
+    # changes after a write are appended to the record log, not the snapshot
+    data.update_record(arxiv_record2)
+    data.rm_record(data.df.index[0])
+    assert data.log.n_entries == 2
+
+    data2 = Data.read(path)
+    assert data.df.equals(data2.df)
+
+
+def test_data_log_replay_compacted(tmpdir, data, arxiv_record2):
+    path = str(tmpdir.join("test_db_log.arrow"))
+    data.write(path)
+    data.update_record(arxiv_record2)
+    data.rm_record(data.df.index[0])
+    # crash after the snapshot is replaced, before the log is truncated
+    entries = open(data.log.path, "rb").read()
+    data.write(path)
+    with open(data.log.path, "wb") as fp:
+        fp.write(entries)
+
+    data2 = Data.read(path)
+    assert data.df.equals(data2.df)
+
+
+def test_data_lazy_columns(tmpdir, data, arxiv_record1):
+    path = str(tmpdir.join("test_db.arrow"))
+    data.write(path)
+    data2 = Data.read(path, lazy_columns=("content",))
+    assert "content" not in data2.select(["document_type", "links"]).columns
+    assert data2.return_record(arxiv_record1["document_id"]) == arxiv_record1
+    assert data.df.equals(data2.df)
+
+
+def test_data_lazy_log_replay(tmpdir, data, arxiv_record1, arxiv_record2):
+    path = str(tmpdir.join("test_db.arrow"))
+    data.write(path)
+    data.update_record(arxiv_record2)
+    data.rm_record(arxiv_record1["document_id"])
+
+    # replayed changes don't load lazy columns
+    data2 = Data.read(path, lazy_columns=("content",))
+    assert "content" not in data2._df.columns
+    assert data2.return_record(arxiv_record2["document_id"]) == arxiv_record2
+    assert data2.value_bytes("content").to_dict() == {
+        arxiv_record2["document_id"]: len(arxiv_record2["content"])
+    }
+    assert data.df.equals(data2.df)
+
+
+def test_data_write_lazy(tmpdir, data, arxiv_record1, arxiv_record2):
+    path = str(tmpdir.join("test_db.arrow"))
+    data.write(path)
+    # written values of lazy columns are released, and read when used
+    assert "content" not in data._df.columns
+    data.update_record(arxiv_record2)
+    data.write(path)
+    assert "content" not in data._df.columns
+    assert data.return_record(arxiv_record2["document_id"]) == arxiv_record2
+
+    data2 = Data.read(path)
+    data2.rm_record(arxiv_record1["document_id"])
+    data2.write(path)
+    assert "content" not in data2._df.columns
+    assert Data.read(path).df.equals(data2.df)
+
+
+def test_data_migrate_pickle(tmpdir, data):
+    path = str(tmpdir.join("records.pkl"))
+    data.df.to_pickle(path)
+    data2 = Data.read(path)
+    assert data2.path == str(tmpdir.join("records.arrow"))
+    assert not os.path.exists(path)
+    assert data.df.equals(Data.read(data2.path).df)
+
+
 def test_data_drop(tmpdir, data):
     path = str(tmpdir.join("test_db2.pkl"))
     data.write(path)
@@ -111,6 +192,22 @@ def test_data_drop(tmpdir, data):
     assert not os.path.exists(path)
 
 
+def test_data_drop_migrated(tmpdir, data):
+    path = str(tmpdir.join("records.pkl"))
+    data.df.to_pickle(path)
+    data2 = Data.read(path)
+    data2.update_record(data2.return_record(data2.index[0]))
+    # a legacy path in the register; its snapshot was migrated
+    Data.drop(path)
+    assert os.listdir(str(tmpdir)) == []
+
+    other_path = str(tmpdir.join("notes.pkl"))
+    with open(other_path, "w") as fp:
+        fp.write("not records")
+    Data.drop(other_path)
+    assert os.path.exists(other_path)
+
+
 def test_data_update_record(arxiv_record1, arxiv_record2):
     df = pd.DataFrame(data=[arxiv_record1]).set_index("document_id", drop=True)
     data = Data(df)
@@ -146,8 +243,72 @@ def test_register_init(register_path):
 
 def test_register_read_df(register):
     df = register.read_df()
-    df2 = pd.read_pickle(register.path)
-    assert df.equals(df2)
+    assert df.empty and list(df.columns) == list(register.schema)
+    register.add(
+        {
+            "collection_id": "test_collection",
+            "records_db_path": "records",
+            "config_path": "config.json",
+            "search_indices": ["index"],
+        }
+    )
+    df = register.read_df()
+    assert df.index.to_list() == ["test_collection"]
+    assert df.loc["test_collection", "search_indices"] == ["index"]
+
+
+def test_register_cache(register_path):
+    # registers sharing a file see each other's changes
+    register = Register(path=register_path)
+    register2 = Register(path=register_path)
+    assert register2.collection_ids() == []
+    register.add(
+        {
+            "collection_id": "test_collection",
+            "records_db_path": "records",
+            "config_path": "config.json",
+            "search_indices": [],
+        }
+    )
+    assert register2.collection_ids() == ["test_collection"]
+    register2.update("test_collection", summary="{}")
+    assert register.return_record("test_collection")["summary"] == "{}"
+    # returned records are copies
+    register.return_record("test_collection")["summary"] = None
+    assert register.return_record("test_collection")["summary"] == "{}"
+
+
+def test_register_order(register):
+    for collection_id in ["b", "a", "c"]:
+        register.add(
+            {
+                "collection_id": collection_id,
+                "records_db_path": "records",
+                "config_path": "config.json",
+                "search_indices": [],
+            }
+        )
+    # updates (e.g. summaries) keep registration order
+    register.update("b", summary="{}")
+    assert register.collection_ids() == ["b", "a", "c"]
+    assert Register(path=register.path).collection_ids() == ["b", "a", "c"]
+
+
+def test_register_migrate_legacy(register_path):
+    legacy_path = os.path.splitext(register_path)[0] + ".pkl"
+    df = pd.DataFrame(
+        columns=["records_db_path", "config_path", "search_indices", "summary"]
+    )
+    df.index.name = "collection_id"
+    df.loc["test_collection"] = ["records", "config.json", ["index"], float("nan")]
+    df.to_pickle(legacy_path)
+
+    register = Register(path=register_path)
+    assert register.return_record("test_collection") == {
+        "records_db_path": "records",
+        "config_path": "config.json",
+        "search_indices": ["index"],
+    }
 
 
 def test_register_add_exists(register, tmpdir):
@@ -280,3 +441,506 @@ def test_add_document_remove_record(Collection, register, arxiv_record1, arxiv_r
     coll.remove_record(resolved_id)
     assert coll.records_db.df.shape[0] == 0
     assert coll.query_records("*") == {}
+
+
+class BulkClient(object):
+    """Search client stand-in recording bulk index actions."""
+
+    def __init__(self):
+        self.actions = []
+        self.refresh_intervals = []
+
+    def bulk(self, actions):
+        self.actions.extend(actions)
+        return {"succeeded": len(actions), "failed": {}}
+
+    def set_refresh_interval(self, index_name, interval):
+        self.refresh_intervals.append((index_name, interval))
+
+    def refresh(self, index_name):
+        pass
+
+
+def test_reindex_dependents(monkeypatch, arxiv_record1, arxiv_record2):
+    client = BulkClient()
+    monkeypatch.setattr(ProdCollection, "client", client)
+    doc_types = [DOCTYPES["ArxivDoc"]]
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    configd = {"doc_types": ["ArxivDoc"]}
+    coll = ProdCollection("test", doc_types, records_db, configd)
+    coll.search_indices = []
+    link_id = arxiv_record1["document_id"]
+    primary_id = arxiv_record2["document_id"]
+
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": False}, False)
+        coll.add_record({**arxiv_record2, "primary_doc": True}, True)
+    assert [action[2] for action in client.actions] == [link_id, primary_id]
+    assert coll.backlinks(link_id) == [primary_id]
+
+    # linked content changed: the primary document is re-indexed with it
+    client.actions.clear()
+    link_record = {**arxiv_record1, "primary_doc": False, "content": "new content"}
+    with coll.bulk_indexing():
+        coll.add_record(link_record, False)
+    assert [action[2] for action in client.actions] == [link_id, primary_id]
+    assert "new content" in str(client.actions[1][3])
+
+    # unchanged content: no re-indexing
+    client.actions.clear()
+    with coll.bulk_indexing():
+        coll.add_record(link_record, False)
+    assert [action[2] for action in client.actions] == [link_id]
+
+
+def test_reindex_records(monkeypatch, arxiv_record1, arxiv_record2):
+    class ReindexClient(BulkClient):
+        """Records index version calls; new versions are _v2."""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        def new_index_version(self, index_name, mapping, alias=None):
+            self.calls.append(("new", index_name))
+            return f"{index_name}_v2"
+
+        def swap_alias(self, alias, index_name):
+            self.calls.append(("swap", alias, index_name))
+            return [f"{alias}_v1"]
+
+        def drop_index(self, index_name):
+            self.calls.append(("drop", index_name))
+
+        def drop_old_versions(self, index_name):
+            self.calls.append(("drop_old", index_name))
+            return []
+
+    client = ReindexClient()
+    monkeypatch.setattr(ProdCollection, "client", client)
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = []
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": True}, False)
+    client.actions.clear()
+    added = {**arxiv_record2, "primary_doc": True}
+    submitted = []
+    bulk = client.bulk
+
+    def bulk_adding(actions):
+        # e.g. add_doc during the rebuild: applied by the writer after the swap
+        if not submitted:
+            submitted.append(coll.writer.submit(coll.add_record, added, False))
+        return bulk(list(actions))
+
+    monkeypatch.setattr(client, "bulk", bulk_adding)
+    coll._reindex_records()
+    submitted[0].result(timeout=5)
+    coll.close()
+
+    # tmp_ collection: versions are named after the tmp_ alias
+    alias = "tmp_test__arxivdoc"
+    assert client.calls == [
+        ("new", alias),
+        ("swap", alias, f"{alias}_v2"),
+        ("drop", f"{alias}_v1"),
+        ("drop_old", alias),
+    ]
+    assert [action[1:3] for action in client.actions] == [
+        (f"{alias}_v2", arxiv_record1["document_id"]),
+        (alias, added["document_id"]),
+    ]
+
+
+def test_collection_writer(monkeypatch, arxiv_record1, arxiv_record2):
+    client = BulkClient()
+    monkeypatch.setattr(ProdCollection, "client", client)
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = []
+    records = [
+        {**arxiv_record1, "primary_doc": False},
+        {**arxiv_record2, "primary_doc": True},
+    ]
+    # changes from several threads are applied by the writer, indexed in bulk
+    threads = [
+        threading.Thread(target=coll.writer.call, args=(coll.add_record, r, False))
+        for r in records
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coll.close()
+    assert sorted(coll.records_db.index) == sorted(r["document_id"] for r in records)
+    assert sorted(action[2] for action in client.actions) == sorted(
+        r["document_id"] for r in records
+    )
+
+
+def test_collection_add_during_ingest(monkeypatch, arxiv_record1, arxiv_record2):
+    client = BulkClient()
+    monkeypatch.setattr(ProdCollection, "client", client)
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = []
+    fetching = threading.Event()
+    fetched = threading.Event()
+    ingested = {**arxiv_record2, "primary_doc": True}
+
+    def gen_from_source(source_id):
+        return [ingested["document_id"]]
+
+    def gen_document_records(document_id, doc_type=None, primary_ids=None):
+        fetching.set()
+        fetched.wait(timeout=5)
+        return [ingested]
+
+    monkeypatch.setattr(DOCTYPES["ArxivDoc"], "gen_from_source", gen_from_source)
+    monkeypatch.setattr(coll, "gen_document_records", gen_document_records)
+    # e.g. an add_source job: fetching runs in the job thread, not the writer
+    job = threading.Thread(target=coll.add_from_source, args=("ArxivDoc", "source"))
+    job.start()
+    assert fetching.wait(timeout=5)
+    added = {**arxiv_record1, "primary_doc": True}
+    coll.writer.submit(coll.add_record, added, False).result(timeout=5)
+    assert coll.return_record(added["document_id"]) is not None
+    assert coll.return_record(ingested["document_id"]) is None
+
+    fetched.set()
+    job.join()
+    coll.close()
+    assert sorted(coll.records_db.index) == sorted(
+        [added["document_id"], ingested["document_id"]]
+    )
+    assert [action[2] for action in client.actions] == [
+        added["document_id"],
+        ingested["document_id"],
+    ]
+
+
+def test_collection_assets(
+    monkeypatch, Collection, tmpdir, arxiv_record1, arxiv_record2
+):
+    monkeypatch.setattr(ProdCollection, "client", BulkClient())
+    path = str(tmpdir.join("records.arrow"))
+    coll_record = {
+        "collection_id": "assets",
+        "records_db_path": path,
+        "config_path": str(tmpdir.join("config.json")),
+        "search_indices": [],
+    }
+    Collection._register.add(dict(coll_record))
+    doc_types, configd = [DOCTYPES["ArxivDoc"]], {"doc_types": ["ArxivDoc"]}
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = Collection("assets", doc_types, records_db, configd)
+    coll.records_db_path, coll.search_indices = path, []
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": False}, False)
+    coll.write()
+    # committed to the record log only
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record2, "primary_doc": True}, False)
+    coll.commit()
+
+    def build(*args):
+        raise AssertionError("not current")
+
+    # stats are current; the link graph is updated with the log entries since written
+    monkeypatch.setattr(tsar.lib.collection.CollectionStats, "build", build)
+    monkeypatch.setattr(tsar.lib.collection.LinkGraph, "build", build)
+    coll2 = Collection("assets", doc_types, Data.read(path), configd)
+    coll2.records_db_path = path
+    assert coll2.stats.summary() == coll.stats.summary()
+    assert coll2.backlinks(arxiv_record1["document_id"]) == [
+        arxiv_record2["document_id"]
+    ]
+    assert "content" not in coll2.records_db._df.columns
+
+
+def lock_free(lock):
+    """Return True if another thread can acquire lock."""
+    acquired = []
+
+    def acquire():
+        if lock.acquire(timeout=1):
+            acquired.append(True)
+            lock.release()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    thread.join()
+    return bool(acquired)
+
+
+def test_collection_unlocked_writes(
+    monkeypatch, Collection, tmpdir, arxiv_record1, arxiv_record2
+):
+    path = str(tmpdir.join("records.arrow"))
+    Collection._register.add(
+        {
+            "collection_id": "unlocked",
+            "records_db_path": path,
+            "config_path": str(tmpdir.join("config.json")),
+            "search_indices": [],
+        }
+    )
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = Collection("unlocked", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.records_db_path, coll.search_indices = path, []
+    locks_free = []
+
+    class LockClient(BulkClient):
+        def bulk(self, actions):
+            locks_free.append(lock_free(coll.lock))
+            return super().bulk(actions)
+
+        def index_record(self, document_id, record_index, index_name):
+            self.actions.append(("index", index_name, document_id, record_index))
+
+    # full batches are sent without holding the lock, e.g. for the summary
+    monkeypatch.setattr(ProdCollection, "client", LockClient())
+    monkeypatch.setattr(search, "BULK_BATCH_SIZE", 1)
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": True}, False)
+        assert locks_free == [True]
+    assert len(coll.client.actions) == 1
+
+    # snapshots are written from a copy; changes made meanwhile are kept in the log
+    write_snapshot = tsar.lib.collection.write_snapshot
+    added = {**arxiv_record2, "primary_doc": True}
+
+    def write_changing(*args, **kwargs):
+        locks_free.append(lock_free(coll.lock))
+        thread = threading.Thread(target=coll.add_record, args=(added, False))
+        thread.start()
+        thread.join()
+        return write_snapshot(*args, **kwargs)
+
+    monkeypatch.setattr(tsar.lib.collection, "write_snapshot", write_changing)
+    locks_free.clear()
+    coll.write()
+    assert locks_free == [True]
+    assert coll.records_db.log.n_entries == 1
+    assert "content" not in coll.records_db._df.columns
+    assert coll.return_record(added["document_id"])["content"] == added["content"]
+    data = Data.read(path)
+    assert sorted(data.index) == sorted(
+        [arxiv_record1["document_id"], added["document_id"]]
+    )
+    assert data.return_record(added["document_id"])["content"] == added["content"]
+
+
+@pytest.fixture
+def synced(monkeypatch, Collection, tmpdir):
+    """Return (registered markdown collection, notes folder with a.md and b.md)."""
+    monkeypatch.setattr(ProdCollection, "client", BulkClient())
+    # the notes are local: check they exist without the file server
+    def files_exist(paths):
+        return [os.path.exists(path) for path in paths]
+
+    monkeypatch.setattr(tsar.lib.parse_lib, "files_exist", files_exist)
+    path = str(tmpdir.join("records.arrow"))
+    config_path = str(tmpdir.join("config.json"))
+    Collection._register.add(
+        {
+            "collection_id": "synced",
+            "records_db_path": path,
+            "config_path": config_path,
+            "search_indices": [],
+        }
+    )
+    doc_types = [DOCTYPES["MarkdownDoc"]]
+    records_db = Data.new(DOCTYPES["MarkdownDoc"].schema)
+    coll = Collection("synced", doc_types, records_db, {"doc_types": ["MarkdownDoc"]})
+    coll.records_db_path, coll.config_path, coll.search_indices = path, config_path, []
+    folder = tmpdir.mkdir("notes")
+    folder.join("a.md").write("note a")
+    folder.join("b.md").write("note b")
+    return coll, folder
+
+
+def test_sync_from_source(synced):
+    coll, folder = synced
+    source_id = str(folder)
+    a_id, b_id = str(folder.join("a.md")), str(folder.join("b.md"))
+    summary = coll.sync_from_source("MarkdownDoc", source_id)
+    assert (summary["added"], summary["changed"], summary["unchanged"]) == (2, 0, 0)
+    assert sorted(coll.records_db.index) == sorted([a_id, b_id])
+    manifest = coll.source_manifest("MarkdownDoc", source_id)
+    assert sorted(manifest.entries) == sorted([a_id, b_id])
+
+    # unchanged (mtime, size): skipped without parsing or indexing
+    n_actions = len(coll.client.actions)
+    summary = coll.sync_from_source("MarkdownDoc", source_id)
+    assert (summary["added"], summary["changed"], summary["unchanged"]) == (0, 0, 2)
+    assert summary["total"] == 0
+    assert len(coll.client.actions) == n_actions
+
+    # touched with the same content: parsed, but unchanged by content hash
+    stat = os.stat(a_id)
+    os.utime(a_id, (stat.st_atime, stat.st_mtime + 10))
+    summary = coll.sync_from_source("MarkdownDoc", source_id)
+    assert (summary["changed"], summary["unchanged"]) == (0, 2)
+    assert summary["total"] == 1
+    assert len(coll.client.actions) == n_actions
+    assert manifest.entries[a_id]["meta"]["st_mtime"] == stat.st_mtime + 10
+
+    # removed from the source: removed from the records and the manifest
+    os.remove(b_id)
+    summary = coll.sync_from_source("MarkdownDoc", source_id)
+    assert summary["removed"] == 1
+    assert list(coll.records_db.index) == [a_id]
+    assert list(manifest.entries) == [a_id]
+    assert coll.client.actions[-1][0] == "delete"
+    manifest_path = coll._manifest_path("MarkdownDoc", source_id)
+    assert list(SourceManifest.read(manifest_path).entries) == [a_id]
+
+
+def test_sync_documents_failed_commit(monkeypatch, synced):
+    coll, folder = synced
+    source_id = str(folder)
+    a_id, b_id = str(folder.join("a.md")), str(folder.join("b.md"))
+    commit_document_records = coll.commit_document_records
+
+    def commit_failing(records, **kwargs):
+        if records[-1]["document_id"] == a_id:
+            raise OSError("disk full")
+        return commit_document_records(records, **kwargs)
+
+    metas = DOCTYPES["MarkdownDoc"].scan_source(source_id)
+    monkeypatch.setattr(coll, "commit_document_records", commit_failing)
+    summary = coll.sync_documents("MarkdownDoc", source_id, metas)
+    assert (summary["added"], summary["failed"]) == (1, 1)
+    manifest = coll.source_manifest("MarkdownDoc", source_id)
+    assert list(manifest.entries) == [b_id]
+
+    # not in the manifest, so synced again
+    monkeypatch.setattr(coll, "commit_document_records", commit_document_records)
+    summary = coll.sync_documents("MarkdownDoc", source_id, metas)
+    assert (summary["added"], summary["unchanged"]) == (1, 1)
+    assert sorted(manifest.entries) == sorted([a_id, b_id])
+    assert a_id in coll.records_db.index
+
+
+def test_collection_close_unloaded_stats(monkeypatch, Collection, arxiv_record1):
+    Collection._register.add(
+        {
+            "collection_id": "closed",
+            "records_db_path": "records",
+            "config_path": "config",
+            "search_indices": [],
+        }
+    )
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = Collection("closed", [DOCTYPES["ArxivDoc"]], records_db, {})
+
+    def build(*args):
+        raise AssertionError("stats built at close")
+
+    monkeypatch.setattr(tsar.lib.collection.CollectionStats, "build", build)
+    coll.close()
+    assert Collection.registered_summary("closed") is None
+
+
+def test_bulk_indexing_refresh(monkeypatch, arxiv_record1):
+    client = BulkClient()
+    monkeypatch.setattr(ProdCollection, "client", client)
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = ["index"]
+    # e.g. an ingest applied by the writer: refresh is off until the batch is sent
+    with coll.bulk_indexing(refresh=True):
+        assert client.refresh_intervals == []
+        with coll.bulk_indexing():
+            coll.add_record({**arxiv_record1, "primary_doc": True}, False)
+        assert client.refresh_intervals == [("index", "-1")]
+    assert client.refresh_intervals == [("index", "-1"), ("index", None)]
+
+
+def test_query_cache(monkeypatch, arxiv_record1):
+    monkeypatch.setattr(ProdCollection, "client", BulkClient())
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = []
+    queries = []
+
+    def raw_query(query_str, **query_kwargs):
+        queries.append(query_str)
+        return {"hits": {"hits": [{"_id": "doc", "_score": 1.0, "sort": [1.0]}]}}
+
+    monkeypatch.setattr(coll, "_raw_query", raw_query)
+    assert coll.query_records("q", primary_docs_only=False) == {"doc": 1.0}
+    assert coll.query_records("q", primary_docs_only=False) == {"doc": 1.0}
+    assert queries == ["q"]
+    assert coll.query_cache_info()["hit_rate"] == 0.5
+
+    # writes invalidate cached results
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": True}, False)
+    coll._generation_time = 0
+    coll.query_records("q", primary_docs_only=False)
+    assert queries == ["q", "q"]
+
+
+def test_query_page(monkeypatch, arxiv_record1):
+    monkeypatch.setattr(ProdCollection, "client", BulkClient())
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = []
+    requests = []
+
+    def raw_query(query_str, **query_kwargs):
+        requests.append(query_kwargs)
+        hits = [
+            {"_id": f"doc_{j}", "_score": 1.0, "sort": [1.0, f"doc_{j}"]}
+            for j in range(2)
+        ]
+        return {"hits": {"hits": hits}}
+
+    monkeypatch.setattr(coll, "_raw_query", raw_query)
+    results, after = coll.query_page("q", size=2)
+    assert list(results) == ["doc_0", "doc_1"]
+    assert after == [1.0, "doc_1"]
+    assert requests[0]["filters"] == [{"term": {"primary_doc": True}}]
+
+    coll.query_page("q", size=2, after=after, primary_docs_only=False)
+    assert requests[1]["search_after"] == after
+    assert requests[1]["filters"] is None
+
+
+def test_query_page_unindexed(monkeypatch, arxiv_record1, arxiv_record2):
+    class UnindexedClient(BulkClient):
+        """Index created before primary_doc was indexed."""
+
+        def return_fields(self, index_name):
+            return {"document_id": {"type": "keyword"}}
+
+    monkeypatch.setattr(ProdCollection, "client", UnindexedClient())
+    records_db = Data.new({**arxiv_record1, "primary_doc": True})
+    coll = ProdCollection("test", [DOCTYPES["ArxivDoc"]], records_db, {})
+    coll.search_indices = ["index"]
+    with coll.bulk_indexing():
+        coll.add_record({**arxiv_record1, "primary_doc": False}, False)
+        coll.add_record({**arxiv_record2, "primary_doc": True}, False)
+    link_id, primary_id = arxiv_record1["document_id"], arxiv_record2["document_id"]
+    requests = []
+
+    def raw_query(query_str, **query_kwargs):
+        requests.append(query_kwargs)
+        hits = [{"_id": doc_id, "_score": 1.0} for doc_id in [link_id, primary_id]]
+        return {"hits": {"hits": hits}}
+
+    monkeypatch.setattr(coll, "_raw_query", raw_query)
+    assert not coll.query_fields_indexed()
+    # not filtered or sorted by the index: primary documents are filtered afterwards
+    results, after = coll.query_page("q", size=2)
+    assert requests == [{"num_results": 2}]
+    assert results == {primary_id: 1.0}
+    assert after is None
+
+    results, after = coll.query_page("q", size=2, primary_docs_only=False)
+    assert requests[1] == {"num_results": 2}
+    assert results == {link_id: 1.0, primary_id: 1.0}
+    assert after is None
@@ -0,0 +1,172 @@
+import threading
+import pytest
+from tsar.lib import collection_cache
+from tsar.lib.collection import Collection, format_summary
+from tsar.lib.collection_cache import CollectionCache
+
+
+class FakeWriter(object):
+    busy = False
+
+    def call(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class FakeCollection(object):
+    def __init__(self, collection_id, n_records=1):
+        self.collection_id = collection_id
+        self.records_db = [None] * n_records
+        self.writer = FakeWriter()
+        self.registered = True
+        self.watcher = None
+        self.closed = False
+        self.on_close = None
+
+    def close(self):
+        if self.on_close is not None:
+            self.on_close()
+        self.closed = True
+
+    def preview(self):
+        return f"loaded {self.collection_id}"
+
+    def add_from_source(self, doc_type, source_id, progress=None):
+        return (self.collection_id, doc_type, source_id)
+
+
+@pytest.fixture
+def registered(monkeypatch):
+    """Register fake collections a, b, c, d; return {collection_id: loads}."""
+    loads = {}
+    summaries = {
+        "a": {
+            "collection_id": "a",
+            "doc_types": ["MarkdownDoc"],
+            "n_docs": 2,
+            "doc_types_count": {"MarkdownDoc": 2},
+            "link_count_median": 1.0,
+            "link_count_mean": 1.5,
+            "content_bytes": 10,
+        }
+    }
+
+    def load(collection_id):
+        loads[collection_id] = loads.get(collection_id, 0) + 1
+        return FakeCollection(collection_id, n_records=10)
+
+    monkeypatch.setattr(Collection, "load", load)
+    monkeypatch.setattr(
+        Collection, "registered_collections", lambda: ["a", "b", "c", "d"]
+    )
+    monkeypatch.setattr(Collection, "registered_summary", summaries.get)
+    return loads
+
+
+def test_lazy_load(registered):
+    cache = CollectionCache()
+    assert cache.keys() == ["a", "b", "c", "d"] and cache.loaded() == []
+    coll = cache["b"]
+    assert coll.collection_id == "b" and cache["b"] is coll
+    assert registered == {"b": 1}
+    with pytest.raises(KeyError):
+        cache["unknown"]
+
+
+def test_unload_lru(registered):
+    cache = CollectionCache(max_open=2)
+    cache.active = "a"
+    coll_a, coll_b = cache["a"], cache["b"]
+    cache["a"]
+    coll_c = cache["c"]
+    assert cache.loaded() == ["a", "c"] and coll_b.closed
+    cache["d"]
+    # the active collection is kept
+    assert cache.loaded() == ["a", "d"] and coll_c.closed and not coll_a.closed
+    cache["b"]
+    assert registered["b"] == 2
+
+
+def test_unload_max_records(registered):
+    cache = CollectionCache(max_records=25)
+    for collection_id in ["a", "b", "c"]:
+        cache[collection_id]
+    assert cache.loaded() == ["b", "c"]
+
+
+def test_unload_busy(registered):
+    cache = CollectionCache(max_open=2)
+    coll_a, coll_b = cache["a"], cache["b"]
+    coll_a.writer.busy = True
+    # a has queued changes: b is unloaded instead
+    cache["c"]
+    assert cache.loaded() == ["a", "c"] and coll_b.closed and not coll_a.closed
+
+
+def test_unload_unlocked(registered):
+    cache = CollectionCache(max_open=1)
+    coll_a = cache["a"]
+    lookups = []
+
+    def lookup():
+        # e.g. a REST request while a is closed (applying its queued changes)
+        thread = threading.Thread(target=lambda: lookups.append(cache["c"]))
+        thread.start()
+        thread.join(timeout=5)
+
+    coll_a.on_close = lookup
+    cache["b"]
+    assert coll_a.closed and [coll.collection_id for coll in lookups] == ["c"]
+
+
+class FakeWatcher(object):
+    def __init__(self, collection):
+        self.collection = collection
+        self.started = False
+
+    def watch_sources(self):
+        return ["~/notes"]
+
+    def start(self):
+        self.started = True
+
+
+def test_watch(registered, monkeypatch):
+    monkeypatch.setattr(collection_cache, "FolderWatcher", FakeWatcher)
+    assert CollectionCache()["a"].watcher is None
+    coll = CollectionCache(watch=True)["a"]
+    assert coll.watcher.collection is coll and coll.watcher.started
+
+
+def test_pinned(registered):
+    cache = CollectionCache(max_open=1)
+    # e.g. a running job: a stays loaded while other collections are used
+    with cache.pinned("a") as coll_a:
+        cache["b"]
+        cache["c"]
+        assert cache.loaded() == ["a", "c"] and not coll_a.closed
+    cache["d"]
+    assert cache.loaded() == ["d"] and coll_a.closed
+
+
+def test_call(registered):
+    cache = CollectionCache()
+    result = cache.call("b", "add_from_source", "MarkdownDoc", "~/notes")
+    assert result == ("b", "MarkdownDoc", "~/notes")
+    assert cache._pinned == {}
+
+
+def test_run(registered):
+    cache = CollectionCache()
+    result = cache.run("b", "add_from_source", "MarkdownDoc", "~/notes")
+    assert result == ("b", "MarkdownDoc", "~/notes")
+    assert cache._pinned == {}
+
+
+def test_preview(registered):
+    cache = CollectionCache()
+    # from the register summary, not loaded
+    assert cache.preview("a") == format_summary(Collection.registered_summary("a"))
+    assert "a" not in cache.loaded()
+    # no summary in the register yet
+    assert cache.preview("b") == "loaded b"
+    assert cache.loaded() == ["b"]
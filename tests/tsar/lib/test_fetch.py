@@ -0,0 +1,160 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from tsar.lib.fetch import Fetcher, NotCached, ResponseTooLarge
+from tsar.lib.fetch_cache import FetchCache
+
+ETAG = '"v1"'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve fixed responses by path; record request times and headers."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, time.monotonic(), dict(self.headers)))
+        if self.path.startswith("/etag"):
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self._send(b"etag body", headers={"ETag": ETAG})
+        elif self.path.startswith("/large"):
+            self._send(b"x" * 1024)
+        elif self.path.startswith("/slow"):
+            time.sleep(0.2)
+            self._send(b"slow")
+        else:
+            self._send(f"path: {self.path}".encode())
+
+    def _send(self, body, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    # accept concurrent connections without backlog retries
+    request_queue_size = 64
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(server):
+    server.requests.clear()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def fetcher():
+    fetcher = Fetcher(timeout=5)
+    yield fetcher
+    fetcher.close()
+
+
+def test_get(fetcher, base_url):
+    res = fetcher.get(f"{base_url}/page", params={"q": "1"})
+    assert res.status == 200
+    assert res.text == "path: /page?q=1"
+
+
+def test_conditional_get(fetcher, server, base_url):
+    first = fetcher.get(f"{base_url}/etag")
+    second = fetcher.get(f"{base_url}/etag")
+    assert second is first
+    assert second.text == "etag body"
+    # second request revalidated the cached response
+    assert server.requests[1][2]["If-None-Match"] == ETAG
+
+
+def test_validators_bounded(fetcher, base_url):
+    # too large to keep for revalidation
+    fetcher.validators.max_bytes = 4
+    fetcher.get(f"{base_url}/etag")
+    assert len(fetcher.validators) == 0
+    fetcher.validators.max_bytes = 100
+    fetcher.get(f"{base_url}/etag")
+    assert fetcher.validators.info()["bytes"] == len(b"etag body")
+
+
+def test_max_bytes(fetcher, base_url):
+    with pytest.raises(ResponseTooLarge):
+        fetcher.get(f"{base_url}/large", max_bytes=100)
+    assert fetcher.get(f"{base_url}/large").content == b"x" * 1024
+
+
+def test_get_many_concurrent(fetcher, base_url):
+    urls = [f"{base_url}/slow?n={j}" for j in range(8)]
+    start = time.monotonic()
+    responses = fetcher.get_many(urls)
+    elapsed = time.monotonic() - start
+    assert list(responses) == urls
+    assert all(res.text == "slow" for res in responses.values())
+    # 8 requests of 0.2s each, in parallel
+    assert elapsed < 1.0
+
+
+def test_host_rate_limit(base_url, server):
+    fetcher = Fetcher(timeout=5, host_min_interval={"127.0.0.1": 0.2})
+    try:
+        fetcher.get_many([f"{base_url}/page?n={j}" for j in range(3)])
+    finally:
+        fetcher.close()
+    times = sorted(request_time for _, request_time, _ in server.requests)
+    gaps = [t1 - t0 for t0, t1 in zip(times, times[1:])]
+    assert all(gap >= 0.15 for gap in gaps)
+
+
+def test_cache(base_url, server, tmp_path):
+    cache = FetchCache(str(tmp_path), ttl=60)
+    fetcher = Fetcher(timeout=5, cache=cache)
+    try:
+        url = f"{base_url}/page"
+        assert fetcher.get(url).text == "path: /page"
+        # fresh: served from cache without a request
+        assert fetcher.get(url).text == "path: /page"
+        assert len(server.requests) == 1
+
+        # stale: revalidated
+        cache.ttl = 0
+        fetcher.get(f"{base_url}/etag")
+        assert fetcher.get(f"{base_url}/etag").text == "etag body"
+        assert server.requests[-1][2]["If-None-Match"] == ETAG
+
+        cache.offline = True
+        assert fetcher.get(url).text == "path: /page"
+        with pytest.raises(NotCached):
+            fetcher.get(f"{base_url}/other")
+        assert len(server.requests) == 3
+    finally:
+        fetcher.close()
+
+
+def test_memoize(tmp_path):
+    fetcher = Fetcher(cache=FetchCache(str(tmp_path)))
+    calls = []
+
+    def func(x):
+        calls.append(x)
+        return {"x": x}
+
+    assert fetcher.memoize("key", func, 1) == {"x": 1}
+    assert fetcher.memoize("key", func, 1) == {"x": 1}
+    assert calls == [1]
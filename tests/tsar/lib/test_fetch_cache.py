@@ -0,0 +1,60 @@
+import os
+import pytest
+from tsar.lib.fetch_cache import FetchCache, BLOBS_FOLDER
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return FetchCache(str(tmp_path), ttl=60, max_bytes=100)
+
+
+def n_blobs(cache):
+    blobs_folder = os.path.join(cache.folder, BLOBS_FOLDER)
+    return sum(len(files) for _, _, files in os.walk(blobs_folder))
+
+
+def test_put_get(cache):
+    cache.put("http://a", b"content a", headers={"ETag": "1"}, encoding="utf-8")
+    entry = cache.get("http://a")
+    assert entry.content == b"content a"
+    assert entry.headers == {"ETag": "1"}
+    assert entry.is_fresh(cache.ttl)
+    assert not entry.is_fresh(ttl=0)
+    assert cache.get("http://b") is None
+
+
+def test_content_addressed(cache):
+    cache.put("http://a", b"same")
+    cache.put("http://b", b"same")
+    assert n_blobs(cache) == 1
+    cache.pop("http://a")
+    assert cache.get("http://b").content == b"same"
+    cache.pop("http://b")
+    assert n_blobs(cache) == 0
+
+
+def test_lru_eviction(cache):
+    cache.put("http://a", b"a" * 40)
+    cache.put("http://b", b"b" * 40)
+    # use a, so b is least recently used
+    cache.get("http://a")
+    cache.put("http://c", b"c" * 40)
+    assert cache.get("http://b") is None
+    assert cache.get("http://a") is not None
+    assert cache.info()["bytes"] == 80
+
+
+def test_persistent(cache):
+    cache.put("http://a", b"content a")
+    assert FetchCache(cache.folder).get("http://a").content == b"content a"
+
+
+def test_total_bytes(cache):
+    cache.put("http://a", b"a" * 10)
+    cache.put("http://b", b"b" * 20)
+    # replaced and removed entries update the running total
+    cache.put("http://a", b"a" * 30)
+    cache.pop("http://b")
+    cache.pop("http://missing")
+    assert cache.total_bytes() == 30
+    assert FetchCache(cache.folder).total_bytes() == 30
@@ -0,0 +1,112 @@
+import threading
+import time
+from contextlib import contextmanager
+import pytest
+from tsar.lib.ingest import Ingester
+from tsar.lib.writer import CollectionWriter
+
+
+class FakeCollection(object):
+    """Collection stand-in recording which thread commits records."""
+
+    def __init__(self, fetch_seconds=0.05):
+        self.fetch_seconds = fetch_seconds
+        self.committed = []
+        self.commit_threads = set()
+        # for CollectionWriter
+        self.collection_id = "test"
+        self.registered = False
+
+    def primary_documents(self):
+        return []
+
+    @contextmanager
+    def bulk_indexing(self, refresh=False):
+        yield
+
+    def gen_document_records(self, document_id, doc_type=None, primary_ids=None):
+        time.sleep(self.fetch_seconds)
+        if document_id.startswith("bad"):
+            return []
+        return [{"document_id": document_id}]
+
+    def commit_document_records(self, records, write=True):
+        if records[-1]["document_id"].startswith("uncommittable"):
+            raise OSError("disk full")
+        self.commit_threads.add(threading.get_ident())
+        self.committed.extend(r["document_id"] for r in records)
+
+
+def test_ingest_single_writer():
+    coll = FakeCollection()
+    document_ids = [f"doc_{j}" for j in range(20)] + ["bad_doc"]
+    progress_updates = []
+
+    start = time.time()
+    summary = Ingester(coll, max_workers=10, progress=progress_updates.append).run(
+        document_ids
+    )
+    elapsed = time.time() - start
+
+    assert sorted(coll.committed) == sorted(document_ids[:-1])
+    assert coll.commit_threads == {threading.get_ident()}
+    assert summary["done"] == 21 and summary["failed"] == 1
+    assert len(progress_updates) == 21
+    # fetches overlap: much faster than 21 sequential fetches
+    assert elapsed < 21 * coll.fetch_seconds / 2
+
+
+def test_ingest_should_commit():
+    coll = FakeCollection(fetch_seconds=0)
+    checked = []
+
+    def should_commit(document_id, records):
+        checked.append(document_id)
+        return document_id != "doc_1"
+
+    summary = Ingester(coll, should_commit=should_commit).run(["doc_0", "doc_1"])
+    assert sorted(checked) == ["doc_0", "doc_1"]
+    assert coll.committed == ["doc_0"]
+    assert summary["failed"] == 0
+
+
+def test_ingest_on_commit():
+    coll = FakeCollection(fetch_seconds=0)
+    committed = []
+    ingester = Ingester(coll, on_commit=lambda d, records: committed.append(d))
+    summary = ingester.run(["doc_0", "uncommittable_doc"])
+    # only called for committed records
+    assert committed == ["doc_0"]
+    assert summary["failed"] == 1
+
+
+def test_ingest_prefetch_batches():
+    coll = FakeCollection(fetch_seconds=0)
+    batches = []
+
+    class BatchDocType(object):
+        remote = False
+        batch_size = 3
+
+        @classmethod
+        def prefetch(cls, document_ids):
+            batches.append(list(document_ids))
+
+    document_ids = [f"doc_{j}" for j in range(7)]
+    summary = Ingester(coll, max_workers=2).run(document_ids, doc_type=BatchDocType)
+    assert batches == [document_ids[:3], document_ids[3:6], document_ids[6:]]
+    assert sorted(coll.committed) == document_ids
+    assert summary["failed"] == 0
+
+
+def test_ingest_writer():
+    coll = FakeCollection(fetch_seconds=0)
+    writer = CollectionWriter(coll)
+    document_ids = [f"doc_{j}" for j in range(10)] + ["bad_doc", "uncommittable_doc"]
+    summary = Ingester(coll, writer=writer).run(document_ids)
+    writer_thread = writer._thread.ident
+    writer.stop()
+    # fetched by the calling thread's pool, committed by the writer thread
+    assert sorted(coll.committed) == sorted(document_ids[:-2])
+    assert coll.commit_threads == {writer_thread}
+    assert summary["done"] == 12 and summary["failed"] == 2
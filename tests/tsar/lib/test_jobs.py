@@ -0,0 +1,64 @@
+import threading
+import pytest
+from tsar.lib import jobs
+from tsar.lib.jobs import JobManager
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=1)
+    yield manager
+    manager.shutdown()
+
+
+def ingest(n_docs, progress, started=None, release=None):
+    """Job function stand-in reporting progress per document."""
+    for j in range(n_docs):
+        if started is not None:
+            started.set()
+            release.wait()
+        progress({"done": j + 1, "total": n_docs})
+    return {"done": n_docs}
+
+
+def test_job_done(manager):
+    job = manager.submit("ingest", ingest, 3, collection_id="test")
+    job.future.result()
+    job_dict = manager[job.job_id].to_dict()
+    assert job_dict["status"] == jobs.DONE
+    assert job_dict["progress"] == {"done": 3, "total": 3}
+    assert job_dict["result"] == {"done": 3}
+    assert job_dict["collection_id"] == "test"
+
+
+def test_job_failed(manager):
+    def fail(progress):
+        raise ValueError("no source")
+
+    job = manager.submit("fail", fail)
+    job.future.result()
+    assert job.status == jobs.FAILED and "no source" in job.error
+
+
+def test_job_cancel(manager):
+    started, release = threading.Event(), threading.Event()
+    running = manager.submit("running", ingest, 3, started=started, release=release)
+    queued = manager.submit("queued", ingest, 3)
+    started.wait()
+    # the running job stops at its next progress report; the queued one never starts
+    assert manager.cancel(running.job_id) and manager.cancel(queued.job_id)
+    release.set()
+    running.future.result()
+    assert running.status == jobs.CANCELLED and running.progress["done"] == 1
+    assert queued.status == jobs.CANCELLED and queued.progress is None
+    assert not manager.cancel(running.job_id)
+
+
+def test_prune_finished(manager):
+    manager.max_finished = 2
+    for j in range(4):
+        manager.submit(f"job_{j}", ingest, 1).future.result()
+    manager.submit("job_4", ingest, 1).future.result()
+    assert [job.name for job in manager.jobs()] == ["job_2", "job_3", "job_4"]
+    with pytest.raises(KeyError):
+        manager["unknown"]
@@ -0,0 +1,56 @@
+import pytest
+from tsar.lib import link_graph
+from tsar.lib.link_graph import LinkGraph
+
+
+@pytest.fixture
+def graph():
+    links_by_id = [("a", ["b", "c"]), ("b", ["c"]), ("d", ["a", "a"])]
+    return LinkGraph.build(links_by_id)
+
+
+def test_build(graph):
+    assert graph.links("a") == ["b", "c"]
+    assert graph.links("c") == []
+    assert graph.links("unknown") == []
+    assert graph.backlinks("c") == ["a", "b"]
+    assert graph.backlinks("a") == ["d"]
+    assert len(graph) == 4 and graph.n_edges == 4
+
+
+def test_set_links_remove(graph):
+    graph.set_links("a", ["c", "e"])
+    graph.set_links("e", ["a"])
+    assert graph.links("a") == ["c", "e"]
+    assert graph.backlinks("b") == []
+    assert graph.backlinks("a") == ["d", "e"]
+    assert graph.backlinks("e") == ["a"]
+
+    graph.remove("b")
+    assert graph.links("b") == []
+    assert graph.backlinks("c") == ["a"]
+    assert graph.n_edges == 4
+
+
+def test_compact(graph, monkeypatch):
+    monkeypatch.setattr(link_graph, "COMPACT_MIN_NODES", 1)
+    for j in range(10):
+        graph.set_links(f"new_{j}", ["a", f"new_{j + 1}"])
+    graph.compact()
+    assert not graph._fwd_overlay
+    assert graph.links("new_3") == ["a", "new_4"]
+    assert graph.backlinks("a") == ["d"] + [f"new_{j}" for j in range(10)]
+    assert graph.backlinks("c") == ["a", "b"]
+
+
+def test_read_write(graph, tmp_path):
+    path = str(tmp_path / link_graph.GRAPH_NAME)
+    graph.set_links("e", ["a"])
+    graph.position = ["snapshot_id", 3]
+    graph.write(path)
+    graph2 = LinkGraph.read(path)
+    assert graph2.ids == graph.ids
+    assert graph2.position == ["snapshot_id", 3]
+    for document_id in graph.ids:
+        assert graph2.links(document_id) == graph.links(document_id)
+        assert graph2.backlinks(document_id) == graph.backlinks(document_id)
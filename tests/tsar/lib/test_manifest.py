@@ -0,0 +1,40 @@
+import os
+from tsar.lib.manifest import SourceManifest, content_hash
+
+
+def meta(mtime, size=10):
+    return {"st_atime": 0.0, "st_mtime": mtime, "st_ctime": 0.0, "st_size": size}
+
+
+def test_diff(tmp_path):
+    manifest = SourceManifest()
+    manifest.update("a.md", meta(1.0), content_hash("a"))
+    manifest.update("b.md", meta(1.0), content_hash("b"))
+    manifest.update("c.md", meta(1.0), content_hash("c"))
+
+    metas = {
+        "a.md": meta(1.0),
+        "b.md": meta(2.0),
+        "d.md": meta(1.0),
+        "e.md": None,
+    }
+    added, changed, removed = manifest.diff(metas)
+    assert added == ["d.md", "e.md"]
+    assert changed == ["b.md"]
+    assert removed == ["c.md"]
+
+    # metadata unknown: always a change candidate
+    manifest.update("e.md", None, content_hash("e"))
+    assert manifest.diff({"e.md": None}) == ([], ["e.md"], ["a.md", "b.md", "c.md"])
+
+
+def test_read_write(tmp_path):
+    path = os.path.join(tmp_path, "manifests", "source.json")
+    assert len(SourceManifest.read(path)) == 0
+
+    manifest = SourceManifest()
+    manifest.update("a.md", meta(1.5, size=3), content_hash("a"))
+    manifest.write(path)
+    manifest = SourceManifest.read(path)
+    assert manifest.content_hash("a.md") == content_hash("a")
+    assert manifest.diff({"a.md": meta(1.5, size=3)}) == ([], [], [])
@@ -1,7 +1,12 @@
 from tsar import HOST_TESTS_FOLDER, TESTS_FOLDER, TEST_FIXTURES_FOLDER, HOST_HOME_FOLDER, HOST_REPO_PATH
 import os
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer
 import pytest
+import requests
 from tsar.lib import parse_lib
+from file_server import FileHandler
 
 @pytest.fixture
 def omni_file_text():
@@ -39,3 +44,103 @@ def test_return_links(omni_file_text):
         'https://en.wikipedia.org/wiki/Le_Jour_des_fourmis',
     ]
     assert set(expected_links) == set(links)
+
+
+class FakeFS(object):
+    """http fs stub: folder listings by url; records requests."""
+
+    def __init__(self, listings):
+        self.listings = listings
+        self.requests = []
+
+    def ls(self, url, detail=False):
+        self.requests.append(url)
+        if url not in self.listings:
+            raise FileNotFoundError(url)
+        return [url + name for name in self.listings[url]]
+
+
+def test_files_exist():
+    folder = os.path.join(HOST_HOME_FOLDER, "notes")
+    folder_url = parse_lib.host_path_to_url(folder) + "/"
+    fs = FakeFS({folder_url: ["a%20b.md", "c.md", "sub/"]})
+    paths = [
+        os.path.join(folder, "a b.md"),
+        os.path.join(folder, "c.md"),
+        os.path.join(folder, "d.md"),
+        os.path.join(folder, "missing/e.md"),
+    ]
+    assert parse_lib.files_exist(paths, fs=fs) == [True, True, False, False]
+    # one listing per folder
+    assert len(fs.requests) == 2
+
+
+@pytest.fixture
+def tree_folder(tmp_path):
+    for name in ["a.md", "b.txt", "sub/c.md", "sub/deeper/d.md"]:
+        path = os.path.join(tmp_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as fp:
+            fp.write(name)
+    return str(tmp_path)
+
+
+@pytest.fixture
+def file_server(tree_folder, monkeypatch):
+    """Serve tree_folder's parent as the host home folder."""
+    root_dir = os.path.dirname(tree_folder)
+    handler = partial(FileHandler, directory=root_dir)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(parse_lib, "ROOT_DIR", root_dir)
+    monkeypatch.setattr(parse_lib, "FILE_HOST", f"127.0.0.1:{server.server_address[1]}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_scan_local_files(tree_folder):
+    files_meta = dict(parse_lib.scan_local_files(tree_folder, extensions=[".md"]))
+    expected = ["a.md", "sub/c.md", "sub/deeper/d.md"]
+    assert sorted(files_meta) == [os.path.join(tree_folder, fn) for fn in expected]
+    path = os.path.join(tree_folder, "a.md")
+    assert files_meta[path] == parse_lib.file_meta_data(path)
+
+
+def test_scan_host_files(tree_folder, file_server):
+    files_meta = dict(parse_lib.scan_host_files(tree_folder, extensions=[".md"]))
+    local_files_meta = dict(parse_lib.scan_local_files(tree_folder, extensions=[".md"]))
+    assert files_meta == local_files_meta
+
+    single_file = os.path.join(tree_folder, "b.txt")
+    assert list(dict(parse_lib.scan_host_files(single_file))) == [single_file]
+    with pytest.raises(requests.HTTPError):
+        list(parse_lib.scan_host_files(os.path.join(tree_folder, "missing")))
+
+
+def test_files_contents(tree_folder, file_server, monkeypatch):
+    # host paths not mounted locally, so contents come from the file server
+    remote_root = "/tsar_test_host_home"
+    monkeypatch.setattr(parse_lib, "ROOT_DIR", remote_root)
+    remote_folder = os.path.join(remote_root, os.path.basename(tree_folder))
+    large_text = "x" * (parse_lib.READ_CHUNK_BYTES + 10)
+    with open(os.path.join(tree_folder, "large.md"), "w") as fp:
+        fp.write(large_text)
+
+    paths = [os.path.join(remote_folder, fn) for fn in ["a.md", "large.md", "no.md"]]
+    contents = parse_lib.return_files_contents(paths, max_paths=2)
+    assert contents[paths[0]] == "a.md"
+    assert contents[paths[1]] == large_text
+    assert isinstance(contents[paths[2]], FileNotFoundError)
+
+    assert parse_lib.return_file_contents(paths[1]) == large_text
+    parse_lib.prefetch_file_contents(paths[:1])
+    assert paths[0] in parse_lib.prefetched
+    assert parse_lib.return_file_contents(paths[0]) == "a.md"
+    assert paths[0] not in parse_lib.prefetched
+
+    # locally mounted files
+    local_path = os.path.join(tree_folder, "sub/c.md")
+    assert parse_lib.return_files_contents([local_path]) == {local_path: "sub/c.md"}
+    assert parse_lib.return_file_contents(local_path) == "sub/c.md"
@@ -0,0 +1,129 @@
+import os
+import pandas as pd
+import pytest
+import tsar
+from tsar.lib.record_store import (
+    RecordLog,
+    log_path,
+    is_arrow,
+    open_snapshot,
+    read_snapshot,
+    write_snapshot,
+    snapshot_id,
+    snapshot_value_bytes,
+)
+
+
+@pytest.fixture
+def record_log(tmp_path):
+    return RecordLog(log_path(str(tmp_path / "records.pkl")))
+
+
+def test_append_replay(record_log):
+    record_log.append("upsert", "doc1", {"document_id": "doc1", "content": "text"})
+    record_log.append("remove", "doc1")
+    record_log.close()
+
+    entries = list(RecordLog(record_log.path).replay())
+    assert entries == [
+        ("upsert", "doc1", {"document_id": "doc1", "content": "text"}),
+        ("remove", "doc1", None),
+    ]
+
+
+def test_replay_discards_torn_entry(record_log):
+    record_log.append("upsert", "doc1", {"document_id": "doc1"})
+    record_log.append("upsert", "doc2", {"document_id": "doc2"})
+    record_log.close()
+    # simulate a crash part way through writing the last entry
+    size = os.path.getsize(record_log.path)
+    with open(record_log.path, "r+b") as fp:
+        fp.truncate(size - 3)
+
+    log = RecordLog(record_log.path)
+    entries = list(log.replay())
+    assert [doc_id for _, doc_id, _ in entries] == ["doc1"]
+
+    # log remains appendable after the torn entry is discarded
+    log.append("upsert", "doc3", {"document_id": "doc3"})
+    log.close()
+    entries = list(RecordLog(record_log.path).replay())
+    assert [doc_id for _, doc_id, _ in entries] == ["doc1", "doc3"]
+
+
+def test_truncate(record_log):
+    record_log.append("remove", "doc1")
+    record_log.truncate()
+    assert record_log.n_entries == 0
+    assert list(record_log.replay()) == []
+
+
+def test_drop_head(record_log):
+    record_log.append("upsert", "doc1", {"document_id": "doc1"})
+    record_log.append("remove", "doc1")
+    offset, n_entries = record_log.offset(), record_log.n_entries
+    # e.g. appended while the first entries were written to a snapshot
+    record_log.append("upsert", "doc2", {"document_id": "doc2"})
+    record_log.drop_head(offset, n_entries)
+    assert record_log.n_entries == 1
+
+    record_log.append("remove", "doc2")
+    record_log.close()
+    entries = list(RecordLog(record_log.path).replay())
+    assert entries == [
+        ("upsert", "doc2", {"document_id": "doc2"}),
+        ("remove", "doc2", None),
+    ]
+
+
+@pytest.fixture
+def records_df():
+    records = [
+        {
+            "document_id": "http://arxiv.org/abs/2222.2222v2",
+            "document_type": tsar.doctypes.arxiv_doc.ArxivDoc,
+            "authors": ["auth1", "auth2"],
+            "content": "document content goes here.",
+            "links": [],
+        },
+        {
+            "document_id": "/notes/doc.md",
+            "document_type": tsar.doctypes.markdown_doc.MarkdownDoc,
+            "content": "note content",
+            "links": ["http://arxiv.org/abs/2222.2222v2"],
+        },
+    ]
+    return pd.DataFrame(records).set_index("document_id", drop=True)
+
+
+def test_snapshot_read_write(tmp_path, records_df):
+    path = str(tmp_path / "records.arrow")
+    write_snapshot(records_df, path)
+    assert is_arrow(path)
+    assert records_df.equals(read_snapshot(path))
+
+
+def test_snapshot_read_columns(tmp_path, records_df):
+    path = str(tmp_path / "records.arrow")
+    write_snapshot(records_df, path)
+    df = read_snapshot(path, columns=["document_type", "links"])
+    assert df.columns.to_list() == ["document_type", "links"]
+    assert df.equals(records_df[["document_type", "links"]])
+
+    # columns of a memory-mapped table are only converted when requested
+    table = open_snapshot(path)
+    assert read_snapshot(path, columns=["content"], table=table).equals(
+        records_df[["content"]]
+    )
+
+
+def test_snapshot_id_value_bytes(tmp_path, records_df):
+    path = str(tmp_path / "records.arrow")
+    records_df.loc["/notes/doc.md", "content"] = "é"
+    records_df.loc["/notes/empty.md"] = records_df.loc["/notes/doc.md"]
+    records_df.loc["/notes/empty.md", "content"] = None
+    written_id = write_snapshot(records_df, path)
+    table = open_snapshot(path)
+    assert snapshot_id(table) == written_id
+    # utf-8 sizes, without converting values
+    assert snapshot_value_bytes(table, "content").tolist() == [27, 2, 0]
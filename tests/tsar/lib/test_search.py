@@ -0,0 +1,288 @@
+import fnmatch
+import json
+import pytest
+from tsar.lib import search
+from tsar.lib.search import Client, gen_bulk_batches
+from tsar.lib.collection import Collection
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise search.HTTPError(self.status_code)
+
+
+class FakeSession(object):
+    """Session returning queued responses for bulk posts."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.bodies = []
+
+    def post(self, url, data=None, params=None, headers=None):
+        self.bodies.append(data.decode())
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def actions():
+    return [("index", "test__doc", f"doc_{j}", {"content": "x" * 10}) for j in range(5)]
+
+
+def test_gen_bulk_batches_size(actions):
+    batches = list(gen_bulk_batches(actions, batch_size=2))
+    assert [len(batch) for batch, _ in batches] == [2, 2, 1]
+    # each index action is two NDJSON lines
+    _, body = batches[0]
+    lines = body.splitlines()
+    assert len(lines) == 4
+    assert json.loads(lines[0]) == {"index": {"_index": "test__doc", "_id": "doc_0"}}
+
+
+def test_gen_bulk_batches_bytes(actions):
+    action_bytes = len(search.gen_bulk_lines(actions[0]).encode())
+    batches = list(gen_bulk_batches(actions, max_bytes=2 * action_bytes))
+    assert [len(batch) for batch, _ in batches] == [2, 2, 1]
+
+
+def test_bulk_partial_failure_retry(actions):
+    items = [{"index": {"status": 201}} for _ in actions]
+    items[1] = {"index": {"status": 429, "error": "rejected"}}
+    items[2] = {"index": {"status": 400, "error": "mapper_parsing_exception"}}
+    retry_items = [{"index": {"status": 201}}]
+
+    client = Client()
+    client.session = FakeSession(
+        [FakeResponse(200, {"items": items}), FakeResponse(200, {"items": retry_items})]
+    )
+    summary = client.bulk(actions, backoff=0)
+
+    assert summary["succeeded"] == 4
+    assert list(summary["failed"]) == ["doc_2"]
+    # only the rejected document is resent
+    assert '"_id": "doc_1"' in client.session.bodies[1]
+    assert len(client.session.bodies[1].splitlines()) == 2
+
+
+class FakeIndexResponse(FakeResponse):
+    text = ""
+
+
+class FakeIndexSession(object):
+    """Session emulating the index and alias apis on {index: set of aliases}."""
+
+    def __init__(self, indices=None):
+        self.indices = indices or {}
+
+    def _names(self, url):
+        return url.split("/", 3)[3].split("/")[0].split(",")
+
+    def _match(self, pattern):
+        return [i for i in self.indices if fnmatch.fnmatch(i, pattern)]
+
+    def head(self, url):
+        name = self._names(url)[0]
+        exists = name in self.indices or any(
+            name in aliases for aliases in self.indices.values()
+        )
+        return FakeIndexResponse(200 if exists else 404)
+
+    def get(self, url):
+        path = url.split("/", 3)[3]
+        if path.startswith("_alias/"):
+            pattern = path[len("_alias/") :]
+            body = {
+                index: {"aliases": {a: {} for a in aliases}}
+                for index, aliases in self.indices.items()
+                if any(fnmatch.fnmatch(a, pattern) for a in aliases)
+            }
+            return FakeIndexResponse(200 if body else 404, body)
+        body = {
+            index: {"aliases": {a: {} for a in self.indices[index]}}
+            for index in self._match(self._names(url)[0])
+        }
+        return FakeIndexResponse(200, body)
+
+    def put(self, url, json=None):
+        name = self._names(url)[0]
+        assert name not in self.indices
+        self.indices[name] = set(json.get("aliases", {}))
+        return FakeIndexResponse(200)
+
+    def post(self, url, json=None):
+        for action in json["actions"]:
+            (op, args), = action.items()
+            if op == "add":
+                self.indices[args["index"]].add(args["alias"])
+            elif op == "remove":
+                self.indices[args["index"]].remove(args["alias"])
+            else:
+                del self.indices[args["index"]]
+        return FakeIndexResponse(200)
+
+    def delete(self, url):
+        for name in self._names(url):
+            for index in self._match(name):
+                del self.indices[index]
+        return FakeIndexResponse(200)
+
+
+@pytest.fixture
+def index_client():
+    client = Client()
+    client.session = FakeIndexSession()
+    return client
+
+
+def test_index_versions_swap_alias(index_client):
+    indices = index_client.session.indices
+    v1 = index_client.new_index_version("coll__doc", {}, alias="coll__doc")
+    assert v1 == "coll__doc_v1"
+    v2 = index_client.new_index_version("coll__doc", {})
+    assert index_client.index_versions("coll__doc") == {1: ["coll__doc"], 2: []}
+
+    assert index_client.swap_alias("coll__doc", v2) == [v1]
+    assert index_client.drop_old_versions("coll__doc") == [v1]
+    assert indices == {v2: {"coll__doc"}}
+
+
+def test_swap_alias_legacy_index(index_client):
+    index_client.session.indices["coll__doc"] = set()
+    v1 = index_client.new_index_version("coll__doc", {})
+    index_client.swap_alias("coll__doc", v1)
+    assert index_client.session.indices == {v1: {"coll__doc"}}
+
+
+def test_clear_tmp_collections(monkeypatch, index_client):
+    indices = index_client.session.indices
+    monkeypatch.setattr(Collection, "client", index_client)
+    # versions are named after the tmp_ alias (see Collection.new)
+    v1 = index_client.new_index_version("tmp_coll__doc", {}, alias="tmp_coll__doc")
+    index_client.new_index_version("tmp_other__doc", {}, alias="tmp_other__doc")
+    assert v1 == "tmp_coll__doc_v1"
+
+    # registered: the index keeps its tmp_ name
+    index_client.rename_index("tmp_coll__doc", "coll__doc")
+    Collection.clear_tmp_collections()
+    assert indices == {v1: {"coll__doc"}}
+
+
+def test_rename_drop_alias(index_client):
+    indices = index_client.session.indices
+    v1 = index_client.new_index_version("coll__doc", {}, alias="tmp_coll__doc")
+    index_client.new_index_version("other__doc", {}, alias="tmp_other__doc")
+
+    index_client.rename_index("tmp_coll__doc", "coll__doc")
+    assert indices[v1] == {"coll__doc"}
+    # tmp aliases are dropped with the indices they point to
+    index_client.drop_index("tmp_*")
+    assert list(indices) == [v1]
+    index_client.drop_index("coll__doc")
+    assert indices == {}
+
+
+class FakeMappingSession(FakeIndexSession):
+    """Index session also serving mappings; counts mapping requests."""
+
+    def __init__(self, indices=None):
+        super().__init__(indices)
+        self.n_mapping_requests = 0
+
+    def get(self, url):
+        if "/_mapping" not in url:
+            return super().get(url)
+        self.n_mapping_requests += 1
+        name = self._names(url)[0]
+        index = next(i for i, aliases in self.indices.items() if name in aliases)
+        properties = {"content": {"type": "text"}, f"{index}_field": {"type": "text"}}
+        return FakeIndexResponse(200, {index: {"mappings": {"properties": properties}}})
+
+
+def test_fields_cache(index_client):
+    index_client.session = FakeMappingSession()
+    index_client.new_index_version("coll__a", {}, alias="coll__a")
+    index_client.new_index_version("coll__b", {}, alias="coll__b")
+
+    index_client.load_fields(["coll__a", "coll__b"])
+    fields = index_client.merged_fields(["coll__a", "coll__b"])
+    assert fields == ["coll__a_v1_field", "coll__b_v1_field", "content"]
+    assert index_client.session.n_mapping_requests == 2
+
+    # new index versions invalidate cached fields
+    v2 = index_client.new_index_version("coll__a", {})
+    index_client.swap_alias("coll__a", v2)
+    assert "coll__a_v2_field" in index_client.return_fields("coll__a")
+    assert index_client.session.n_mapping_requests == 3
+
+
+def test_fields_cache_dynamic_mapping(index_client):
+    index_client.session = FakeMappingSession()
+    index_client.new_index_version("coll__a", {}, alias="coll__a")
+    index_client.load_fields(["coll__a"])
+    index_client._check_fields("coll__a", [{"content": "x"}])
+    assert "coll__a" in index_client._fields
+    # a record with a new field updates the mapping
+    index_client._check_fields("coll__a", [{"content": "x", "new_field": "y"}])
+    assert "coll__a" not in index_client._fields
+
+
+def test_bulk_new_fields(index_client):
+    index_client._fields["test__doc"] = {"content": {"type": "text"}}
+    items = [{"index": {"status": 201}}, {"delete": {"status": 200}}]
+    index_client.session = FakeSession([FakeResponse(200, {"items": items})])
+    actions = [
+        ("index", "test__doc", "doc_0", {"content": "x", "new_field": "y"}),
+        ("delete", "test__doc", "doc_1", None),
+    ]
+    index_client.bulk(actions)
+    assert index_client._fields == {}
+
+
+@pytest.fixture
+def health(monkeypatch):
+    """Cluster health statuses returned in turn; records service starts, sleeps."""
+    calls = {"statuses": [], "started": 0, "sleeps": []}
+
+    def cluster_health(self):
+        return calls["statuses"].pop(0) if calls["statuses"] else None
+
+    def run(*args, **kwargs):
+        calls["started"] += 1
+
+    monkeypatch.setattr(Client, "cluster_health", cluster_health)
+    monkeypatch.setattr(Client, "test_connection", lambda self: False)
+    monkeypatch.setattr(search.subprocess, "run", run)
+    monkeypatch.setattr(search.time, "sleep", calls["sleeps"].append)
+    return calls
+
+
+def test_server_start_backoff(health):
+    health["statuses"] = [None, None, "red", None, "yellow"]
+    search.Server().start(timeout=60)
+    assert health["started"] == 1
+    assert health["sleeps"] == [0.1, 0.2, 0.4]
+
+
+def test_server_start_timeout(health, monkeypatch):
+    clock = iter(range(0, 100, 10))
+    monkeypatch.setattr(search.time, "monotonic", lambda: next(clock))
+    with pytest.raises(TimeoutError):
+        search.Server().start(timeout=25)
+
+
+def test_server_wait_ready(health):
+    server = search.Server(timeout=60)
+    client = Client(server=server)
+    client.session = FakeSession([])
+    assert not server.ready
+    health["statuses"] = [None, "green"]
+    # the first request waits for the server
+    assert client.session is not None and server.ready
+    assert health["started"] == 1
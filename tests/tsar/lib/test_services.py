@@ -1,7 +1,10 @@
 import os
+import threading
 import time
+from types import SimpleNamespace
 import pytest
-from tsar.lib.services import TaskManager
+from tsar.lib.manifest import SourceManifest
+from tsar.lib.services import TaskManager, FolderWatcher
 from tsar import tasks
 from tsar.tasks import DEFAULT_SECONDS
 from tsar.lib.collection import Collection, DOCTYPES
@@ -108,3 +111,100 @@ def test_task_job_sync(task_manager, tmp_path):
     assert return_jobs(task_manager) == return_tasks(task_manager)
     new_manager = TaskManager(task_manager.collection)
     assert return_jobs(new_manager) == return_tasks(new_manager)
+
+
+class InlineWriter(object):
+    """Collection writer stand-in, applying commands in the calling thread."""
+
+    def call(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class WatchedCollection(object):
+    """Collection stand-in with one markdown folder source; records syncs."""
+
+    def __init__(self, folder):
+        source = {"doc_type": "MarkdownDoc", "source_id": folder}
+        source.update({"args": [], "kwargs": {}})
+        self.configd = {"sources": [source]}
+        self.manifest = SourceManifest()
+        self.records_db = SimpleNamespace(index=[])
+        self.syncs = []
+        self.synced = threading.Event()
+        self.writer = InlineWriter()
+
+    def source_manifest(self, doc_type, source_id):
+        return self.manifest
+
+    def sync_documents(self, doc_type, source_id, metas, removed=()):
+        self.syncs.append((sorted(metas), sorted(removed)))
+        for document_id in metas:
+            self.manifest.update(document_id, metas[document_id], "")
+        for document_id in removed:
+            self.manifest.remove(document_id)
+        self.synced.set()
+
+
+def test_watcher_apply(tmp_path):
+    folder = str(tmp_path)
+    os.makedirs(os.path.join(folder, "sub"))
+    for name in ["a.md", "b.md", "sub/c.md", "d.txt"]:
+        with open(os.path.join(folder, name), "w") as fp:
+            fp.write(name)
+    coll = WatchedCollection(folder)
+    coll.manifest.update(os.path.join(folder, "gone.md"), None, "")
+    coll.manifest.update(os.path.join(folder, "old/e.md"), None, "")
+    watcher = FolderWatcher(coll)
+    assert watcher.watch_sources() == [folder]
+
+    pending = {
+        os.path.join(folder, "a.md"): False,
+        os.path.join(folder, "d.txt"): False,
+        os.path.join(folder, "gone.md"): False,
+        os.path.join(folder, "sub"): True,
+        os.path.join(folder, "old"): True,
+        "/elsewhere/f.md": False,
+    }
+    watcher.apply(pending)
+    metas, removed = coll.syncs[0]
+    path = lambda name: os.path.join(folder, name)
+    assert metas == [path("a.md"), path("sub/c.md")]
+    assert removed == [path("gone.md"), path("old/e.md")]
+
+
+def test_watcher_added_source(tmp_path):
+    folder = str(tmp_path)
+    coll = WatchedCollection(folder)
+    coll.configd["sources"] = []
+    watcher = FolderWatcher(coll)
+    # e.g. recorded by Collection.add_from_source
+    watcher.watch_source({"doc_type": "ArxivDoc", "source_id": "query", "kwargs": {}})
+    watcher.watch_source({"doc_type": "MarkdownDoc", "source_id": folder, "kwargs": {}})
+    assert list(watcher.sources) == [folder]
+
+    # documents added without a manifest are removed too
+    path = os.path.join(folder, "added.md")
+    coll.records_db.index = [path]
+    watcher.apply({path: False})
+    assert coll.syncs == [([], [path])]
+
+
+def test_watcher_events(tmp_path):
+    folder = str(tmp_path)
+    coll = WatchedCollection(folder)
+    watcher = FolderWatcher(coll, debounce=0.1)
+    watcher.watch_sources()
+    watcher.start()
+    try:
+        for j in range(3):
+            with open(os.path.join(folder, f"note_{j}.md"), "w") as fp:
+                fp.write(f"note {j}")
+        assert coll.synced.wait(timeout=2)
+    finally:
+        watcher.stop()
+    # events are coalesced into one sync
+    synced_ids = [document_id for metas, _ in coll.syncs for document_id in metas]
+    assert sorted(set(synced_ids)) == [
+        os.path.join(folder, f"note_{j}.md") for j in range(3)
+    ]
+    assert len(coll.syncs) == 1
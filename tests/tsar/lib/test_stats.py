@@ -0,0 +1,46 @@
+import math
+from tsar.lib.stats import CollectionStats
+
+
+def gen_record(doc_type, n_links, content="x"):
+    links = [f"link_{j}" for j in range(n_links)]
+    return {"document_type": doc_type, "links": links, "content": content}
+
+
+def test_stats_add_remove():
+    records = [gen_record("MarkdownDoc", n) for n in [0, 1, 1, 4]]
+    records.append(gen_record("ArxivDoc", 2, content="é"))
+    stats = CollectionStats.build(records)
+    assert stats.n_docs == 5
+    assert stats.doc_type_counts == {"MarkdownDoc": 4, "ArxivDoc": 1}
+    assert stats.link_count_median() == 1
+    assert stats.link_count_mean() == 8 / 5
+    assert stats.content_bytes == 6
+
+    stats.remove(records[-1])
+    assert stats.doc_type_counts == {"MarkdownDoc": 4}
+    assert stats.link_count_median() == 1
+    assert stats.content_bytes == 4
+    for record in records[:-1]:
+        stats.remove(record)
+    assert stats.n_docs == 0 and stats.link_counts == {}
+    assert math.isnan(stats.link_count_median())
+
+
+def test_stats_read_write(tmp_path):
+    stats = CollectionStats.build([gen_record("MarkdownDoc", n) for n in [0, 3]])
+    stats.position = ["snapshot_id", 2]
+    path = str(tmp_path / "stats.json")
+    stats.write(path)
+    stats2 = CollectionStats.read(path)
+    assert stats2.summary() == stats.summary()
+    assert stats2.position == ["snapshot_id", 2]
+    assert stats2.link_count_median() == 1.5
+
+
+def test_stats_content_bytes():
+    record = gen_record("MarkdownDoc", 1, content="é")
+    sized = {"document_type": "MarkdownDoc", "links": ["a"], "content_bytes": 2}
+    assert CollectionStats.build([sized]).summary() == (
+        CollectionStats.build([record]).summary()
+    )
@@ -0,0 +1,108 @@
+import threading
+import pytest
+from contextlib import contextmanager
+from tsar.lib.writer import CollectionWriter
+
+
+class WrittenCollection(object):
+    """Collection stand-in recording bulk_indexing batches and commits."""
+
+    def __init__(self):
+        self.collection_id = "test"
+        self.registered = True
+        self.batches = []
+        self.n_commits = 0
+        self.applied = []
+
+    @contextmanager
+    def bulk_indexing(self, refresh=False):
+        self.batches.append([])
+        yield
+
+    def commit(self):
+        self.n_commits += 1
+
+    def apply(self, value):
+        self.applied.append(value)
+        self.batches[-1].append(value)
+        return value
+
+
+@pytest.fixture
+def writer():
+    writer = CollectionWriter(WrittenCollection())
+    yield writer
+    writer.stop()
+
+
+def test_writer_batches(writer):
+    coll = writer.collection
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    first = writer.submit(block)
+    started.wait()
+    # queued while the first batch is applied: one batch, one commit
+    futures = [writer.submit(coll.apply, j) for j in range(3)]
+    release.set()
+    assert [future.result() for future in futures] == [0, 1, 2]
+    assert first.result() is None
+    assert coll.batches == [[], [0, 1, 2]]
+    assert coll.n_commits == 2
+
+
+def test_writer_errors(writer):
+    coll = writer.collection
+
+    def fail():
+        raise ValueError("failed command")
+
+    with pytest.raises(ValueError):
+        writer.call(fail)
+    # later commands are still applied
+    assert writer.call(coll.apply, 1) == 1
+
+
+def test_writer_call_nested(writer):
+    coll = writer.collection
+    # commands calling the writer run directly on the writer thread
+    assert writer.call(writer.call, coll.apply, 1) == 1
+
+
+def test_writer_stop(writer):
+    coll = writer.collection
+    futures = [writer.submit(coll.apply, j) for j in range(3)]
+    writer.stop()
+    assert not writer.running
+    assert all(future.done() for future in futures)
+    assert coll.applied == [0, 1, 2]
+
+
+def test_writer_closed(writer):
+    coll = writer.collection
+    writer.call(coll.apply, 1)
+    writer.stop()
+    with pytest.raises(RuntimeError):
+        writer.submit(coll.apply, 2)
+    assert not writer.running and coll.applied == [1]
+
+
+def test_writer_busy(writer):
+    coll = writer.collection
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    assert not writer.busy
+    future = writer.submit(block)
+    started.wait()
+    assert writer.busy
+    release.set()
+    future.result()
+    writer.call(coll.apply, 1)
+    assert not writer.busy
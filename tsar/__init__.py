@@ -9,6 +9,7 @@ COLLECTIONS_FOLDER = os.path.join(RESOURCES_PATH, "collections/")
 CAPTURE_DOC_PATH = os.path.join(RESOURCES_PATH, "capture.md")
 
 LOG_FOLDER = os.path.join(RESOURCES_PATH, "logs/")
+CACHE_FOLDER = os.path.join(RESOURCES_PATH, "cache/")
 
 # _TEMP_METADB_PATH = METADB_PATH
 _TEMP_CONTENT_FOLDER = os.path.join(REPO_PATH, ".tmp_content")
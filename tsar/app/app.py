@@ -11,11 +11,14 @@ from tsar.doctypes.doctype import update_dict
 from tsar.app.search_view import SearchView
 from tsar.app.collections_view import CollectionsView
 from tsar.lib.collection import Collection, Register, DOCTYPES
+from tsar.lib.collection_cache import CollectionCache
+from tsar.lib.jobs import JobManager
 from tsar.lib.search import Server
 from prompt_toolkit.key_binding import KeyBindings, merge_key_bindings
 from prompt_toolkit.application import Application
 from prompt_toolkit.patch_stdout import patch_stdout
-from tsar.app.rest import FLASK_KWARGS, return_flask_app
+from tsar.app.rest import SERVER_KWARGS, return_flask_app
+from tsar.app.server import RestServer
 
 RUN_MAIN_APP = True
 
@@ -46,12 +49,15 @@ class App(object):
 
     def __init__(self):
 
-        collections = {
-            coll_id: Collection.load(coll_id)
-            for coll_id in Collection.registered_collections()
-        }
-        if collections:
-            active_collection = collections[list(collections.keys())[0]]
+        # boot elasticsearch while the views are built; searches wait for it
+        Collection.server.start_background()
+        # registered collections are loaded on first use; only the active one now.
+        # Folder sources of loaded collections are watched, and synced on changes.
+        collections = CollectionCache(watch=True)
+        collection_ids = collections.keys()
+        if collection_ids:
+            collections.active = collection_ids[0]
+            active_collection = collections[collection_ids[0]]
         else:
             active_collection = Collection.new(
                 collection_id="temp_colleciton", doc_types=list(DOCTYPES.values())
@@ -64,6 +70,8 @@ class App(object):
             "app": Application(full_screen=True),
             "collections": collections,
             "active_collection": active_collection,
+            # long-running REST requests, e.g. adding sources
+            "jobs": JobManager(),
             "views": {},
         }
 
@@ -88,19 +96,34 @@ class App(object):
         with patch_stdout():
             self.state["app"].run()
 
+    def shutdown(self):
+        """Cancel jobs, then stop watchers, apply queued changes, unload collections."""
+        self.state["jobs"].shutdown()
+        collections = self.state["collections"]
+        for collection_id in collections.loaded():
+            collections.unload(collection_id)
+
 
 if __name__ == "__main__":
     """Instantiate views, view_models, app; run the app."""
 
     tsar_app = App()
 
-    # start flask CLI server in a thread
+    # start CLI server in a thread
     flask_app = return_flask_app(tsar_app)
 
     log = logging.getLogger("werkzeug")
     log.disabled = True
-    threading.Thread(target=flask_app.run, kwargs=FLASK_KWARGS).start()
-
-    # start main app; set to false to debug CLI server.
-    if RUN_MAIN_APP:
-        tsar_app.run()
+    rest_server = RestServer(flask_app, **SERVER_KWARGS)
+    rest_server.start()
+
+    # start main app; set to false to debug CLI server.  The server is stopped
+    # (gracefully) when the app exits.
+    try:
+        if RUN_MAIN_APP:
+            tsar_app.run()
+        else:
+            rest_server.join()
+    finally:
+        rest_server.stop()
+        tsar_app.shutdown()
@@ -11,6 +11,7 @@ from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.layout.processors import TabsProcessor
 from prompt_toolkit.patch_stdout import patch_stdout
 from tsar.lib.collection import Collection
+from tsar.lib.collection_cache import CollectionCache
 from tsar.app.layout_components import SelectableList
 
 TEXT_FORMAT = {"selected": "bg:#144288", "unselected": "default"}
@@ -94,6 +95,7 @@ class CollectionsView(object):
         if collection is None:
             collection = self.state["collections"][self.results_control.selected_result]
         self.state["active_collection"] = collection
+        self.state["collections"].active = collection.collection_id
         self.input_str = collection.collection_id
         self.input_buffer.cursor_position = len(self.input_str)
 
@@ -125,14 +127,14 @@ class CollectionsView(object):
     def update_status_bar(self, text=None):
         """Update the status bar text."""
         coll = self.state["active_collection"]
-        df = coll.records_db.df
-        _doc_count = df.document_type.value_counts().reset_index(name="counts")
+        # a copy, consistent while the collection changes
+        summary = coll.gen_summary()
         doc_count_str = ", ".join(
-            [f"{row[1]} {row[0].__name__}" for row in _doc_count.values]
+            [f"{n} {name}" for name, n in summary["doc_types_count"].items()]
         )
         if text is None:
             text = (
-                f"{coll.records_db.df.shape[0]} docs in "
+                f"{summary['n_docs']} docs in "
                 f"{coll.collection_id}: "
                 f"{doc_count_str}"
             )
@@ -148,8 +150,10 @@ class CollectionsView(object):
     def update_preview(self):
         """Update preview window text."""
         try:
-            coll = self.state["collections"][self.results_control.selected_result]
-            preview = coll.preview()
+            # from the register summary, unless the collection is loaded
+            preview = self.state["collections"].preview(
+                self.results_control.selected_result
+            )
         except KeyError:
             preview = f"(no preview available)"
         self.preview_buffer.buffer.text = preview
@@ -167,15 +171,12 @@ class CollectionsView(object):
 if __name__ == "__main__":
     """stand-alone window test."""
 
-    # coll_ids = Collection.registered_collections()
-    collections = {
-        coll_id: Collection.load(coll_id)
-        for coll_id in Collection.registered_collections()
-    }
+    collections = CollectionCache()
+    collections.active = collections.keys()[0]
     state = {
         "app": Application(full_screen=True),
         "collections": collections,
-        "active_collection": collections[list(collections.keys())[0]],
+        "active_collection": collections[collections.active],
     }
     window = CollectionsView(state=state)
 
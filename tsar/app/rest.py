@@ -1,14 +1,17 @@
 """
 RESTful server (for terminal commands from client).
 
-The server is run in a thread in the main app process (in app.py).  The CLI
-is exposed on the host machine which makes http requests.
+The server is run in a thread in the main app process (in app.py), handling requests
+on a pool of workers (see server.py).  The CLI is exposed on the host machine which
+makes http requests.
 
 Debug flow:
 - start shell in docker image
 - run app from cmd line: python tsar/tsar/app/app.py
 - check browser/make requests from host, http://0.0.0.0:8137/
 """
+import json
+from tsar.config import QUERY_RESULT_SIZE, SERVER_WORKERS, REQUEST_TIMEOUT_SECONDS
 from tsar.lib.collection import Collection, Register, DOCTYPES
 from flask import Flask, jsonify, request
 
@@ -17,6 +20,13 @@ FLASK_KWARGS = {
     "host": "0.0.0.0",
     "debug": False,
 }
+# production server (see tsar.app.server)
+SERVER_KWARGS = {
+    "port": FLASK_KWARGS["port"],
+    "host": FLASK_KWARGS["host"],
+    "workers": SERVER_WORKERS,
+    "request_timeout": REQUEST_TIMEOUT_SECONDS,
+}
 
 
 def return_flask_app(tsar_app):
@@ -36,9 +46,9 @@ def return_flask_app(tsar_app):
         ex:
         res = requests.get(url="http://0.0.0.0:8137/collection_info")
         """
-        coll_info = []
-        for name, coll in tsar_app.state["collections"].items():
-            coll_info.append(coll.preview())
+        collections = tsar_app.state["collections"]
+        # from register summaries, without loading collections
+        coll_info = [collections.preview(name) for name in collections.keys()]
         response = jsonify(coll_info)
         return response
 
@@ -47,10 +57,51 @@ def return_flask_app(tsar_app):
         """Get summary information for one collection.
         res = requests.get(url="http://0.0.0.0:8137/collection_info/test_collection")
         """
-        coll_info = tsar_app.state["collections"][collection].preview()
+        coll_info = tsar_app.state["collections"].preview(collection)
         response = jsonify(coll_info)
         return response
 
+    @app.route("/search/<collection>")
+    def search(collection):
+        """Query a collection; return a page of results and the next page's `after`.
+
+        args: q (query string), size, after (json, from a previous page), all (include
+        linked, non-primary documents if 1).
+        ex:
+        res = requests.get(url="http://0.0.0.0:8137/search/pkb", params={"q": "bert"})
+        """
+        query_str = request.args.get("q", "*")
+        size = request.args.get("size", QUERY_RESULT_SIZE, type=int)
+        after = request.args.get("after")
+        try:
+            after = None if after is None else json.loads(after)
+        except ValueError:
+            return jsonify("invalid after"), 400
+        primary_docs_only = request.args.get("all", "0") != "1"
+        try:
+            coll = tsar_app.state["collections"][collection]
+        except KeyError:
+            return jsonify(f"no collection {collection}"), 404
+        try:
+            results, next_after = coll.query_page(
+                query_str, primary_docs_only=primary_docs_only, size=size, after=after
+            )
+        except Exception:
+            return jsonify("invalid query"), 400
+        results = [
+            {"document_id": document_id, "score": score}
+            for document_id, score in results.items()
+        ]
+        return jsonify({"results": results, "after": next_after})
+
+    @app.route("/query_cache_info/<collection>")
+    def query_cache_info(collection):
+        """Get query cache hit statistics for one collection.
+        res = requests.get(url="http://0.0.0.0:8137/query_cache_info/test_collection")
+        """
+        cache_info = tsar_app.state["collections"][collection].query_cache_info()
+        return jsonify(cache_info)
+
     @app.route("/doctypes", defaults={"collection": None})
     @app.route("/doctypes/<collection>")
     def get_doctypes(collection):
@@ -77,7 +128,7 @@ def return_flask_app(tsar_app):
         document_id = data["document_id"]
         collection = tsar_app.state["collections"][collection]
         try:
-            collection.add_document(document_id)
+            collection.writer.call(collection.add_document, document_id)
             response = f"document {document_id} added to collection"
         except Exception as e:
             response = "error adding document to collection"
@@ -85,8 +136,9 @@ def return_flask_app(tsar_app):
 
     @app.route("/add_source/<collection>", methods=["POST"])
     def add_source(collection):
-        """Add documents from source to collection.
+        """Add documents from source to collection, as a job; return the job.
 
+        Follow the job with /jobs/<job_id>.
         ex:
         requests.post(
             url="http://0.0.0.0:8137/add_source/pkb",
@@ -105,17 +157,25 @@ def return_flask_app(tsar_app):
         except Exception:
             response = f"doctype must be one of {collection.doc_types} for {collection}"
             return jsonify(response)
-        try:
-            collection.add_from_source(doctype, source_id)
-            response = f"documents from {source_id} added to collection"
-        except Exception:
-            response = f"error adding docs type {doctype} from source {source_id}"
-        return jsonify(response)
+        # the collection is looked up (and kept loaded) when the job runs; documents
+        # are fetched by the job, and only committed by the collection's writer
+        job = tsar_app.state["jobs"].submit(
+            f"add {doctype} documents from {source_id}",
+            tsar_app.state["collections"].run,
+            collection.collection_id,
+            "add_from_source",
+            doctype,
+            source_id,
+            collection_id=collection.collection_id,
+        )
+        return jsonify(job.to_dict())
 
     @app.route("/rm_source/<collection>", methods=["POST"])
     def rm_source(collection):
         """Remove documents from collection associated with source_id, doctype.
 
+        Runs as a job (see add_source).
+
         requests.post(
             url="http://0.0.0.0:8137/rm_source/pkb",
             json={"source_id":"~/my_folder/"}
@@ -133,12 +193,50 @@ def return_flask_app(tsar_app):
         except Exception:
             response = f"doctype must be one of {collection.doc_types} for {collection}"
             return jsonify(response)
+        # the collection is looked up (and kept loaded) when the job runs
+        job = tsar_app.state["jobs"].submit(
+            f"remove {doctype} documents from {source_id}",
+            tsar_app.state["collections"].call,
+            collection.collection_id,
+            "remove_from_source",
+            doctype,
+            source_id,
+            collection_id=collection.collection_id,
+        )
+        return jsonify(job.to_dict())
+
+    @app.route("/jobs")
+    def jobs():
+        """Return jobs (status, progress, result), oldest first.
+        ex:
+        res = requests.get(url="http://0.0.0.0:8137/jobs")
+        """
+        return jsonify([job.to_dict() for job in tsar_app.state["jobs"].jobs()])
+
+    @app.route("/jobs/<job_id>")
+    def job_info(job_id):
+        """Return a job's status, progress (docs_per_sec, eta) and result summary.
+        ex:
+        res = requests.get(url="http://0.0.0.0:8137/jobs/0123456789ab")
+        """
         try:
-            collection.remove_from_source(doctype, source_id)
-            response = f"documents from {source_id} removed from collection"
-        except Exception:
-            response = f"error removing docs type {doctype} from source {source_id}"
-        return jsonify(response)
+            job = tsar_app.state["jobs"][job_id]
+        except KeyError:
+            return jsonify(f"no job {job_id}"), 404
+        return jsonify(job.to_dict())
+
+    @app.route("/jobs/<job_id>/cancel", methods=["POST"])
+    def cancel_job(job_id):
+        """Cancel a job; it stops at its next progress report.
+        ex:
+        requests.post(url="http://0.0.0.0:8137/jobs/0123456789ab/cancel")
+        """
+        try:
+            job = tsar_app.state["jobs"][job_id]
+        except KeyError:
+            return jsonify(f"no job {job_id}"), 404
+        job.cancel()
+        return jsonify(job.to_dict())
 
     @app.route("/rm_doc/<collection>", methods=["POST"])
     def rm_doc(collection):
@@ -154,7 +252,7 @@ def return_flask_app(tsar_app):
         document_id = data["document_id"]
         collection = tsar_app.state["collections"][collection]
         try:
-            collection.remove_record(document_id)
+            collection.writer.call(collection.remove_record, document_id)
             response = f"removed document: {document_id} from {collection}"
         except Exception as e:
             response = "error removing document from collection"
@@ -199,6 +297,7 @@ def return_flask_app(tsar_app):
 
         try:
             register.drop(collection_id)
+            tsar_app.state["collections"].pop(collection_id)
         except:
             response = "error dropping collection."
         else:
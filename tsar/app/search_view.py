@@ -1,6 +1,9 @@
 """Basic input/results Screen."""
+import asyncio
 from collections.abc import Sequence
-from prompt_toolkit.application import Application
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from prompt_toolkit.application import Application, get_app
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit.buffer import Buffer
 from prompt_toolkit.layout import Dimension
@@ -22,6 +25,10 @@ PREVIEW_DIMENSION_DICT = {
     "min": 5,
     "preferred": 14,
 }
+# seconds without typing before a query is sent
+QUERY_DEBOUNCE_SECONDS = 0.15
+# queries run off the event loop; a stale query still running doesn't block new ones
+QUERY_WORKERS = 2
 
 
 class SearchView(object):
@@ -36,12 +43,17 @@ class SearchView(object):
         # layout components
         self.header_bar = FormattedTextControl(focusable=False,)
         self.input_buffer = Buffer(multiline=False)
-        self.input_buffer.on_text_changed += self.update_results
+        self.input_buffer.on_text_changed += self.schedule_results
         self.results_control = SelectableList(text="")
         self.preview_bar = FormattedTextControl(focusable=False,)
         self.preview_buffer = BufferControl(focusable=False,)
         self.status_bar = FormattedTextControl()
 
+        # results are only shown for the latest scheduled query
+        self._query_generation = 0
+        self._query_task = None
+        self._query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS)
+
         self.layout = Layout(
             HSplit(
                 [
@@ -81,12 +93,53 @@ class SearchView(object):
         self.input_buffer.text = text
 
     def update_results(self, unused_arg=""):
-        """Update self.results in-place."""
+        """Update self.results in-place (blocking query)."""
         try:
             results = self.state["active_collection"].query_records(
                 query_str=self.input_str
             )
         except Exception:
+            results = None
+        self._show_results(results)
+
+    def schedule_results(self, unused_arg=""):
+        """Update results without blocking input: debounced, stale queries cancelled.
+
+        Without a running event loop (app not started), update immediately.
+        """
+        self._query_generation += 1
+        if self._query_task is not None:
+            self._query_task.cancel()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.update_results()
+            return
+        self._query_task = loop.create_task(
+            self._update_results_async(self._query_generation)
+        )
+
+    async def _update_results_async(self, generation):
+        await asyncio.sleep(QUERY_DEBOUNCE_SECONDS)
+        coll = self.state["active_collection"]
+        query_str = self.input_str
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._query_executor, coll.query_records, query_str
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            results = None
+        if generation != self._query_generation:
+            # a newer query was scheduled meanwhile
+            return
+        self._show_results(results)
+        get_app().invalidate()
+
+    def _show_results(self, results):
+        """Show {document_id: score} results, best first; None if the query failed."""
+        if results is None:
             self.results_control.text = ["(invalid query)"]
         else:
             results = sorted(results.keys(), key=results.get, reverse=True)
@@ -98,25 +151,23 @@ class SearchView(object):
         """Update the header text."""
         if text is None:
             coll = self.state["active_collection"]
-
-            fields = set()
-            for index in coll.search_indices:
-                index_fields = coll.client.return_fields(index)
-                fields.update(index_fields.keys())
-            text = f"search: {' | '.join(sorted(fields))}"
+            if coll.server.ready:
+                text = f"search: {' | '.join(coll.search_fields())}"
+            else:
+                text = "search: (starting search server)"
         self.header_bar.text = text
 
     def update_status_bar(self, text=None):
         """Update the status bar text."""
         coll = self.state["active_collection"]
-        df = coll.records_db.df
-        _doc_count = df.document_type.value_counts().reset_index(name="counts")
+        # a copy, consistent while the collection changes
+        summary = coll.gen_summary()
         doc_count_str = ", ".join(
-            [f"{row[1]} {row[0].__name__}" for row in _doc_count.values]
+            [f"{n} {name}" for name, n in summary["doc_types_count"].items()]
         )
         if text is None:
             text = (
-                f"{coll.records_db.df.shape[0]} docs in "
+                f"{summary['n_docs']} docs in "
                 f"{coll.collection_id}: "
                 f"{doc_count_str}"
             )
@@ -146,10 +197,43 @@ class SearchView(object):
         """Update all values from shared state dict."""
         self.update_header_bar()
         self.update_preview_bar()
-        self.update_results()
+        if self.state["active_collection"].server.ready:
+            self.update_results()
+        else:
+            # don't block (app startup) on the search server; show results once up
+            self.results_control.text = ["(starting search server)"]
+            self._create_task(self._reset_when_ready)
         self.update_preview()
         self.update_status_bar()
 
+    def _create_task(self, coroutine_func):
+        """Run coroutine_func() on the app's event loop; if not running, once started.
+
+        Controls are only changed on the event loop, not from worker threads.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # app startup: called in the event loop when the app runs
+            callback = partial(self._create_task, coroutine_func)
+            self.state["app"].pre_run_callables.append(callback)
+            return
+        loop.create_task(coroutine_func())
+
+    async def _reset_when_ready(self):
+        """Wait for the search server (in a worker), then update header and results."""
+        server = self.state["active_collection"].server
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._query_executor, server.wait_ready
+            )
+        except Exception:
+            # logged by the server; queries show as invalid
+            pass
+        self.update_header_bar()
+        self.schedule_results()
+        self.state["app"].invalidate()
+
 
 if __name__ == "__main__":
     """stand-alone window test."""
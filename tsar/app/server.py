@@ -0,0 +1,165 @@
+"""
+Production server for the REST CLI app (see rest.py).
+
+Requests are handled by a bounded pool of worker threads (SERVER_WORKERS), instead of
+the flask development server's single thread, so slow requests don't hold up other
+CLI calls.  Connections are kept alive (HTTP/1.1) for repeated requests, e.g. from
+scripts; a connection idle, or sending a request, for longer than
+REQUEST_TIMEOUT_SECONDS is closed, so it doesn't keep a worker.  `stop` shuts the
+server down gracefully: no new connections are accepted and requests in progress
+finish (kept-alive connections close within the timeout); the app stops the server
+when the TUI exits.
+"""
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
+from tsar import LOG_FOLDER
+from tsar.config import SERVER_WORKERS, REQUEST_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "server.log"))
+logger.addHandler(handler)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Keep-alive request handler with socket timeouts.
+
+    werkzeug closes every connection, as the unread rest of a request body would be
+    parsed as the next request; here the request is read through a stream bounded by
+    its content length (drained by werkzeug after the response), so connections can
+    be kept alive.
+    """
+
+    protocol_version = "HTTP/1.1"
+    _keep_alive = False
+
+    def setup(self):
+        # applied to the connection socket by StreamRequestHandler.setup
+        self.timeout = self.server.request_timeout
+        super().setup()
+        # headers and body are written separately: don't delay the body (nagle) on
+        # kept-alive connections
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "transfer-encoding":
+            self._keep_alive = False
+        if keyword.lower() == "connection" and self._keep_alive:
+            return
+        super().send_header(keyword, value)
+
+    def run_wsgi(self):
+        content_length = self.headers.get("Content-Length")
+        self._keep_alive = bool(
+            self.request_version == "HTTP/1.1"
+            and self.headers.get("Connection", "").lower() != "close"
+            and "Transfer-Encoding" not in self.headers
+            and (content_length is None or content_length.isdigit())
+        )
+        if not self._keep_alive:
+            super().run_wsgi()
+            self.close_connection = True
+            return
+        rfile = self.rfile
+        self.rfile = LimitedStream(rfile, int(content_length or 0))
+        try:
+            super().run_wsgi()
+        finally:
+            self.rfile = rfile
+        if not self._keep_alive:
+            self.close_connection = True
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server handling connections on a thread pool."""
+
+    def __init__(
+        self,
+        host,
+        port,
+        app,
+        workers=SERVER_WORKERS,
+        request_timeout=REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.request_timeout = request_timeout
+        super().__init__(host, port, app, handler=_RequestHandler)
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tsar-server"
+        )
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def handle_error(self, request, client_address):
+        logger.exception(f"error handling request from {client_address}")
+
+    def close(self):
+        """Wait for requests in progress, then close the server socket."""
+        self._pool.shutdown(wait=True)
+        self.server_close()
+
+
+class RestServer(object):
+    """Serve a flask app with PooledWSGIServer in a background thread."""
+
+    def __init__(
+        self,
+        flask_app,
+        host,
+        port,
+        workers=SERVER_WORKERS,
+        request_timeout=REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.server = PooledWSGIServer(
+            host, port, flask_app, workers=workers, request_timeout=request_timeout
+        )
+        self._thread = None
+
+    def __repr__(self):
+        return f"RestServer({self.server.host}:{self.server.port})"
+
+    @property
+    def port(self):
+        return self.server.port
+
+    def start(self):
+        """Accept requests in a thread."""
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="tsar-rest-server", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"serving on {self.server.host}:{self.server.port}")
+
+    def join(self):
+        """Wait until the server is stopped."""
+        if self._thread is not None:
+            self._thread.join()
+
+    def stop(self):
+        """Stop accepting connections, finish requests in progress and close.
+
+        Kept-alive connections are closed within the request timeout.
+        """
+        if self._thread is None:
+            return
+        self.server.shutdown()
+        self._thread.join()
+        self._thread = None
+        self.server.close()
+        logger.info("server stopped")
@@ -1,2 +1,19 @@
 """TSAR config file."""
 from tsar import REPO_PATH
+
+# persistent cache of remote documents (see tsar.lib.fetch_cache)
+FETCH_CACHE_TTL_SECONDS = 7 * 24 * 3600
+FETCH_CACHE_MAX_BYTES = 1024 ** 3
+# serve remote documents only from the fetch cache, e.g. to reindex without network
+FETCH_OFFLINE = False
+
+# watch synced folders by polling, e.g. where inotify events aren't propagated to mounts
+WATCH_POLLING = False
+
+# results per search query/page (see Collection.query_page)
+QUERY_RESULT_SIZE = 20
+
+# REST CLI server (see tsar.app.server): request worker threads, and seconds before an
+# idle (keep-alive) or slow connection is closed
+SERVER_WORKERS = 8
+REQUEST_TIMEOUT_SECONDS = 10
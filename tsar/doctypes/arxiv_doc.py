@@ -1,15 +1,29 @@
-import arxiv
+from collections import namedtuple
 from datetime import datetime
 import pandas as pd
 import re
-import requests
+import time
+import xml.etree.ElementTree as ET
 from tsar.doctypes.doctype import DocType, update_dict, BASE_SCHEMA, BASE_MAPPING
 from tsar.lib import parse_lib
+from tsar.lib.fetch import fetcher
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+# prefix of api entry ids, i.e. canonical document ids
+ARXIV_ABS_URL = "http://arxiv.org/abs/"
+ATOM_NS = {"atom": "http://www.w3.org/2005/Atom"}
+
+# arxiv api results (fields as used by gen_arxiv_record_from_result)
+ArxivResult = namedtuple(
+    "ArxivResult", ["entry_id", "title", "summary", "published", "authors"]
+)
+ArxivAuthor = namedtuple("ArxivAuthor", ["name"])
 
 
 class ArxivDoc(DocType):
     """Arxiv publication document type."""
 
+    remote = True
     schema = {
         "authors": object,
         "publish_date": float,
@@ -37,8 +51,12 @@ class ArxivDoc(DocType):
         # api url = 'http://export.arxiv.org/api/query?id_list=1311.5600'
         """
         paper_id = document_id.split("abs/")[-1]
-        search = arxiv.Search(id_list=[paper_id])
-        result = next(search.get())
+        res = fetcher.get(ARXIV_API_URL, params={"id_list": paper_id})
+        res.raise_for_status()
+        results = parse_arxiv_feed(res.text)
+        if not results:
+            raise ValueError(f"no arxiv api result for {document_id}")
+        result = results[0]
         record = gen_arxiv_record_from_result(result, primary_doc=primary_doc)
         return record
 
@@ -68,6 +86,13 @@ class ArxivDoc(DocType):
 
     @staticmethod
     def resolve_id(document_id):
+        """Return canonical id, e.g. http://arxiv.org/abs/1311.5600v1.
+
+        Versioned ids resolve without an api call; others resolve to the latest version.
+        """
+        paper_id = document_id.split("abs/")[-1]
+        if re.match(r"\d+\.\d+v\d+\Z", paper_id):
+            return ARXIV_ABS_URL + paper_id
         arxiv_dict = ArxivDoc.gen_record(document_id, primary_doc=None, gen_links=False)
         return arxiv_dict["document_id"]
 
@@ -95,8 +120,35 @@ class ArxivDoc(DocType):
         return preview
 
 
+def parse_arxiv_feed(feed_text):
+    """Parse arxiv api (atom) response into a list of ArxivResult."""
+    root = ET.fromstring(feed_text)
+    results = []
+    for entry in root.findall("atom:entry", ATOM_NS):
+        entry_id = entry.findtext("atom:id", namespaces=ATOM_NS)
+        summary = entry.findtext("atom:summary", namespaces=ATOM_NS).strip()
+        if "/api/errors" in entry_id:
+            raise ValueError(f"arxiv api error: {summary}")
+        published = entry.findtext("atom:published", namespaces=ATOM_NS)
+        authors = [
+            ArxivAuthor(name=author.findtext("atom:name", namespaces=ATOM_NS))
+            for author in entry.findall("atom:author", ATOM_NS)
+        ]
+        # titles are wrapped over lines
+        title = " ".join(entry.findtext("atom:title", namespaces=ATOM_NS).split())
+        result = ArxivResult(
+            entry_id=entry_id,
+            title=title,
+            summary=summary,
+            published=time.strptime(published, "%Y-%m-%dT%H:%M:%SZ"),
+            authors=authors,
+        )
+        results.append(result)
+    return results
+
+
 def gen_arxiv_record_from_result(result, primary_doc):
-    """Parse arxiv package result into a record."""
+    """Parse arxiv api result into a record."""
     abstract = result.summary.replace("\n", " ")
     title = result.title.replace("\n", "")
     publish_date = int(datetime(*result.published[:6]).timestamp())
@@ -120,7 +172,7 @@ def _recent_ml_and_ai_query_url(
     max_results=4,
 ):
     """Return query string for recent ml/ai papers."""
-    base_query = "http://export.arxiv.org/api/query?search_query="
+    base_query = ARXIV_API_URL + "?search_query="
     fields_str = "+OR+".join([f"cat:{f}" for f in fields])
     sort_str = f"sortBy={sort_method}"
     max_results_str = f"max_results={max_results}"
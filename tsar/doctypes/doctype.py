@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
 import collections.abc
+import threading
+from contextlib import nullcontext
+from tsar.lib.cache import LRUCache
 
 # required fields for all DocTypes; used by app/framework.  Uses pandas/numpy dtypes.
 BASE_SCHEMA = {
@@ -16,14 +19,21 @@ ELASTICSEARCH_TYPES = ("text", "keyword", "date", "long", "double", "boolean", "
 BASE_MAPPING = {
     "mappings": {
         "properties": {
+            "document_id": {"type": "keyword"},
             "document_name": {"type": "text", "analyzer": "english"},
             "document_type": {"type": "keyword"},
+            "primary_doc": {"type": "boolean"},
             "content": {"type": "text", "analyzer": "english"},
             "link_content": {"type": "text", "boost": 0.2, "analyzer": "english"},
         }
     }
 }
 
+# max concurrent gen_record/resolve_id calls per doctype, to be polite to remote apis
+DOCTYPE_CONCURRENCY = {"ArxivDoc": 1, "YoutubeDoc": 2}
+# document_id -> doctype resolutions kept by DocTypeManager
+DOCTYPE_MEMO_SIZE = 100000
+
 # nested dict update
 def update_dict(d, u):
     for k, v in u.items():
@@ -37,6 +47,11 @@ def update_dict(d, u):
 class DocType(ABC):
     """Defines how a document is parsed, indexed."""
 
+    # True if gen_record fetches over the network (see tsar.lib.fetch)
+    remote = False
+    # documents per prefetch batch when ingesting
+    batch_size = 1
+
     # base record schema, search index_mapping
     @property
     @classmethod
@@ -74,6 +89,21 @@ class DocType(ABC):
         """Return document ids from a document source (e.g. folder or query)."""
         pass
 
+    @classmethod
+    def prefetch(cls, document_ids):
+        """Fetch content of document_ids in bulk, ahead of gen_record calls."""
+        pass
+
+    @classmethod
+    def scan_source(cls, source_id, *source_args, **source_kwargs):
+        """Return {document_id: file metadata or None} for documents in a source.
+
+        Metadata (see parse_lib.file_meta_data) lets sync skip unchanged documents;
+        override where it's cheaply available.
+        """
+        document_ids = cls.gen_from_source(source_id, *source_args, **source_kwargs)
+        return {document_id: None for document_id in document_ids}
+
     @staticmethod
     @abstractmethod
     def resolve_id(document_id):
@@ -92,6 +122,19 @@ class DocType(ABC):
         """Returns True if document_id is valid for doc type; expected to be performant."""
         pass
 
+    @classmethod
+    def is_candidate(cls, document_id):
+        """Return False if document_id cannot be of this doc type, by pattern (no io).
+
+        Doc types with costly is_valid checks (e.g. file existence) should override.
+        """
+        return True
+
+    @classmethod
+    def exist(cls, document_ids):
+        """Return list of is_valid results for document_ids; override to batch io."""
+        return [cls.is_valid(document_id) for document_id in document_ids]
+
     @staticmethod
     @abstractmethod
     def preview(record):
@@ -102,33 +145,79 @@ class DocType(ABC):
 class DocTypeManager(object):
     """Resolve document type given document_id."""
 
-    def __init__(self, doctypes):
+    def __init__(self, doctypes, concurrency=DOCTYPE_CONCURRENCY):
         self.doctypes = doctypes
+        self._semaphores = {
+            name: threading.BoundedSemaphore(limit)
+            for name, limit in concurrency.items()
+        }
+        # document_id -> doctype; ids matching no doctype pattern map to None
+        self.memo = LRUCache(maxsize=DOCTYPE_MEMO_SIZE)
+
+    def limit(self, doctype):
+        """Context manager bounding concurrent (remote) calls to doctype."""
+        return self._semaphores.get(doctype.__name__, nullcontext())
 
     def return_doctype(self, document_id):
         """Return best doctype for document_id."""
         if not isinstance(document_id, str):
             raise Exception(f"document_id not a string")
+        doctype = self.return_doctypes([document_id])[document_id]
+        if doctype is None:
+            raise Exception("No associated doctype")
+        return doctype
+
+    def return_doctypes(self, document_ids):
+        """Return {document_id: best doctype or None} for (string) document_ids.
+
+        Resolution is memoized.  Doctypes are tried in order, each checking all its
+        candidate ids (by pattern) in one batch.  Ids that fail only an existence
+        check are not memoized, since they may exist later.
+        """
+        doctypes = {}
+        pending = []
+        for document_id in dict.fromkeys(document_ids):
+            if document_id in self.memo:
+                doctypes[document_id] = self.memo.get(document_id)
+            else:
+                pending.append(document_id)
+
+        has_candidate = set()
         for doctype in self.doctypes.values():
-            if doctype.is_valid(document_id):
-                return doctype
-        raise Exception("No associated doctype")
+            candidates = [d for d in pending if doctype.is_candidate(d)]
+            if not candidates:
+                continue
+            has_candidate.update(candidates)
+            valid = set(d for d, v in zip(candidates, doctype.exist(candidates)) if v)
+            for document_id in valid:
+                doctypes[document_id] = doctype
+                self.memo.put(document_id, doctype)
+            pending = [d for d in pending if d not in valid]
+
+        for document_id in pending:
+            doctypes[document_id] = None
+            if document_id not in has_candidate:
+                self.memo.put(document_id, None)
+        return doctypes
 
     def gen_record(self, document_id, primary_doc, gen_links):
         """Source the correct doctype, generate a record for document_id."""
         doctype = self.return_doctype(document_id)
-        record = doctype.gen_record(document_id, primary_doc, gen_links)
+        with self.limit(doctype):
+            record = doctype.gen_record(document_id, primary_doc, gen_links)
 
         # discard links with no valid doctype
         if gen_links:
             valid_links = set()
-            for link_id in record["links"]:
+            link_ids = [link for link in record["links"] if isinstance(link, str)]
+            for link_id, doc_type in self.return_doctypes(link_ids).items():
+                if doc_type is None:
+                    continue
                 try:
-                    doc_type = self.return_doctype(link_id)
                     resolved_link = self.resolve_document_id(link_id, doc_type=doc_type)
                     valid_links.add(resolved_link)
                 except Exception:
-                    # no associated doctype; discard link
+                    # unresolvable link; discard
                     pass
             record["links"] = list(valid_links)
         return record
@@ -136,6 +225,7 @@ class DocTypeManager(object):
     def resolve_document_id(self, link_id, doc_type=None):
         """Resolve document_id using doctype_resolver for link ids."""
         if doc_type is None:
-            doctype = self.return_doctype(link_id)
-        resolved_doc_id = doc_type.resolve_id(link_id)
+            doc_type = self.return_doctype(link_id)
+        with self.limit(doc_type):
+            resolved_doc_id = doc_type.resolve_id(link_id)
         return resolved_doc_id
@@ -17,6 +17,7 @@ logger.addHandler(handler)
 class MarkdownDoc(DocType):
     """Markdown document type."""
 
+    batch_size = 64
     schema = BASE_SCHEMA
     index_mapping = {"mappings": {"properties": {"document_name": {"type": "text",},}}}
     index_mapping = update_dict(index_mapping, BASE_MAPPING)
@@ -74,6 +75,20 @@ class MarkdownDoc(DocType):
         doc_ids = [MarkdownDoc.resolve_id(doc_id) for doc_id in doc_ids]
         return doc_ids
 
+    @classmethod
+    def prefetch(cls, document_ids):
+        """Fetch file contents in bulk from the file server (if not mounted locally)."""
+        parse_lib.prefetch_file_contents(document_ids)
+
+    @classmethod
+    def scan_source(cls, source_id, extensions=[".md"]):
+        """Return {document_id: file metadata} for markdown docs in folder source_id."""
+        files_meta = parse_lib.return_files_meta(source_id, extensions=extensions)
+        metas = {
+            MarkdownDoc.resolve_id(doc_id): meta for doc_id, meta in files_meta.items()
+        }
+        return metas
+
     @staticmethod
     def resolve_id(document_id):
         return parse_lib.resolve_path(document_id)
@@ -85,10 +100,25 @@ class MarkdownDoc(DocType):
     @staticmethod
     def is_valid(document_id, extensions=[".md"]):
 
-        cond1 = parse_lib.exists_on_fs(parse_lib.host_path_to_url(document_id))
+        cond1 = MarkdownDoc.is_candidate(document_id, extensions=extensions)
+        cond2 = cond1 and parse_lib.exists_on_fs(
+            parse_lib.host_path_to_url(document_id)
+        )
+        return bool(cond1 and cond2)
+
+    @classmethod
+    def is_candidate(cls, document_id, extensions=[".md"]):
+        """Markdown documents are file paths (not urls) with a markdown extension."""
+        cond1 = "://" not in document_id
         cond2 = os.path.splitext(document_id)[-1] in extensions
         return bool(cond1 and cond2)
 
+    @classmethod
+    def exist(cls, document_ids):
+        """Check file existence in one request per folder."""
+        exist = parse_lib.files_exist(document_ids)
+        return [MarkdownDoc.is_candidate(d) and e for d, e in zip(document_ids, exist)]
+
     @staticmethod
     def preview(record):
 
@@ -6,10 +6,12 @@ import html2text
 import requests
 from tsar.doctypes.doctype import DocType, update_dict, BASE_SCHEMA, BASE_MAPPING
 from tsar.lib import parse_lib
+from tsar.lib.fetch import fetcher
 
 
 class WebpageDoc(DocType):
     """Generic url/html document type."""
+    remote = True
     schema = BASE_SCHEMA
     index_mapping = BASE_MAPPING
 
@@ -20,7 +22,8 @@ class WebpageDoc(DocType):
         # example document_id: https://www.bookbub.com/blog/free-short-stories-online
         """
         h = html2text.HTML2Text()
-        res = requests.get(document_id)
+        res = fetcher.get(document_id)
+        res.raise_for_status()
         text = h.handle(res.content.decode())
 
         # get title:
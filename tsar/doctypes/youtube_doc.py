@@ -9,11 +9,13 @@ from youtube_transcript_api._errors import (
 )
 from tsar.doctypes.doctype import DocType, update_dict, BASE_SCHEMA, BASE_MAPPING
 from tsar.lib import parse_lib
+from tsar.lib.fetch import fetcher
 
 
 class YoutubeDoc(DocType):
     """Doc type for youtube videos."""
 
+    remote = True
     schema = {
         "publish_date": float,
     }
@@ -38,14 +40,14 @@ class YoutubeDoc(DocType):
         # example document_id: https://www.youtube.com/watch?v=3LtQWxhqjqI
         """
         video_id = document_id.split("v=")[-1]
-        try:
-            transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
-            text = " ".join([d["text"] for d in transcript_data])
-        except (NoTranscriptAvailable, NoTranscriptFound, TranscriptsDisabled) as err:
+        transcript_key = f"youtube_transcript:{video_id}"
+        text = fetcher.memoize(transcript_key, get_transcript, video_id)
+        if text is None:
             text = "(no transcript available)"
 
         # get title:
-        res = requests.get(document_id)
+        res = fetcher.get(document_id)
+        res.raise_for_status()
         soup = BeautifulSoup(markup=res.text, features="html.parser")
         title = soup.find("title").text
         links = []
@@ -105,3 +107,12 @@ class YoutubeDoc(DocType):
             f"Preview: {record['content'][0:1200]}"
         )
         return preview
+
+
+def get_transcript(video_id):
+    """Return transcript text of a youtube video, or None if not available."""
+    try:
+        transcript_data = YouTubeTranscriptApi.get_transcript(video_id)
+    except (NoTranscriptAvailable, NoTranscriptFound, TranscriptsDisabled):
+        return None
+    return " ".join([d["text"] for d in transcript_data])
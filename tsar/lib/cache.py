@@ -0,0 +1,90 @@
+"""
+In-memory caches shared by tsar modules.
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe, bounded mapping that evicts least recently used entries.
+
+    Bounded by number of entries, and optionally by total size: sizeof(value) returns
+    an entry's size (e.g. bytes), summed up to max_bytes.  Lookups are counted so the
+    hit rate can be reported with `info`.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.n_bytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return value for key (marking it recently used), else default."""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Add or replace key, evicting least recently used entries if full.
+
+        Values larger than max_bytes aren't stored.
+        """
+        size = 0 if self.sizeof is None else self.sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self.n_bytes += size
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self.n_bytes > self.max_bytes
+            ):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key, default=None):
+        value = self._data.pop(key, default)
+        self.n_bytes -= self._sizes.pop(key, 0)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.n_bytes = 0
+
+    def info(self):
+        """Return cache size and hit statistics."""
+        lookups = self.hits + self.misses
+        info = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.n_bytes,
+            "max_bytes": self.max_bytes,
+        }
+        return info
@@ -7,39 +7,189 @@
 import logging
 import os
 import json
+import itertools
+import shutil
+import sqlite3
+import threading
+import numpy as np
 import pandas as pd
-from pickle import UnpicklingError
+from contextlib import contextmanager, nullcontext
 from requests.exceptions import HTTPError
 from tsar.doctypes import DOCTYPES
 from tsar.doctypes.doctype import update_dict, DocTypeManager
 from tsar.doctypes.arxiv_doc import ArxivDoc
 from tsar.doctypes.markdown_doc import MarkdownDoc
 from tsar import COLLECTIONS_FOLDER, LOG_FOLDER
+from tsar.config import QUERY_RESULT_SIZE
 from tsar.lib.parse_lib import resolve_path
+from tsar.lib.record_store import (
+    RecordLog,
+    log_path,
+    is_arrow,
+    is_pickle,
+    open_snapshot,
+    read_snapshot,
+    write_snapshot,
+    snapshot_columns,
+    snapshot_id,
+    snapshot_value_bytes,
+    arrow_to_py,
+    COMPACT_MIN_ENTRIES,
+    LAZY_COLUMNS,
+    SNAPSHOT_SUFFIX,
+    LEGACY_SNAPSHOT_SUFFIX,
+)
 from tsar.lib import search
 from tsar.lib.search import return_index_name
+from tsar.lib.ingest import Ingester, gen_progress
+from tsar.lib.link_graph import LinkGraph, GRAPH_NAME
+from tsar.lib.stats import CollectionStats, STATS_NAME, content_bytes
+from tsar.lib.manifest import (
+    SourceManifest,
+    content_hash,
+    source_key,
+    MANIFESTS_FOLDER,
+)
+from tsar.lib.cache import LRUCache
+from tsar.lib.writer import CollectionWriter
 import datetime
+import fnmatch
+import time
 from requests import HTTPError
 
-REGISTER_PATH = os.path.join(COLLECTIONS_FOLDER, "collection_register.pkl")
+REGISTER_PATH = os.path.join(COLLECTIONS_FOLDER, "collection_register.db")
+# pickled register of earlier versions, migrated on first use
+LEGACY_REGISTER_PATH = os.path.join(COLLECTIONS_FOLDER, "collection_register.pkl")
+REGISTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    collection_id TEXT PRIMARY KEY,
+    record TEXT
+);
+"""
+# query results cached per collection (see Collection.query_records)
+QUERY_CACHE_SIZE = 512
+# seconds after a write before search results reflect it (elasticsearch refresh)
+INDEX_REFRESH_SECONDS = 1.0
+# query result order; document_id breaks ties, so pages (search_after) are stable
+QUERY_SORT = [{"_score": "desc"}, {"document_id": "asc"}]
 
 logger = logging.getLogger(__name__)
 handler = logging.FileHandler(os.path.join(LOG_FOLDER, "collection.log"))
 logger.addHandler(handler)
 
 
+def format_summary(summary):
+    """Return formatted text of a collection summary (see Collection.gen_summary)."""
+    doc_count_str = ", ".join(
+        sorted([f"{n} {name}" for name, n in summary["doc_types_count"].items()])
+    )
+    link_median = round(summary["link_count_median"], 1)
+    link_mean = round(summary["link_count_mean"], 1)
+    summary_str = (
+        f"Collection: {summary['collection_id']}\n\n"
+        f"doc count:        {summary['n_docs']} ({doc_count_str})\n"
+        f"link count:       median: {link_median}, mean: {link_mean}\n"
+        f"content size:     {round(summary['content_bytes'] / 1024 ** 2, 1)} MB\n"
+    )
+    return summary_str
+
+
 class Data(object):
-    """Database for parsed document records."""
+    """Database for parsed document records.
+
+    Once written to (or read from) a path, record changes are appended to a RecordLog;
+    `write` compacts the log into a new snapshot.  Columns of a snapshot that are not
+    needed yet (lazy_columns) stay memory-mapped until used; use `select` to read
+    only some columns.  Their values for records changed since the snapshot was read
+    (including replayed log entries) are kept aside until then.  Written snapshots
+    are copied from the memory-mapped snapshot and those values, and lazy columns are
+    released once written.
+    """
 
-    def __init__(self, df, index_field="document_id"):
+    def __init__(
+        self, df, index_field="document_id", snapshot=None, lazy_columns=LAZY_COLUMNS
+    ):
         if df.index.name != index_field:
             raise ValueError(f"index field required to be `{index_field}`")
-        self.df = df
+        self.index_field = index_field
+        self.lazy_columns = lazy_columns
+        self.path = None
+        self.log = None
+        # id of the snapshot at path (see position)
+        self.snapshot_id = None
+        # serializes snapshot writes, which run without the caller's lock (see write)
+        self._write_lock = threading.Lock()
+        self._df = df
+        # memory-mapped table of columns not yet loaded into df
+        self._snapshot = snapshot
+        self._columns = list(df.columns)
+        # document_ids of the snapshot rows
+        self._snapshot_index = None
+        # {document_id: {lazy column: value}} of records changed since the snapshot
+        self._overlay = {}
+        if snapshot is not None:
+            self._columns = snapshot_columns(snapshot, index_field)
+            self._snapshot_index = df.index
 
     def __repr__(self):
         value = "data:\n" + self.df.__repr__()
         return value
 
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def df(self):
+        """Records DataFrame; loads any lazy columns."""
+        self._load_columns(self._columns)
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self._columns = list(df.columns)
+        self._snapshot = None
+        self._snapshot_index = None
+        self._overlay = {}
+
+    @property
+    def columns(self):
+        """Record columns, without loading lazy columns."""
+        return list(self._columns)
+
+    @property
+    def index(self):
+        """document_id index, without loading lazy columns."""
+        return self._df.index
+
+    def select(self, columns):
+        """Return df of (only) columns, reading lazy columns if needed."""
+        self._load_columns(columns)
+        return self._df[list(columns)]
+
+    def _load_columns(self, columns):
+        if self._snapshot is None:
+            return
+        missing = [col for col in columns if col not in self._df.columns]
+        if missing:
+            loaded = read_snapshot(
+                self.path,
+                columns=missing,
+                index_field=self.index_field,
+                table=self._snapshot,
+            )
+            # rows added/removed since the snapshot was read
+            loaded = loaded.reindex(self._df.index)
+            for document_id, values in self._overlay.items():
+                for col in missing:
+                    loaded.at[document_id, col] = values[col]
+            df = pd.concat([self._df, loaded], axis=1)
+            self._df = df[[col for col in self._columns if col in df.columns]]
+        if len(self._df.columns) == len(self._columns):
+            self._snapshot = None
+            self._snapshot_index = None
+            self._overlay = {}
+
     @classmethod
     def new(cls, record_schema, index_field="document_id"):
         if index_field not in record_schema.keys():
@@ -51,65 +201,242 @@ class Data(object):
         return cls(df)
 
     @classmethod
-    def read(cls, path):
-        df = pd.read_pickle(path)
-        return cls(df=df)
+    def read(cls, path, lazy_columns=LAZY_COLUMNS):
+        """Read snapshot at path and replay its record log.
+
+        Legacy pickle snapshots are migrated to an arrow snapshot next to them (with
+        SNAPSHOT_SUFFIX); the returned Data's `path` is the snapshot path in use.
+        """
+        path = resolve_path(path)
+        log = RecordLog(log_path(path))
+        entries = log.replay()
+
+        if is_arrow(path):
+            snapshot = open_snapshot(path)
+            columns = [
+                col for col in snapshot_columns(snapshot) if col not in lazy_columns
+            ]
+            df = read_snapshot(path, columns=columns, table=snapshot)
+            data = cls(df=df, snapshot=snapshot, lazy_columns=lazy_columns)
+            data.snapshot_id = snapshot_id(snapshot)
+        else:
+            data = cls(df=read_snapshot(path), lazy_columns=lazy_columns)
+
+        for op, document_id, record in entries:
+            if op == "upsert":
+                data._update_df(record)
+            else:
+                # already removed if the snapshot was written after the entry
+                data._rm_df(document_id, errors="ignore")
+        data._bind(path, log)
+
+        if not is_arrow(path):
+            new_path = os.path.splitext(path)[0] + SNAPSHOT_SUFFIX
+            data.write(new_path)
+            log.remove()
+            os.remove(path)
+            logger.info(f"migrated records snapshot {path} to {new_path}")
+        return data
+
+    def _bind(self, path, log=None):
+        """Append subsequent record changes to the log at path."""
+        if self.log is not None and self.log.path != log_path(path):
+            self.log.close()
+            self.log = None
+        if log is None:
+            log = self.log if self.log is not None else RecordLog(log_path(path))
+        self.path = path
+        self.log = log
 
-    def write(self, path, force=True):
-        """Write/save current state of the database to file."""
+    def write(self, path, force=True, lock=None):
+        """Write/save current state of the database to file; compacts the record log.
+
+        lock: held (e.g. Collection.lock) while the records are copied and the new
+        snapshot is bound, but not while it's written (so the caller must not hold it);
+        changes made meanwhile are kept in the record log.
+        """
         path = resolve_path(path)
         path_exists = os.path.exists(path)
         if path_exists and not force:
             raise OSError("file already exists!")
-        elif path_exists and force:
-            self.df.to_pickle(path)
         elif not path_exists:
             db_folder = os.path.dirname(path)
             os.makedirs(db_folder, exist_ok=True)
-            self.df.to_pickle(path)
+        lock = nullcontext() if lock is None else lock
+
+        with self._write_lock:
+            with lock:
+                # a copy (without lazy columns), as records may change while written
+                frozen = {
+                    "df": self._df.copy(),
+                    "columns": list(self._columns),
+                    "table": self._snapshot,
+                    "table_index": self._snapshot_index,
+                    "overlay": dict(self._overlay),
+                }
+                if self.path != path or self.log is None:
+                    self._bind(path)
+                    self.log.truncate()
+                offset, n_entries = self.log.offset(), self.log.n_entries
+
+            # replace snapshot atomically; if the log isn't compacted (e.g. a crash),
+            # its entries are replayed onto the new snapshot, which is idempotent (see
+            # read)
+            tmp_path = f"{path}.tmp"
+            new_snapshot_id = write_snapshot(
+                frozen["df"],
+                tmp_path,
+                columns=frozen["columns"],
+                table=frozen["table"],
+                table_index=frozen["table_index"],
+                overlay=frozen["overlay"],
+            )
+            with lock:
+                os.replace(tmp_path, path)
+                self.log.drop_head(offset, n_entries)
+                self.snapshot_id = new_snapshot_id
+                self._rebind_snapshot(frozen["df"].index)
+
+    def _rebind_snapshot(self, snapshot_index):
+        """Read lazy columns from the written snapshot (rows snapshot_index), releasing
+        loaded values; values of records changed since are read from the record log.
+        """
+        lazy = [col for col in self._columns if col in self.lazy_columns]
+        self._df = self._df.drop(
+            columns=[col for col in lazy if col in self._df.columns]
+        )
+        self._overlay = {}
+        if not lazy:
+            self._snapshot = None
+            self._snapshot_index = None
+            return
+        self._snapshot = open_snapshot(self.path)
+        self._snapshot_index = snapshot_index
+        for op, document_id, record in self.log_entries():
+            if op == "upsert":
+                self._overlay[document_id] = {
+                    col: record.get(col, np.nan) for col in lazy
+                }
+            else:
+                self._overlay.pop(document_id, None)
+
+    def position(self):
+        """Return [snapshot id, log entries]: the state of the persisted records, e.g.
+        to check if assets derived from them are current.
+        """
+        return [self.snapshot_id, self.log.n_entries]
+
+    def log_entries(self, start=0):
+        """Return record log entries (op, document_id, record), from position start."""
+        entries = RecordLog(self.log.path).replay()
+        return list(itertools.islice(entries, start, None))
+
+    def sync(self, path, lock=None):
+        """Persist changes: compact if log is large or unbound to path, else no-op.
+
+        Changes are already in the log when bound, so this costs O(1) per record;
+        compaction is amortized by only running when the log outgrows the records.
+        """
+        if self.path != resolve_path(path) or self.log is None:
+            self.write(path, lock=lock)
+        elif self.log.n_entries > max(COMPACT_MIN_ENTRIES, len(self)):
+            self.write(path, lock=lock)
 
     @classmethod
     def drop(cls, path):
-        """Remove db file."""
-        if os.path.exists(path):
-            try:
+        """Remove db files: the snapshot at path (or its migrated/legacy counterpart)
+        and their record logs.
+        """
+        base_path = os.path.splitext(path)[0]
+        paths = [path, base_path + SNAPSHOT_SUFFIX, base_path + LEGACY_SNAPSHOT_SUFFIX]
+        for snapshot_path in dict.fromkeys(paths):
+            if os.path.exists(snapshot_path):
                 # verify filetype before deleting
-                _ = cls.read(path)
-                os.remove(path)
-            except UnpicklingError("Aborted: not a database file."):
-                return
-            except FileNotFoundError:
-                logger.exception(f"nothing to delete at {path}")
+                if not (is_arrow(snapshot_path) or is_pickle(snapshot_path)):
+                    logger.error(f"not removing {snapshot_path}: not a database file")
+                    continue
+                os.remove(snapshot_path)
+            RecordLog(log_path(snapshot_path)).remove()
+
+    def _update_df(self, record):
+        document_id = record["document_id"]
+        self._df.loc[document_id] = pd.Series(record)
+        if self._snapshot is not None:
+            self._overlay[document_id] = {
+                col: record.get(col, np.nan)
+                for col in self._columns
+                if col not in self._df.columns
+            }
+
+    def _rm_df(self, document_id, errors="raise"):
+        self._df.drop(document_id, inplace=True, errors=errors)
+        self._overlay.pop(document_id, None)
+
+    def _lazy_value(self, document_id, column):
+        """Return value of a column not loaded yet: changed, else from the snapshot."""
+        if document_id in self._overlay:
+            return self._overlay[document_id][column]
+        position = self._snapshot_index.get_loc(document_id)
+        return arrow_to_py(self._snapshot.column(column)[position])
 
     def update_record(self, record):
         """Add or update a record in the df."""
-        document_id = record["document_id"]
-        self.df.loc[document_id] = pd.Series(record)
+        self._update_df(record)
+        if self.log is not None:
+            self.log.append("upsert", record["document_id"], record)
 
     def return_record(self, document_id):
         """Return record associated with doc_id."""
-        if document_id in self.df.index:
-            record = self.df.loc[document_id].to_dict()
+        if document_id in self._df.index:
+            record = self._df.loc[document_id].to_dict()
             record["document_id"] = document_id
+            # read lazy values for this row only
+            for col in self._columns:
+                if col not in record:
+                    record[col] = self._lazy_value(document_id, col)
         else:
             record = None
         return record
 
+    def return_value(self, document_id, column):
+        """Return a single record value, reading only that value if it is lazy."""
+        if column in self._df.columns:
+            return self._df.at[document_id, column]
+        return self._lazy_value(document_id, column)
+
+    def value_bytes(self, column):
+        """Return utf-8 sizes of (string) column values, without reading lazy values."""
+        if column in self._df.columns:
+            return self._df[column].map(content_bytes)
+        sizes = pd.Series(
+            snapshot_value_bytes(self._snapshot, column), index=self._snapshot_index
+        )
+        sizes = sizes.reindex(self._df.index, fill_value=0)
+        for document_id, values in self._overlay.items():
+            sizes[document_id] = content_bytes(values[column])
+        return sizes
+
     def rm_record(self, document_id):
         """Remove the record associated with doc_id."""
         try:
-            self.df.drop(document_id, inplace=True)
+            self._rm_df(document_id)
         except KeyError:
             logger.exception("warning: no record to remove at {}".format(document_id))
+        else:
+            if self.log is not None:
+                self.log.append("remove", document_id)
 
 
 class Register(object):
     """Collection registry to manage stateful collection assets.
 
-    Read/write from disk every time to ensure state is consistent; invoked through Collection.register
+    Records ({field: value}, json serializable) are stored in sqlite and cached in
+    memory; the cache is re-read when the database file changes (see _file_stamp),
+    e.g. written by another process.  Safe to share between threads (REST server, app).
+    Invoked through Collection.register.
     """
 
-    def __init__(self, path=REGISTER_PATH, schema=None):
+    def __init__(self, path=REGISTER_PATH, schema=None, legacy_path=None):
 
         if schema is None:
             schema = {
@@ -119,50 +446,132 @@ class Register(object):
             }
         self.schema = schema
         self.path = path
-        if not os.path.exists(path):
-            df = pd.DataFrame(columns=self.schema.keys())
-            df.index.name = "collection_id"
-            df.to_pickle(path)
+        if legacy_path is None:
+            legacy_path = os.path.splitext(path)[0] + ".pkl"
+        self.legacy_path = legacy_path
+        self._lock = threading.RLock()
+        # {collection_id: json record}, valid while the file stat matches _stamp
+        self._records = {}
+        self._stamp = None
+        is_new = not os.path.exists(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(REGISTER_SCHEMA)
+        if is_new and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+
+    def _migrate_legacy(self):
+        """Copy records of a pickled register; the pickle is left in place."""
+        df = pd.read_pickle(self.legacy_path)
+        with self._lock, self._conn:
+            for collection_id, row in df.iterrows():
+                record = {k: v for k, v in row.items() if not _is_missing(v)}
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO collections VALUES (?, ?)",
+                    (collection_id, json.dumps(record)),
+                )
+        logger.info(f"migrated {len(df)} collections from {self.legacy_path}")
+
+    def _file_stamp(self):
+        """Return (mtime, size, data_version): changes with writes by any process.
+
+        data_version covers writes within the mtime resolution (a clock tick).
+        """
+        stat = os.stat(self.path)
+        (data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        return stat.st_mtime_ns, stat.st_size, data_version
+
+    def _read(self):
+        """Return cached {collection_id: json record}, re-read if the file changed."""
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                rows = self._conn.execute(
+                    "SELECT collection_id, record FROM collections ORDER BY rowid"
+                ).fetchall()
+                self._records = dict(rows)
+                self._stamp = stamp
+            return self._records
+
+    def _write(self, collection_id, record):
+        """Insert/update (record: dict) or delete (record: None) a collection.
+
+        Updates keep the row (its rowid), so collections stay in registration order.
+        """
+        with self._lock, self._conn:
+            if record is None:
+                self._conn.execute(
+                    "DELETE FROM collections WHERE collection_id = ?", (collection_id,)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE collections SET record = ? WHERE collection_id = ?",
+                    (json.dumps(record), collection_id),
+                )
+                if cursor.rowcount == 0:
+                    self._conn.execute(
+                        "INSERT INTO collections VALUES (?, ?)",
+                        (collection_id, json.dumps(record)),
+                    )
+            # re-read on next access
+            self._stamp = None
+
+    def collection_ids(self):
+        """Return registered collection ids, in registration order."""
+        return list(self._read())
 
     def read_df(self):
-        df = pd.read_pickle(self.path)
+        records = {k: json.loads(v) for k, v in self._read().items()}
+        df = pd.DataFrame.from_dict(records, orient="index")
+        df = df.reindex(columns=list(dict.fromkeys([*self.schema, *df.columns])))
+        df.index.name = "collection_id"
         return df
 
-    def _write(self, df):
-        df.to_pickle(self.path)
-
     def exists(self, collection_id):
-        df = pd.read_pickle(self.path)
-        return True if collection_id in df.index else False
+        return collection_id in self._read()
 
     def add(self, collection_record):
         """Register a collection."""
         collection_id = collection_record.pop("collection_id")
 
-        df = self.read_df()
-        if collection_id in df.index:
-            raise KeyError(f"collection {collection_id} already registered.")
+        with self._lock:
+            if self.exists(collection_id):
+                raise KeyError(f"collection {collection_id} already registered.")
 
-        missing_fields = set(self.schema.keys()) - set(collection_record.keys())
-        if missing_fields:
-            raise ValueError(f"collection_kwargs missing {missing_fields}")
+            missing_fields = set(self.schema.keys()) - set(collection_record.keys())
+            if missing_fields:
+                raise ValueError(f"collection_kwargs missing {missing_fields}")
 
-        df.loc[collection_id] = collection_record
-        self._write(df)
+            self._write(collection_id, collection_record)
 
     def drop(self, collection_id):
         """Unregister a collection."""
-        df = self.read_df()
-        if collection_id in df.index:
-            df = df.drop(collection_id)
-        else:
-            logger.warn(f"collection {collection_id}; not found in registry to remove.")
-        self._write(df)
+        with self._lock:
+            if self.exists(collection_id):
+                self._write(collection_id, None)
+            else:
+                logger.warn(
+                    f"collection {collection_id}; not found in registry to remove."
+                )
+
+    def update(self, collection_id, **fields):
+        """Update fields of a registered collection."""
+        with self._lock:
+            record = self.return_record(collection_id)
+            record.update(fields)
+            self._write(collection_id, record)
 
     def return_record(self, collection_id):
-        """Return collection asset paths."""
-        df = self.read_df()
-        return df.loc[collection_id].to_dict()
+        """Return collection asset paths (a copy); KeyError if not registered."""
+        return json.loads(self._read()[collection_id])
+
+
+def _is_missing(value):
+    """True for NaN/None values of (pickled register) DataFrame cells."""
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        # list-like values
+        return False
 
 
 class Collection(object):
@@ -173,8 +582,9 @@ class Collection(object):
     be global.
     """
 
-    search.Server().start()
-    client = search.Client()
+    # started on the first search request, or earlier with server.start_background()
+    server = search.Server()
+    client = search.Client(server=server)
     _register = Register()
 
     def __init__(
@@ -193,6 +603,29 @@ class Collection(object):
         self.records_db = records_db
         self.configd = configd
         self.registered = self._register.exists(collection_id)
+        # pending bulk index actions; None outside of a bulk_indexing context
+        self._bulk_actions = None
+        # True while index refresh is disabled by bulk_indexing
+        self._refresh_disabled = False
+        # source manifests used by sync_from_source, keyed by (doc_type, source_id)
+        self._manifests = {}
+        # links between records; loaded or built on first use (see link_graph)
+        self._link_graph = None
+        # record statistics; loaded or built on first use (see stats)
+        self._stats = None
+        # primary documents whose indexed link content is stale
+        self._stale_dependents = set()
+        # held while records change (see writer); readers take it briefly
+        self.lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        # applies changes from other threads (REST server, tasks, watchers) in order
+        self.writer = CollectionWriter(self)
+        # services.FolderWatcher of the sources, if watched (see CollectionCache)
+        self.watcher = None
+        # bumped on every change to the records/search index; keys the query cache
+        self.generation = 0
+        self._generation_time = 0.0
+        self.query_cache = LRUCache(maxsize=QUERY_CACHE_SIZE)
 
     @property
     def _collection_id(self):
@@ -216,7 +649,7 @@ class Collection(object):
             collection_schema = update_dict(collection_schema, doc_type.schema)
         records_db = Data.new(collection_schema)
 
-        # create/overwrite temporary search indexes
+        # create/overwrite temporary search indexes: aliases of versioned indices
         _collection_id = f"tmp_{collection_id}"
         search_indices = []
         for doc_type in doc_types:
@@ -225,7 +658,9 @@ class Collection(object):
             # overwrite temp indices of same name if they exist
             if cls.client.index_exists(index_name):
                 cls.client.drop_index(index_name)
-            cls.client.new_index(index_name=index_name, mapping=doc_type.index_mapping)
+            cls.client.new_index_version(
+                index_name, mapping=doc_type.index_mapping, alias=index_name
+            )
 
         configd = {
             "doc_types": [doc_type.__name__ for doc_type in doc_types],
@@ -241,12 +676,21 @@ class Collection(object):
 
     @classmethod
     def registered_collections(cls):
-        colls = cls._register.read_df().index.to_list()
+        colls = cls._register.collection_ids()
         return colls
 
     @classmethod
     def clear_tmp_collections(cls, temp_index_str="tmp_*"):
-        cls.client.drop_index(temp_index_str)
+        """Drop search indices of unregistered collections (tmp_* aliases).
+
+        Registered collections' indices keep the tmp_* name they were created with
+        (see register), so indices with another alias are kept.
+        """
+        indices = cls.client.return_aliases(temp_index_str)
+        indices.update(cls.client.return_index_aliases(temp_index_str))
+        for index_name, aliases in indices.items():
+            if all(fnmatch.fnmatch(alias, temp_index_str) for alias in aliases):
+                cls.client.drop_index(index_name)
 
     def register(self, records_db_path=None, config_path=None, write=True):
         """Register collection/define asset paths.
@@ -260,14 +704,14 @@ class Collection(object):
 
         if records_db_path is None:
             records_db_path = os.path.join(
-                COLLECTIONS_FOLDER, self.collection_id, "records.pkl"
+                COLLECTIONS_FOLDER, self.collection_id, f"records{SNAPSHOT_SUFFIX}"
             )
         if config_path is None:
             config_path = os.path.join(
                 COLLECTIONS_FOLDER, self.collection_id, "config.json"
             )
 
-        # rename temp indexes to collection
+        # rename temp indexes to collection (alias flips)
         search_indices = []
         for doc_type in self.doc_types:
             tmp_index_name = return_index_name(self._collection_id, doc_type.__name__)
@@ -292,8 +736,8 @@ class Collection(object):
             self.write()
 
     def _write_records_db(self, path, force=True):
-        """Write records_db to file."""
-        self.records_db.write(path, force=force)
+        """Write records_db to file; the lock is released while it's written."""
+        self.records_db.write(path, force=force, lock=self.lock)
 
     def _write_config(self, path, force=True):
         """Write config to file."""
@@ -308,9 +752,93 @@ class Collection(object):
         records_db_path = record["records_db_path"]
         config_path = record["config_path"]
 
-        # write assets
+        # write assets; records are written from a copy, without holding the lock
         self._write_records_db(records_db_path, force=force)
-        self._write_config(config_path, force=force)
+        with self.lock:
+            self._write_config(config_path, force=force)
+            for (doc_type_name, source_id), manifest in self._manifests.items():
+                manifest.write(self._manifest_path(doc_type_name, source_id))
+            self._write_link_graph(force=True)
+            self._write_summary()
+            self._write_stats()
+
+    def _records_position(self):
+        """Return position of the persisted records (see Data.position), else None."""
+        records_db = self.records_db
+        if not self.registered or records_db.log is None or not records_db.snapshot_id:
+            return None
+        return self.records_db.position()
+
+    def _write_stats(self):
+        """Write stats (if loaded) with the records position they describe."""
+        if self._stats is not None:
+            self._stats.position = self._records_position()
+            self._stats.write(self._asset_path(STATS_NAME))
+
+    def _write_link_graph(self, force=False):
+        """Write link graph (if loaded) if the records snapshot changed, or force.
+
+        Later record changes are replayed from the record log when it's read.
+        """
+        graph = self._link_graph
+        if graph is None:
+            return
+        position = self._records_position()
+        if force or graph.position is None or graph.position[0] != position[0]:
+            graph.position = position
+            graph.write(self._asset_path(GRAPH_NAME))
+
+    def _write_summary(self):
+        """Store summary in the register, for listing collections without loading."""
+        summary = json.dumps(self.gen_summary())
+        self._register.update(self.collection_id, summary=summary)
+
+    def gen_summary(self):
+        """Return summary dict of the collection (see format_summary)."""
+        with self.lock:
+            summary = {
+                "collection_id": self.collection_id,
+                "doc_types": [doc_type.__name__ for doc_type in self.doc_types],
+                **self.stats.summary(),
+            }
+            return summary
+
+    @classmethod
+    def registered_summary(cls, collection_id):
+        """Return summary stored in the register (see write), None if not written."""
+        summary = cls._register.return_record(collection_id).get("summary")
+        if not isinstance(summary, str):
+            return None
+        return json.loads(summary)
+
+    def commit(self):
+        """Persist changes of the records log, stats and the register summary.
+
+        The link graph is written when the records log was compacted.
+        """
+        self.records_db.sync(self.records_db_path, lock=self.lock)
+        with self.lock:
+            self._write_link_graph()
+            self._write_summary()
+            self._write_stats()
+
+    def close(self):
+        """Release file handles and update the register summary, e.g. to unload.
+
+        Watched sources' pending changes and queued changes (see writer) are applied
+        first.
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.writer.stop()
+        # stats aren't built just to close: if not loaded, the summary written by the
+        # last commit (which loads them) is current
+        if self.registered and self._stats is not None:
+            self._write_summary()
+            self._write_stats()
+        if self.records_db.log is not None:
+            self.records_db.log.close()
 
     @classmethod
     def load(cls, collection_id):
@@ -321,6 +849,10 @@ class Collection(object):
             logger.exception("collection not found in register.")
 
         records_db = Data.read(coll_record["records_db_path"])
+        if records_db.path != coll_record["records_db_path"]:
+            # legacy records snapshot was migrated
+            coll_record["records_db_path"] = records_db.path
+            cls._register.update(collection_id, records_db_path=records_db.path)
         with open(coll_record["config_path"], "r") as fp:
             configd = json.load(fp)
         doc_types = [DOCTYPES[doc_name] for doc_name in configd["doc_types"]]
@@ -331,8 +863,15 @@ class Collection(object):
             records_db=records_db,
         )
         # add register values as attributes
+        coll_record.pop("summary", None)
         for k, v in coll_record.items():
             setattr(coll, k, v)
+        # populate the client's field cache for views (unless still starting)
+        if coll.server.ready:
+            try:
+                coll.client.load_fields(coll.search_indices)
+            except Exception:
+                logger.exception(f"unable to read search fields of {collection_id}")
         return coll
 
     @classmethod
@@ -358,6 +897,7 @@ class Collection(object):
         # remove records_db
         try:
             os.remove(coll_record["records_db_path"])
+            RecordLog(log_path(records_db_path)).remove()
         except FileNotFoundError:
             logger.exception(f"Unable to find {records_db_path} for removal.")
 
@@ -367,6 +907,18 @@ class Collection(object):
         except FileNotFoundError:
             logger.exception(f"Unable to find {config_path} for removal.")
 
+        # remove source manifests
+        manifests_folder = os.path.join(
+            os.path.dirname(records_db_path), MANIFESTS_FOLDER
+        )
+        shutil.rmtree(manifests_folder, ignore_errors=True)
+
+        # remove link graph, stats
+        for asset_name in [GRAPH_NAME, STATS_NAME]:
+            asset_path = os.path.join(os.path.dirname(records_db_path), asset_name)
+            if os.path.exists(asset_path):
+                os.remove(asset_path)
+
         # remove collection indices
         for index_id in search_indices:
             try:
@@ -374,19 +926,96 @@ class Collection(object):
             except Exception:
                 logger.exception(f"warning: unable to remove {index_id}")
 
+    def _asset_path(self, name):
+        """Return path of an asset stored with the records; None if not registered."""
+        if not self.registered:
+            return None
+        return os.path.join(os.path.dirname(self.records_db_path), name)
+
+    @property
+    def link_graph(self):
+        """LinkGraph of record links.
+
+        Read from file if written from the current records snapshot (and updated with
+        the record log entries since), else built from the records' links.
+        """
+        if self._link_graph is None:
+            self._link_graph = self._read_link_graph()
+            if self._link_graph is None:
+                links = self.records_db.select(["links"]).links
+                self._link_graph = LinkGraph.build(links.items())
+        return self._link_graph
+
+    def _read_link_graph(self):
+        """Return the written link graph, if current (see link_graph), else None."""
+        path = self._asset_path(GRAPH_NAME)
+        position = self._records_position()
+        if position is None or not os.path.exists(path):
+            return None
+        graph = LinkGraph.read(path)
+        if graph.position is None or graph.position[0] != position[0]:
+            return None
+        if graph.position[1] > position[1]:
+            return None
+        for op, document_id, record in self.records_db.log_entries(graph.position[1]):
+            if op == "upsert":
+                graph.set_links(document_id, record["links"])
+            else:
+                graph.remove(document_id)
+        return graph
+
+    @property
+    def stats(self):
+        """CollectionStats of the records, updated as records are added/removed.
+
+        Read from file if written at the current records position (see commit), else
+        built from the records, with content sizes read without loading content.
+        """
+        if self._stats is None:
+            path = self._asset_path(STATS_NAME)
+            position = self._records_position()
+            if position is not None and os.path.exists(path):
+                stats = CollectionStats.read(path)
+                if stats.position == position:
+                    self._stats = stats
+        if self._stats is None:
+            df = self.records_db.select(["document_type", "links"])
+            sizes = self.records_db.value_bytes("content")
+            records = (
+                {"document_type": t, "links": l, "content_bytes": n}
+                for t, l, n in zip(df.document_type, df.links, sizes)
+            )
+            self._stats = CollectionStats.build(records)
+        return self._stats
+
     def gen_link_content(self, document_id):
         """Append content from linked docs."""
-        df = self.records_db.df
-        links = df.loc[document_id].links
-        # link content series for link records in df:
-        content_series = df[df.index.isin(links)].content
-        link_content = "\n".join(content_series)
+        index = self.records_db.index
+        # link content for link records in records_db:
+        content = [
+            self.records_db.return_value(link, "content")
+            for link in self.link_graph.links(document_id)
+            if link in index
+        ]
+        link_content = "\n".join(content)
         return link_content
 
+    def backlinks(self, document_id):
+        """Return document_ids of records linking to document_id."""
+        return self.link_graph.backlinks(document_id)
+
     def primary_documents(self):
         """Return index of primary document_ids."""
-        df = self.records_db.df
-        return df[df.primary_doc].index
+        with self.lock:
+            df = self.records_db.select(["primary_doc"])
+            return df[df.primary_doc].index
+
+    def is_primary(self, document_id):
+        """Return True if document_id is a primary document of the collection."""
+        with self.lock:
+            if document_id not in self.records_db.index:
+                return False
+            return bool(self.records_db.return_value(document_id, "primary_doc"))
 
     def add_document(
         self,
@@ -403,12 +1032,36 @@ class Collection(object):
         - optionally, generate records for links, add
             linked content to primary doc search index.
         """
+        records = self.gen_document_records(
+            document_id,
+            primary_doc=primary_doc,
+            doc_type=doc_type,
+            gen_link_records=gen_link_records,
+        )
+        self.commit_document_records(
+            records, index_linked_content=index_linked_content, write=write
+        )
+
+    def gen_document_records(
+        self,
+        document_id,
+        primary_doc=True,
+        doc_type=None,
+        gen_link_records=True,
+        primary_ids=None,
+    ):
+        """Return records for document_id and its links; the document record is last.
+
+        The collection is not modified, so this is safe to run in worker threads.
+        - primary_ids: documents not to generate as link records (default: primary docs)
+        - returns [] if the document's doc_type or record can't be determined
+        """
         if doc_type is None:
             try:
                 doc_type = self.doctype_mgr.return_doctype(document_id=document_id)
             except Exception:
                 logger.exception(f"unable to determine doc_type for {document_id}")
-                return
+                return []
         try:
             record = self.doctype_mgr.gen_record(
                 document_id=document_id, primary_doc=primary_doc, gen_links=True
@@ -417,23 +1070,138 @@ class Collection(object):
             logger.exception(
                 f"Collection.gen_record failed for: document_id: {document_id}, doc_type: {doc_type}"
             )
-            return
+            return []
 
+        records = []
         if gen_link_records:
+            if primary_ids is None:
+                primary_ids = self.primary_documents()
             # don't overwrite primary documents as secondary
-            link_id_set = set(record["links"]) - set(self.primary_documents())
+            link_id_set = set(record["links"]) - set(primary_ids)
             for link_id in list(link_id_set):
                 link_record = self.doctype_mgr.gen_record(
                     document_id=link_id, primary_doc=False, gen_links=True
                 )
-                self.add_record(link_record, index_linked_content=False, write=False)
-        self.add_record(record, index_linked_content=True, write=write)
+                records.append(link_record)
+        records.append(record)
+        return records
+
+    def commit_document_records(self, records, index_linked_content=True, write=True):
+        """Add records generated by gen_document_records to the collection."""
+        if not records:
+            return
+        *link_records, record = records
+        # committed together, so readers don't see the document without its links
+        with self.lock:
+            for link_record in link_records:
+                # primary documents may have been added since records were generated
+                if self.is_primary(link_record["document_id"]):
+                    continue
+                self._add_record(link_record, index_linked_content=False)
+            self._add_record(record, index_linked_content=index_linked_content)
+        self._persist_change()
 
     def add_record(self, record, index_linked_content, write=True):
-        """Add record to collection, write to disk if registered."""
+        """Add record to collection, write to disk if registered.
+
+        Primary documents linking to the record are re-indexed if its content changed
+        (at the end of bulk_indexing, else immediately).
+        """
+        with self.lock:
+            self._add_record(record, index_linked_content)
+        self._persist_change()
+
+    def _add_record(self, record, index_linked_content):
+        """Change records and queue the index action; requires the lock."""
+        document_id = record["document_id"]
+        old_record = self.records_db.return_record(document_id)
+        content_changed = bool(
+            old_record is None or old_record["content"] != record["content"]
+        )
         self.records_db.update_record(record)
+        self.link_graph.set_links(document_id, record["links"])
+        if self._stats is not None:
+            if old_record is not None:
+                self._stats.remove(old_record)
+            self._stats.add(record)
+        self._index_action(self._gen_index_action(record, index_linked_content))
+        self._bump_generation()
+        if index_linked_content:
+            self._stale_dependents.discard(document_id)
+        if content_changed:
+            self._mark_dependents(document_id)
+
+    def remove_record(self, document_id):
+        """Remove (resolved) document_id record from collection."""
+
+        with self.lock:
+            # get doc_type to remove from search index
+            record = self.return_record(document_id)
+            self.records_db.rm_record(document_id)
+            self.link_graph.remove(document_id)
+            if self._stats is not None:
+                self._stats.remove(record)
+            doc_type = record["document_type"]
+            index_name = return_index_name(
+                self._collection_id, doc_type_str=doc_type.__name__
+            )
+            self._index_action(("delete", index_name, document_id, None))
+            self._bump_generation()
+            self._stale_dependents.discard(document_id)
+            self._mark_dependents(document_id)
+        self._persist_change()
+
+    def _persist_change(self):
+        """Sync the records log and send index actions, after a change (which holds
+        the lock) released the lock; e.g. the summary isn't blocked meanwhile.
+        """
         if self.registered:
-            self.records_db.write(self.records_db_path)
+            self.records_db.sync(self.records_db_path, lock=self.lock)
+        if self._bulk_actions is None:
+            self.reindex_dependents()
+        else:
+            self._flush_index(full_only=True)
+
+    def _bump_generation(self):
+        """Invalidate cached query results."""
+        self.generation += 1
+        self._generation_time = time.time()
+
+    def _mark_dependents(self, document_id):
+        """Mark primary documents linking to document_id for re-indexing."""
+        for source_id in self.link_graph.backlinks(document_id):
+            if source_id != document_id and self.is_primary(source_id):
+                self._stale_dependents.add(source_id)
+
+    def reindex_dependents(self):
+        """Re-index primary documents with stale link content; return their count.
+
+        Their index actions are queued together, so they are sent in one bulk request
+        (per search.BULK_BATCH_SIZE actions).
+        """
+        with self.lock:
+            document_ids, self._stale_dependents = self._stale_dependents, set()
+            document_ids = [d for d in document_ids if d in self.records_db.index]
+        if not document_ids:
+            return 0
+        with self.bulk_indexing():
+            for document_id in document_ids:
+                with self.lock:
+                    record = self.records_db.return_record(document_id)
+                    if record is None:
+                        continue
+                    self._index_action(
+                        self._gen_index_action(record, index_linked_content=True)
+                    )
+                self._flush_index(full_only=True)
+        logger.info(f"re-indexed {len(document_ids)} documents with changed links")
+        return len(document_ids)
+
+    def _gen_index_action(self, record, index_linked_content, index_name=None):
+        """Return search index action (op_type, index_name, document_id, source).
+
+        index_name: defaults to the collection index (alias) of the record's doc_type.
+        """
         doc_type = record["document_type"]
         if index_linked_content:
             link_content = self.gen_link_content(record["document_id"])
@@ -442,78 +1210,343 @@ class Collection(object):
         (document_id, record_index) = doc_type.gen_search_index(
             record, link_content=link_content
         )
-        index_name = return_index_name(
-            self._collection_id, doc_type_str=doc_type.__name__
-        )
-        self.client.index_record(
-            document_id=document_id, record_index=record_index, index_name=index_name
-        )
+        # fields for query filters/sorting (see query_page), common to all doctypes
+        record_index = {
+            **record_index,
+            "document_id": document_id,
+            "primary_doc": bool(record.get("primary_doc", True)),
+        }
+        if index_name is None:
+            index_name = return_index_name(
+                self._collection_id, doc_type_str=doc_type.__name__
+            )
+        return ("index", index_name, document_id, record_index)
 
-    def remove_record(self, document_id):
-        """Remove (resolved) document_id record from collection."""
+    def _index_action(self, action):
+        """Apply a search index action, or queue it inside bulk_indexing.
 
-        # get doc_type to remove from search index
-        record = self.return_record(document_id)
-        self.records_db.rm_record(document_id)
-        if self.registered:
-            self.records_db.write(self.records_db_path)
-        doc_type = record["document_type"]
-        index_name = return_index_name(
-            self._collection_id, doc_type_str=doc_type.__name__
-        )
-        self.client.delete_record(document_id, index_name=index_name)
+        Queued actions are sent per search.BULK_BATCH_SIZE after the change releases
+        the lock (see _persist_change).
+        """
+        if self._bulk_actions is not None:
+            self._bulk_actions.append(action)
+            return
+        op_type, index_name, document_id, record_index = action
+        if op_type == "delete":
+            self.client.delete_record(document_id, index_name=index_name)
+        else:
+            self.client.index_record(
+                document_id=document_id,
+                record_index=record_index,
+                index_name=index_name,
+            )
+
+    def flush_index(self):
+        """Send queued index actions with the bulk api; return the bulk summary."""
+        return self._flush_index()
+
+    def _flush_index(self, full_only=False):
+        """Send queued index actions, taken under the lock, after releasing it.
+
+        full_only: only if a batch (search.BULK_BATCH_SIZE) is queued, else None.
+        """
+        with self.lock:
+            actions = self._bulk_actions or []
+            if full_only and len(actions) < search.BULK_BATCH_SIZE:
+                return None
+            self._bulk_actions = [] if self._bulk_actions is not None else None
+            # batches are sent in the order they're taken
+            self._flush_lock.acquire()
+        try:
+            summary = self.client.bulk(actions)
+        finally:
+            self._flush_lock.release()
+        if summary["failed"]:
+            print(f"{len(summary['failed'])} documents failed to index; see log.")
+        return summary
+
+    @contextmanager
+    def bulk_indexing(self, refresh=False):
+        """Queue search index actions and send them with the bulk api.
+
+        Dependents of changed records (see add_record) are re-indexed on exit.
+        With refresh=False index refresh is disabled while loading, then restored.
+        Nested contexts share the outermost queue; a nested refresh=False context
+        (e.g. an Ingester run by the writer) disables refresh until the outermost
+        context exits.
+        """
+        if self._bulk_actions is not None:
+            if not refresh:
+                self._disable_refresh()
+            yield
+            return
+        self._bulk_actions = []
+        if not refresh:
+            self._disable_refresh()
+        try:
+            yield
+        finally:
+            try:
+                self.reindex_dependents()
+                self.flush_index()
+            finally:
+                self._bulk_actions = None
+                self._restore_refresh()
+                self._bump_generation()
+
+    def _disable_refresh(self):
+        if not self._refresh_disabled:
+            for index_name in self.search_indices:
+                self.client.set_refresh_interval(index_name, "-1")
+            self._refresh_disabled = True
+
+    def _restore_refresh(self):
+        if self._refresh_disabled:
+            self._refresh_disabled = False
+            for index_name in self.search_indices:
+                self.client.set_refresh_interval(index_name, None)
+                self.client.refresh(index_name)
 
     def return_record(self, document_id):
-        return self.records_db.return_record(document_id)
+        with self.lock:
+            return self.records_db.return_record(document_id)
 
-    def _raw_query(self, query_str):
-        """Return raw query result json."""
+    def _raw_query(self, query_str, **query_kwargs):
+        """Return raw query result json; see Client.query for query_kwargs."""
         query_results = self.client.query(
-            index_list=self.search_indices, query_str=query_str
+            index_list=self.search_indices, query_str=query_str, **query_kwargs
         )
         return query_results
 
-    def query_records(self, query_str, primary_docs_only=True):
-        """return record ids from query_str."""
-        res = self._raw_query(query_str)
+    def query_records(self, query_str, primary_docs_only=True, size=QUERY_RESULT_SIZE):
+        """return record ids from query_str: {document_id: score} of the top results.
+
+        Results are cached until the collection changes (see generation); results
+        within INDEX_REFRESH_SECONDS of a change aren't cached, as they may be stale.
+        """
+        key = (self.generation, query_str, primary_docs_only, size)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        generation = self.generation
+        record_score_dict, _ = self.query_page(
+            query_str, primary_docs_only=primary_docs_only, size=size
+        )
+        is_refreshed = time.time() - self._generation_time > INDEX_REFRESH_SECONDS
+        if generation == self.generation and is_refreshed:
+            self.query_cache.put(key, dict(record_score_dict))
+        return record_score_dict
+
+    def query_cache_info(self):
+        """Return query cache statistics (hits, misses, hit_rate, size)."""
+        return {**self.query_cache.info(), "generation": self.generation}
+
+    def query_page(
+        self, query_str, primary_docs_only=True, size=QUERY_RESULT_SIZE, after=None
+    ):
+        """Return ({document_id: score}, next page's `after` or None) for a query.
+
+        Pages are in QUERY_SORT order: pass `after` from a page to get the next one.
+        primary_docs_only is applied as a query filter; indices created before
+        primary_doc was indexed are filtered afterwards (reindex to update them).
+        """
+        if not self.query_fields_indexed():
+            return self._query_page_unindexed(query_str, primary_docs_only, size)
+        filters = [{"term": {"primary_doc": True}}] if primary_docs_only else None
+        res = self._raw_query(
+            query_str,
+            num_results=size,
+            filters=filters,
+            sort=QUERY_SORT,
+            search_after=after,
+        )
+        results = res["hits"]["hits"]
+        record_score_dict = {r["_id"]: r["_score"] for r in results}
+        next_after = results[-1]["sort"] if len(results) == size else None
+        return record_score_dict, next_after
+
+    def _query_page_unindexed(self, query_str, primary_docs_only, size):
+        res = self._raw_query(query_str, num_results=size)
         results = res["hits"]["hits"]
         record_score_dict = {r["_id"]: r["_score"] for r in results}
         if primary_docs_only:
-            primary_ids = set(self.primary_documents())
             record_score_dict = {
-                k: v for k, v in record_score_dict.items() if k in primary_ids
+                k: v for k, v in record_score_dict.items() if self.is_primary(k)
             }
-        return record_score_dict
+        return record_score_dict, None
+
+    def query_fields_indexed(self):
+        """Return True if primary_doc, document_id are mapped in all search indices."""
+        fields = [self.client.return_fields(i) for i in self.search_indices]
+        return all(
+            f.get("primary_doc", {}).get("type") == "boolean"
+            and f.get("document_id", {}).get("type") == "keyword"
+            for f in fields
+        )
+
+    def search_fields(self):
+        """Return sorted field names of the collection's search indices (cached)."""
+        return self.client.merged_fields(self.search_indices)
 
-    def add_from_source(self, doc_type, source_id, *source_args, **source_kwargs):
-        """Add doc_type records from source_id."""
+    def add_from_source(
+        self, doc_type, source_id, *source_args, progress=None, **source_kwargs
+    ):
+        """Add doc_type records from source_id; see Ingester for progress.
+
+        Documents are fetched/parsed concurrently by the calling thread (e.g. a job)
+        and committed in bulk by the writer, so other changes aren't queued behind the
+        ingest.  The source is recorded in configd["sources"] (e.g. to be watched).
+        """
+        self.writer.call(
+            self._add_source, doc_type, source_id, source_args, source_kwargs
+        )
         doc_type = DOCTYPES[doc_type]
         document_ids = doc_type.gen_from_source(
             source_id, *source_args, **source_kwargs
         )
-        for document_id in document_ids:
-            try:
-                self.add_document(
-                    document_id=document_id, doc_type=doc_type, write=False
-                )
-            except Exception as e:
-                print(f"error processing {document_id} as type {doc_type}:", e)
+        ingester = Ingester(self, progress=progress, writer=self.writer)
+        summary = ingester.run(document_ids, doc_type=doc_type)
         if self.registered:
-            self.write()
+            self.writer.call(self.write)
+        return summary
 
-    def remove_from_source(self, doc_type, source_id, *source_args, **source_kwargs):
-        """remove records associated with source_id."""
+    def remove_from_source(
+        self, doc_type, source_id, *source_args, progress=None, **source_kwargs
+    ):
+        """remove records associated with source_id; return progress summary.
+
+        progress: optional callable receiving a gen_progress dict per document.
+        """
         doc_type = DOCTYPES[doc_type]
-        document_ids = doc_type.gen_from_source(
-            source_id, *source_args, **source_kwargs
+        document_ids = list(
+            doc_type.gen_from_source(source_id, *source_args, **source_kwargs)
         )
-        for document_id in document_ids:
-            try:
-                self.remove_record(document_id=document_id)
-            except Exception as e:
-                print(f"error processing {document_id} as type {doc_type}:", e)
+        start_time = time.time()
+        done, failed = 0, 0
+        with self.bulk_indexing():
+            for document_id in document_ids:
+                try:
+                    self.remove_record(document_id=document_id)
+                except Exception as e:
+                    print(f"error processing {document_id} as type {doc_type}:", e)
+                    failed += 1
+                done += 1
+                if progress is not None:
+                    progress(gen_progress(done, failed, len(document_ids), start_time))
         if self.registered:
             self.write()
+        return gen_progress(done, failed, len(document_ids), start_time)
+
+    def sync_from_source(
+        self, doc_type, source_id, *source_args, progress=None, **source_kwargs
+    ):
+        """Add, update and remove doc_type records to match source_id; return summary.
+
+        Only documents added, changed or removed since the last sync are processed:
+        documents are compared by file metadata (mtime, size) against the source's
+        manifest, then by content hash after parsing.  The source is recorded in
+        configd["sources"].
+        """
+        metas = DOCTYPES[doc_type].scan_source(source_id, *source_args, **source_kwargs)
+        _, _, removed = self.source_manifest(doc_type, source_id).diff(metas)
+        self._add_source(doc_type, source_id, source_args, source_kwargs)
+        summary = self.sync_documents(
+            doc_type, source_id, metas, removed=removed, progress=progress
+        )
+        if self.registered:
+            self._write_config(self.config_path)
+        return summary
+
+    def sync_documents(self, doc_type, source_id, metas, removed=(), progress=None):
+        """Sync some documents of a source (e.g. from file events); return summary.
+
+        - metas: {document_id: file metadata or None} of added/changed documents
+        - removed: document_ids no longer in the source
+        Records are persisted through the records log, so (unlike write) the cost
+        is proportional to the documents synced.
+        """
+        doc_type_name = doc_type
+        doc_type = DOCTYPES[doc_type]
+        manifest = self.source_manifest(doc_type_name, source_id)
+        added, changed, _ = manifest.diff(metas)
+        removed = list(removed)
+        changed_ids = set(changed)
+        counts = {
+            "added": 0,
+            "changed": 0,
+            "removed": len(removed),
+            "unchanged": len(metas) - len(added) - len(changed),
+        }
+
+        # content hashes of documents to commit; in the manifest once committed, so
+        # documents that failed to commit are synced again
+        digests = {}
+
+        def should_commit(document_id, records):
+            digest = content_hash(records[-1]["content"])
+            unchanged = bool(
+                manifest.content_hash(document_id) == digest
+                and document_id in self.records_db.index
+            )
+            if unchanged:
+                manifest.update(document_id, metas[document_id], digest)
+                counts["unchanged"] += 1
+            else:
+                digests[document_id] = digest
+            return not unchanged
+
+        def on_commit(document_id, records):
+            manifest.update(document_id, metas[document_id], digests.pop(document_id))
+            if document_id in changed_ids:
+                counts["changed"] += 1
+            else:
+                counts["added"] += 1
+
+        ingester = Ingester(
+            self, progress=progress, should_commit=should_commit, on_commit=on_commit
+        )
+        summary = ingester.run(added + changed, doc_type=doc_type)
+        if removed:
+            with self.bulk_indexing():
+                for document_id in removed:
+                    if document_id in self.records_db.index:
+                        self.remove_record(document_id=document_id)
+                    manifest.remove(document_id)
+
+        if self.registered:
+            manifest.write(self._manifest_path(doc_type_name, source_id))
+        summary.update(counts)
+        return summary
+
+    def _manifest_path(self, doc_type_name, source_id):
+        """Return manifest path of a source; None if not registered."""
+        if not self.registered:
+            return None
+        manifest_name = f"{source_key(doc_type_name, source_id)}.json"
+        folder = os.path.dirname(self.records_db_path)
+        return os.path.join(folder, MANIFESTS_FOLDER, manifest_name)
+
+    def source_manifest(self, doc_type_name, source_id):
+        """Return (cached) SourceManifest of a source."""
+        key = (doc_type_name, source_id)
+        if key not in self._manifests:
+            path = self._manifest_path(doc_type_name, source_id)
+            self._manifests[key] = SourceManifest.read(path)
+        return self._manifests[key]
+
+    def _add_source(self, doc_type_name, source_id, source_args, source_kwargs):
+        """Record an added/synced source in configd, and watch it if watched."""
+        source = {
+            "doc_type": doc_type_name,
+            "source_id": source_id,
+            "args": list(source_args),
+            "kwargs": source_kwargs,
+        }
+        sources = self.configd.setdefault("sources", [])
+        if source not in sources:
+            sources.append(source)
+        if self.watcher is not None:
+            self.watcher.watch_source(source)
 
     def preview(self):
         """Return formatted text preview of collection.
@@ -521,58 +1554,70 @@ class Collection(object):
         prompt-toolkit won't recognize '\t', so this string is manually formatted.
         Consider improving with str.format() with args.
         """
-        df = self.records_db.df
-        fields = sorted(df.columns)
-        _doc_count = df.document_type.value_counts().reset_index(name="counts")
-        _link_df = df.links.apply(lambda x: len(x))
-
-        doc_count_str = ", ".join(
-            sorted([f"{row[1]} {row[0].__name__}" for row in _doc_count.values])
-        )
-        fields = set()
-        for index in self.search_indices:
-            index_fields = self.client.return_fields(index)
-            fields.update(index_fields.keys())
-        search_idx_fields = sorted(fields)
-
+        search_idx_fields = self.search_fields()
         preview_str = (
-            f"Collection: {self.collection_id}\n\n"
-            f"doc count:        {len(df)} ({doc_count_str})\n"
-            f"link count:       median: {round(_link_df.median(),1)}, mean: {round(_link_df.mean(),1)}\n"
-            f"fields:           {' | '.join(df.columns.to_list())}\n"
+            format_summary(self.gen_summary())
+            + f"fields:           {' | '.join(self.records_db.columns)}\n"
             f"search fields:    {' | '.join(search_idx_fields)}\n"
+            f"query cache:      {self._query_cache_str()}\n"
         )
         return preview_str
 
+    def _query_cache_str(self):
+        info = self.query_cache_info()
+        lookups = info["hits"] + info["misses"]
+        return f"hit rate {round(100 * info['hit_rate'])}% of {lookups} queries"
+
     def _reindex_records(self):
-        """Re-index all records in the collection.
+        """Re-index all records in the collection, without search downtime.
 
         - (leave records unchanged)
-        - wipe existing indexes, create new
-        - uses search_mapping associated with doc type
+        - build new index versions (with the doc types' index_mapping), bulk load them
+        - swap the collection aliases to the new versions, drop the old versions
+        Searches use the old indices until the swap.  Runs on the writer, so changes
+        submitted meanwhile are applied to the new versions, after the swap.
         """
-        search_indices = []
-        for doc_type in self.doc_types:
-            index_name = return_index_name(self._collection_id, doc_type.__name__)
-            search_indices.append(index_name)
-            # overwrite temp indices of same name if they exist
-            if self.client.index_exists(index_name):
-                self.client.drop_index(index_name)
-            self.client.new_index(index_name=index_name, mapping=doc_type.index_mapping)
+        return self.writer.call(self._rebuild_indices)
 
-        records_dict = self.records_db.df.index
-        for document_id in records_dict:
-            record = self.return_record(document_id)
-            doc_type = record["document_type"]
-            link_content = self.gen_link_content(record["document_id"])
-            (document_id, record_index) = doc_type.gen_search_index(
-                record, link_content=link_content
-            )
-            index_name = return_index_name(
-                self._collection_id, doc_type_str=doc_type.__name__
-            )
-            self.client.index_record(
-                document_id=document_id,
-                record_index=record_index,
-                index_name=index_name,
+    def _rebuild_indices(self):
+        # versions are named after the aliases, so tmp_ collections' keep the prefix
+        aliases = {
+            doc_type.__name__: return_index_name(self._collection_id, doc_type.__name__)
+            for doc_type in self.doc_types
+        }
+        new_indices = {}
+        try:
+            for doc_type in self.doc_types:
+                new_index = self.client.new_index_version(
+                    aliases[doc_type.__name__], mapping=doc_type.index_mapping
+                )
+                new_indices[doc_type.__name__] = new_index
+                self.client.set_refresh_interval(new_index, "-1")
+
+            actions = (
+                self._gen_index_action(
+                    record,
+                    index_linked_content=True,
+                    index_name=new_indices[record["document_type"].__name__],
+                )
+                for record in map(self.return_record, list(self.records_db.index))
             )
+            summary = self.client.bulk(actions)
+            for new_index in new_indices.values():
+                self.client.set_refresh_interval(new_index, None)
+                self.client.refresh(new_index)
+        except Exception:
+            for new_index in new_indices.values():
+                self.client.drop_index(new_index)
+            raise
+
+        for doc_type_name, alias in aliases.items():
+            old_indices = self.client.swap_alias(alias, new_indices[doc_type_name])
+            # e.g. the tmp_ versions of a collection registered since
+            for old_index in old_indices:
+                self.client.drop_index(old_index)
+            self.client.drop_old_versions(alias)
+        self._bump_generation()
+        if summary["failed"]:
+            print(f"{len(summary['failed'])} documents failed to index; see log.")
+        return summary
@@ -0,0 +1,212 @@
+"""
+Registered collections, loaded on first use and unloaded when inactive.
+
+Used by the app (TUI views, REST server): collections are listed and summarized from
+the register, and only loaded (records, link graph, ...) when accessed; with
+watch=True, the folder sources of loaded collections are watched for changes (see
+services.FolderWatcher) until they are unloaded.  Loaded
+collections are kept in LRU order and the least recently used are unloaded once
+more than MAX_OPEN_COLLECTIONS or MAX_OPEN_RECORDS are loaded; the active collection,
+and collections in use (pinned, or with queued changes), are not unloaded.  Changes
+to registered collections are persisted as they are made (see Data.sync), so
+unloading loses nothing.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from tsar import LOG_FOLDER
+from tsar.lib.collection import Collection, format_summary
+from tsar.lib.services import FolderWatcher
+
+# loaded collections kept, at most
+MAX_OPEN_COLLECTIONS = 4
+# records of loaded collections kept, at most (a proxy for their memory)
+MAX_OPEN_RECORDS = 500000
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "collection_cache.log"))
+logger.addHandler(handler)
+
+
+class CollectionCache(object):
+    """{collection_id: Collection} of registered collections, loaded lazily.
+
+    Don't keep references to collections across calls (except the active one): an
+    unloaded collection is loaded again, as a new object, on next access.  Use
+    `pinned` (or `call`) to keep a collection loaded while it is used, e.g. by a job.
+    """
+
+    def __init__(
+        self, max_open=MAX_OPEN_COLLECTIONS, max_records=MAX_OPEN_RECORDS, watch=False,
+    ):
+        self.max_open = max_open
+        self.max_records = max_records
+        self.watch = watch
+        # collection_id never unloaded, e.g. the app's active collection
+        self.active = None
+        self._loaded = OrderedDict()
+        # {collection_id: users} of collections kept loaded (see pinned)
+        self._pinned = {}
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f"CollectionCache(loaded={list(self._loaded)})"
+
+    def __contains__(self, collection_id):
+        return collection_id in self._loaded or collection_id in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        """Return registered collection ids."""
+        return Collection.registered_collections()
+
+    def loaded(self):
+        """Return ids of loaded collections, least recently used first."""
+        return list(self._loaded)
+
+    def __getitem__(self, collection_id):
+        """Return collection, loading it if needed; KeyError if not registered."""
+        with self._lock:
+            if collection_id in self._loaded:
+                self._loaded.move_to_end(collection_id)
+                return self._loaded[collection_id]
+            if collection_id not in self.keys():
+                raise KeyError(collection_id)
+            coll = Collection.load(collection_id)
+            self._loaded[collection_id] = coll
+            self._watch(coll)
+            logger.info(f"loaded collection {collection_id}")
+            inactive = self._pop_inactive()
+        self._close(inactive)
+        return coll
+
+    def __setitem__(self, collection_id, coll):
+        """Add a (new) collection object."""
+        with self._lock:
+            self._loaded[collection_id] = coll
+            self._loaded.move_to_end(collection_id)
+            if coll.watcher is None:
+                self._watch(coll)
+            inactive = self._pop_inactive()
+        self._close(inactive)
+
+    def get(self, collection_id, default=None):
+        try:
+            return self[collection_id]
+        except KeyError:
+            return default
+
+    def items(self):
+        """Yield (collection_id, collection), loading each; prefer summaries."""
+        for collection_id in self.keys():
+            yield collection_id, self[collection_id]
+
+    def unload(self, collection_id):
+        """Unload a collection (if loaded)."""
+        with self._lock:
+            coll = self._loaded.pop(collection_id, None)
+        if coll is not None:
+            self._close([coll])
+
+    def pop(self, collection_id, default=None):
+        """Forget a collection, e.g. after it was dropped."""
+        with self._lock:
+            return self._loaded.pop(collection_id, default)
+
+    def _pop_inactive(self):
+        """Remove least recently used collections beyond max_open, max_records.
+
+        Return the removed collections, to close once the lock is released (closing
+        applies their queued changes).  The active and the most recently used
+        collections are kept, as are pinned ones and those with queued changes (see
+        Collection.writer).
+        """
+        inactive = []
+        while True:
+            n_records = sum(len(coll.records_db) for coll in self._loaded.values())
+            if len(self._loaded) <= self.max_open and n_records <= self.max_records:
+                return inactive
+            candidates = [
+                collection_id
+                for collection_id in list(self._loaded)[:-1]
+                if collection_id != self.active
+                and collection_id not in self._pinned
+                and not self._loaded[collection_id].writer.busy
+            ]
+            if not candidates:
+                return inactive
+            inactive.append(self._loaded.pop(candidates[0]))
+
+    def _watch(self, coll):
+        """Start watching a registered collection's sources (stopped by close)."""
+        if not self.watch or not coll.registered:
+            return
+        watcher = FolderWatcher(coll)
+        folders = watcher.watch_sources()
+        watcher.start()
+        coll.watcher = watcher
+        logger.info(f"watching {coll.collection_id} sources: {folders}")
+
+    def _close(self, colls):
+        for coll in colls:
+            coll.close()
+            logger.info(f"unloaded collection {coll.collection_id}")
+
+    @contextmanager
+    def pinned(self, collection_id):
+        """Return collection (as context), kept loaded until the context exits."""
+        with self._lock:
+            self._pinned[collection_id] = self._pinned.get(collection_id, 0) + 1
+        try:
+            yield self[collection_id]
+        finally:
+            with self._lock:
+                self._pinned[collection_id] -= 1
+                if not self._pinned[collection_id]:
+                    del self._pinned[collection_id]
+
+    def call(self, collection_id, method_name, *args, **kwargs):
+        """Apply a collection method with its writer; return the result.
+
+        The collection is looked up when called and kept loaded meanwhile, so jobs
+        (see JobManager) can run this instead of holding a collection object.
+        """
+        with self.pinned(collection_id) as coll:
+            method = getattr(coll, method_name)
+            return coll.writer.call(method, *args, **kwargs)
+
+    def run(self, collection_id, method_name, *args, **kwargs):
+        """Apply a collection method in the calling thread; return the result.
+
+        For long methods applying their changes with the writer themselves (e.g.
+        add_from_source), so they don't hold up the writer's other commands; see call.
+        """
+        with self.pinned(collection_id) as coll:
+            return getattr(coll, method_name)(*args, **kwargs)
+
+    def summary(self, collection_id):
+        """Return collection summary, from the register if not loaded."""
+        with self._lock:
+            coll = self._loaded.get(collection_id)
+        if coll is not None:
+            return coll.gen_summary()
+        return Collection.registered_summary(collection_id)
+
+    def preview(self, collection_id):
+        """Return formatted collection preview, without loading the collection."""
+        with self._lock:
+            coll = self._loaded.get(collection_id)
+        if coll is not None:
+            return coll.preview()
+        summary = Collection.registered_summary(collection_id)
+        if summary is None:
+            # not written since summaries were added to the register
+            return self[collection_id].preview()
+        return format_summary(summary)
@@ -0,0 +1,276 @@
+"""
+Asynchronous http fetch layer shared by remote doctypes.
+
+An aiohttp session with a connection pool runs on a background event loop, so sync
+code (e.g. DocType.gen_record in ingestion worker threads) can share connections:
+- `fetcher.get(url)` blocks for a single response
+- `fetcher.get_many(urls)` fans out concurrently
+- coroutines can await `fetcher.aget(url)` directly
+
+Requests are rate limited per host, time out, and abort if the response body exceeds
+max_bytes.  Responses with an ETag/Last-Modified are revalidated with a conditional GET.
+
+With a FetchCache, responses persist across runs: fresh entries are served without a
+request, stale ones are revalidated, and in offline mode only cached entries are used.
+"""
+import asyncio
+from functools import partial
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+import aiohttp
+from multidict import CIMultiDict
+from tsar import CACHE_FOLDER
+from tsar.config import FETCH_OFFLINE
+from tsar.lib.cache import LRUCache
+from tsar.lib.fetch_cache import FetchCache
+
+FETCH_TIMEOUT_SECONDS = 30
+MAX_CONNECTIONS = 100
+MAX_CONNECTIONS_PER_HOST = 8
+MAX_RESPONSE_BYTES = 20 * 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+# minimum seconds between requests to a host; see https://arxiv.org/help/api/tou
+HOST_MIN_INTERVAL = {"export.arxiv.org": 3.0, "www.youtube.com": 0.5}
+# responses kept for conditional GET revalidation (without a FetchCache)
+VALIDATOR_CACHE_SIZE = 1024
+VALIDATOR_CACHE_BYTES = 64 * 1024 * 1024
+USER_AGENT = "tsar (https://github.com/tcrensink/tsar)"
+
+
+class FetchError(Exception):
+    """Response had an error status."""
+
+
+class ResponseTooLarge(FetchError):
+    """Response body exceeded the fetcher's max_bytes."""
+
+
+class NotCached(FetchError):
+    """Offline, and the request is not in the fetch cache."""
+
+
+def request_key(url, params=None):
+    """Return cache key for a request: url with sorted query params."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+def response_bytes(response):
+    """Return size of a FetchResponse body."""
+    return len(response.content)
+
+
+class FetchResponse(object):
+    """Fetched http response; `content` is the full (capped) body."""
+
+    def __init__(self, url, status, headers, content, encoding=None):
+        self.url = url
+        self.status = status
+        # CIMultiDict: header names are case-insensitive
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+
+    def __repr__(self):
+        return f"FetchResponse({self.url}, status={self.status})"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise FetchError(f"{self.status} error for url: {self.url}")
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Return response from a FetchCache entry."""
+        response = cls(
+            url=entry.url,
+            status=entry.status,
+            headers=CIMultiDict(entry.headers),
+            content=entry.content,
+            encoding=entry.encoding,
+        )
+        return response
+
+
+class Fetcher(object):
+    """Pooled async http client with per-host rate limits; see module docstring."""
+
+    def __init__(
+        self,
+        timeout=FETCH_TIMEOUT_SECONDS,
+        max_connections=MAX_CONNECTIONS,
+        max_connections_per_host=MAX_CONNECTIONS_PER_HOST,
+        max_bytes=MAX_RESPONSE_BYTES,
+        host_min_interval=HOST_MIN_INTERVAL,
+        cache=None,
+    ):
+        """cache: optional FetchCache persisting responses."""
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.max_bytes = max_bytes
+        self.host_min_interval = host_min_interval
+        self.cache = cache
+        # in-memory responses for revalidation, if no cache; bounded by body size
+        self.validators = LRUCache(
+            maxsize=VALIDATOR_CACHE_SIZE,
+            max_bytes=VALIDATOR_CACHE_BYTES,
+            sizeof=response_bytes,
+        )
+
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._host_locks = {}
+        self._host_last_request = {}
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        """Start the background event loop and session on first use."""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=loop.run_forever, name="tsar-fetch", daemon=True
+            )
+            self._thread.start()
+            self._loop = loop
+            asyncio.run_coroutine_threadsafe(self._open_session(), loop).result()
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections, limit_per_host=self.max_connections_per_host
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": USER_AGENT},
+        )
+
+    async def _wait_for_host(self, host):
+        """Space out requests to hosts in host_min_interval."""
+        interval = self.host_min_interval.get(host)
+        if not interval:
+            return
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last_request.get(host, 0) + interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = time.monotonic()
+
+    async def aget(self, url, params=None, headers=None, max_bytes=None):
+        """Fetch url; return FetchResponse.  Must run on the fetcher's event loop."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        headers = dict(headers or {})
+        key = request_key(url, params)
+        # cache (sqlite, file) I/O runs in the loop's executor, not blocking the loop
+        loop = asyncio.get_event_loop()
+        if self.cache is not None:
+            entry = await loop.run_in_executor(None, self.cache.get, key)
+            if entry is None and self.cache.offline:
+                raise NotCached(f"{key} is not cached (offline)")
+            cached = None if entry is None else FetchResponse.from_entry(entry)
+            if entry is not None and (
+                self.cache.offline or entry.is_fresh(self.cache.ttl)
+            ):
+                return cached
+        else:
+            cached = self.validators.get(key)
+        if cached is not None:
+            if "ETag" in cached.headers:
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if "Last-Modified" in cached.headers:
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        await self._wait_for_host(urlparse(url).hostname)
+        async with self._session.get(url, params=params, headers=headers) as res:
+            if res.status == 304 and cached is not None:
+                if self.cache is not None:
+                    await loop.run_in_executor(None, self.cache.touch, key)
+                return cached
+            if res.content_length is not None and res.content_length > max_bytes:
+                raise ResponseTooLarge(f"{url}: {res.content_length} bytes")
+            chunks, n_bytes = [], 0
+            async for chunk in res.content.iter_chunked(READ_CHUNK_BYTES):
+                n_bytes += len(chunk)
+                if n_bytes > max_bytes:
+                    raise ResponseTooLarge(f"{url}: more than {max_bytes} bytes")
+                chunks.append(chunk)
+            response = FetchResponse(
+                url=str(res.url),
+                status=res.status,
+                headers=CIMultiDict(res.headers),
+                content=b"".join(chunks),
+                encoding=res.charset,
+            )
+        if response.status != 200:
+            return response
+        if self.cache is not None:
+            put = partial(
+                self.cache.put,
+                key,
+                response.content,
+                url=response.url,
+                status=response.status,
+                headers=response.headers,
+                encoding=response.encoding,
+            )
+            await loop.run_in_executor(None, put)
+        elif "ETag" in response.headers or "Last-Modified" in response.headers:
+            self.validators.put(key, response)
+        return response
+
+    def get(self, url, **kwargs):
+        """Blocking fetch of url; see aget for kwargs."""
+        self._start()
+        future = asyncio.run_coroutine_threadsafe(self.aget(url, **kwargs), self._loop)
+        return future.result()
+
+    def get_many(self, urls, **kwargs):
+        """Fetch urls concurrently; return {url: FetchResponse or Exception}."""
+        self._start()
+
+        async def gather():
+            return await asyncio.gather(
+                *[self.aget(url, **kwargs) for url in urls], return_exceptions=True
+            )
+
+        future = asyncio.run_coroutine_threadsafe(gather(), self._loop)
+        return dict(zip(urls, future.result()))
+
+    def memoize(self, key, func, *args, **kwargs):
+        """Return func(*args, **kwargs), cached under key like responses.
+
+        For api clients making their own requests; results must be json serializable.
+        """
+        if self.cache is None:
+            return func(*args, **kwargs)
+        entry = self.cache.get(key)
+        if entry is not None and (self.cache.offline or entry.is_fresh(self.cache.ttl)):
+            return json.loads(entry.content)
+        if self.cache.offline:
+            raise NotCached(f"{key} is not cached (offline)")
+        value = func(*args, **kwargs)
+        self.cache.put(key, json.dumps(value).encode(), encoding="utf-8")
+        return value
+
+    def close(self):
+        """Close session and stop the event loop."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+
+# shared fetcher for doctypes
+fetcher = Fetcher(cache=FetchCache(CACHE_FOLDER, offline=FETCH_OFFLINE))
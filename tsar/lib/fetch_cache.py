@@ -0,0 +1,255 @@
+"""
+Persistent cache of fetched http/api responses, shared by remote doctypes.
+
+Entries are keyed by request url (with query params) and indexed in sqlite; response
+bodies are stored once per content hash (sha256) under `blobs/`, so identical
+responses share storage.  Entries older than their ttl are stale: they are revalidated
+by the fetcher (conditional GET) or, in offline mode, served as-is.  When the cache
+exceeds max_bytes, least recently used entries are evicted.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from tsar import LOG_FOLDER
+from tsar.config import FETCH_CACHE_TTL_SECONDS, FETCH_CACHE_MAX_BYTES
+
+INDEX_NAME = "index.db"
+BLOBS_FOLDER = "blobs"
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "fetch_cache.log"))
+logger.addHandler(handler)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    status INTEGER,
+    headers TEXT,
+    encoding TEXT,
+    digest TEXT,
+    size INTEGER,
+    fetched_at REAL,
+    accessed_at REAL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_digest ON entries (digest);
+"""
+
+
+class CacheEntry(object):
+    """Cached response: body (content) and the metadata needed to rebuild it."""
+
+    def __init__(self, key, url, status, headers, encoding, content, fetched_at):
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.encoding = encoding
+        self.content = content
+        self.fetched_at = fetched_at
+
+    def __repr__(self):
+        return f"CacheEntry({self.key}, fetched_at={self.fetched_at})"
+
+    def is_fresh(self, ttl):
+        return ttl is None or time.time() - self.fetched_at < ttl
+
+
+class FetchCache(object):
+    """On-disk response cache; see module docstring.
+
+    ttl: seconds an entry is fresh (None: never stale)
+    max_bytes: total size of cached bodies before LRU eviction
+    offline: serve stale entries and never fetch (see Fetcher)
+    """
+
+    def __init__(
+        self,
+        folder,
+        ttl=FETCH_CACHE_TTL_SECONDS,
+        max_bytes=FETCH_CACHE_MAX_BYTES,
+        offline=False,
+    ):
+        self.folder = folder
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._conn = None
+        self._lock = threading.RLock()
+        # running size of cached bodies, summed once on first use (see total_bytes)
+        self._total_bytes = None
+
+    def __repr__(self):
+        return f"FetchCache({self.folder}, offline={self.offline})"
+
+    @property
+    def conn(self):
+        """sqlite connection, opened (and the cache folder created) on first use."""
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.join(self.folder, BLOBS_FOLDER), exist_ok=True)
+                path = os.path.join(self.folder, INDEX_NAME)
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.executescript(SCHEMA)
+                self._conn = conn
+            return self._conn
+
+    def _blob_path(self, digest):
+        return os.path.join(self.folder, BLOBS_FOLDER, digest[:2], digest)
+
+    def get(self, key):
+        """Return CacheEntry for key (fresh or stale), else None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT url, status, headers, encoding, digest, fetched_at "
+                "FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            url, status, headers, encoding, digest, fetched_at = row
+            try:
+                with open(self._blob_path(digest), "rb") as fp:
+                    content = fp.read()
+            except FileNotFoundError:
+                logger.warning(f"missing blob for {key}; dropping entry")
+                self.pop(key)
+                return None
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        entry = CacheEntry(
+            key=key,
+            url=url,
+            status=status,
+            headers=json.loads(headers),
+            encoding=encoding,
+            content=content,
+            fetched_at=fetched_at,
+        )
+        return entry
+
+    def put(self, key, content, url=None, status=200, headers=None, encoding=None):
+        """Add or replace entry for key, then evict entries beyond max_bytes."""
+        digest = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(digest)
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            if not os.path.exists(blob_path):
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                tmp_path = f"{blob_path}.tmp{threading.get_ident()}"
+                with open(tmp_path, "wb") as fp:
+                    fp.write(content)
+                os.replace(tmp_path, blob_path)
+            total = self.total_bytes()
+            old = conn.execute(
+                "SELECT digest, size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        url or key,
+                        status,
+                        json.dumps(dict(headers or {})),
+                        encoding,
+                        digest,
+                        len(content),
+                        now,
+                        now,
+                    ),
+                )
+            self._total_bytes = total + len(content) - (0 if old is None else old[1])
+            if old is not None and old[0] != digest:
+                self._remove_blob(old[0])
+            self.evict()
+
+    def touch(self, key):
+        """Mark entry as freshly fetched, e.g. after a 304 revalidation."""
+        with self._lock, self.conn:
+            now = time.time()
+            self.conn.execute(
+                "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+
+    def pop(self, key):
+        """Remove entry for key, if any."""
+        with self._lock:
+            total = self.total_bytes()
+            row = self.conn.execute(
+                "SELECT digest, size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return
+            with self.conn:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._total_bytes = total - row[1]
+            self._remove_blob(row[0])
+
+    def _remove_blob(self, digest):
+        """Remove blob unless another entry has the same content."""
+        shared = self.conn.execute(
+            "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone()
+        if shared is None:
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def total_bytes(self):
+        """Return size of cached bodies; kept up to date by put/pop, not re-summed."""
+        with self._lock:
+            if self._total_bytes is None:
+                (self._total_bytes,) = self.conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            return self._total_bytes
+
+    def evict(self):
+        """Remove least recently used entries until total size is within max_bytes."""
+        with self._lock:
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return
+            rows = self.conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at"
+            ).fetchall()
+            evict_keys = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                evict_keys.append(key)
+                excess -= size
+            for key in evict_keys:
+                self.pop(key)
+            logger.info(f"evicted {len(evict_keys)} entries from {self.folder}")
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            keys = [key for (key,) in self.conn.execute("SELECT key FROM entries")]
+            for key in keys:
+                self.pop(key)
+
+    def info(self):
+        """Return number of entries and cached bytes."""
+        with self._lock:
+            (n_entries,) = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        info = {
+            "entries": n_entries,
+            "bytes": self.total_bytes(),
+            "max_bytes": self.max_bytes,
+            "offline": self.offline,
+        }
+        return info
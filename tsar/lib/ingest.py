@@ -0,0 +1,184 @@
+"""
+Concurrent document ingestion for collections.
+
+Fetching/parsing documents (network and file server round trips) runs in a bounded
+worker pool, while records are committed to the collection by a single writer (the
+calling thread, or the collection's CollectionWriter), in bulk.  Per-doctype
+concurrency limits are applied by the collection's DocTypeManager.  Doctypes with a
+batch_size > 1 prefetch document content in batches (e.g. one file server request per
+batch of markdown files).
+"""
+import logging
+import os
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tsar import LOG_FOLDER
+
+DEFAULT_WORKERS = 8
+# workers for remote doctypes: fetches mostly wait on the network, and are bounded by
+# the shared fetcher's connection pool and per-host rate limits
+REMOTE_WORKERS = 64
+# futures in flight per worker; bounds memory used by fetched, uncommitted records
+QUEUE_DEPTH = 4
+# log progress every N documents
+LOG_INTERVAL = 100
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "ingest.log"))
+logger.addHandler(handler)
+
+
+def gen_progress(done, failed, total, start_time):
+    """Return progress dict with throughput (docs/sec) and eta (seconds)."""
+    elapsed = time.time() - start_time
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - done) / rate if rate > 0 else None
+    progress = {
+        "done": done,
+        "failed": failed,
+        "total": total,
+        "elapsed": elapsed,
+        "docs_per_sec": rate,
+        "eta": eta,
+    }
+    return progress
+
+
+class Ingester(object):
+    """Add documents to a collection: parallel fetch/parse, single writer commit."""
+
+    def __init__(
+        self,
+        collection,
+        max_workers=None,
+        progress=None,
+        should_commit=None,
+        on_commit=None,
+        writer=None,
+    ):
+        """progress: optional callable receiving a gen_progress dict per document.
+
+        max_workers: defaults to REMOTE_WORKERS for remote doctypes.
+        should_commit: optional callable(document_id, records); if it returns False,
+            the records are not committed (e.g. unchanged content).
+        on_commit: optional callable(document_id, records), called once the records
+            are committed (not if committing failed).
+        writer: optional CollectionWriter committing the records (queued with other
+            changes), so the collection's changes aren't held up by fetching.
+        """
+        self.collection = collection
+        self.max_workers = max_workers
+        self.progress = progress
+        self.should_commit = should_commit
+        self.on_commit = on_commit
+        self.writer = writer
+
+    def _prefetch(self, doc_type, document_ids):
+        try:
+            doc_type.prefetch(document_ids)
+        except Exception:
+            # documents are fetched individually instead
+            logger.exception(f"prefetch failed for {len(document_ids)} documents")
+
+    def _fetch(self, document_id, doc_type, primary_ids, prefetch=None):
+        if prefetch is not None:
+            # submitted (so started) before this task; see run
+            wait([prefetch])
+        return self.collection.gen_document_records(
+            document_id, doc_type=doc_type, primary_ids=primary_ids
+        )
+
+    def _commit(self, future, document_id, doc_type):
+        """Commit fetched records to the collection; return True on success."""
+        try:
+            records = future.result()
+            if not records:
+                raise ValueError("no records generated")
+            if self.should_commit is None or self.should_commit(document_id, records):
+                self.collection.commit_document_records(records, write=False)
+                if self.on_commit is not None:
+                    self.on_commit(document_id, records)
+        except Exception as e:
+            print(f"error processing {document_id} as type {doc_type}:", e)
+            return False
+        return True
+
+    def _report(self, progress):
+        if self.progress is not None:
+            self.progress(progress)
+        if progress["done"] % LOG_INTERVAL == 0:
+            logger.info(f"ingest progress: {progress}")
+
+    def run(self, document_ids, doc_type=None):
+        """Add document_ids to the collection; return final progress dict."""
+        document_ids = list(document_ids)
+        total = len(document_ids)
+        start_time = time.time()
+        done, failed = 0, 0
+        if not document_ids:
+            return gen_progress(done, failed, total, start_time)
+        primary_ids = frozenset(self.collection.primary_documents())
+
+        pending = {}
+        id_iter = iter(document_ids)
+        n_submitted = 0
+        prefetch = None
+        batch_size = 1 if doc_type is None else doc_type.batch_size
+        max_workers = self.max_workers
+        if max_workers is None:
+            remote = doc_type is not None and doc_type.remote
+            max_workers = REMOTE_WORKERS if remote else DEFAULT_WORKERS
+        max_pending = max_workers * QUEUE_DEPTH
+        writer = self.writer
+        if writer is not None and writer.current:
+            # e.g. run by a writer command: commit directly
+            writer = None
+        # futures of commits queued to the writer: document_id
+        committing = {}
+        # the writer applies commits in bulk itself
+        bulk = self.collection.bulk_indexing() if writer is None else nullcontext()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            with bulk:
+                while True:
+                    for document_id in id_iter:
+                        if batch_size > 1 and n_submitted % batch_size == 0:
+                            # fetch content of the next batch in bulk; the pool is
+                            # FIFO, so the batch's tasks start after the prefetch
+                            batch = document_ids[n_submitted : n_submitted + batch_size]
+                            prefetch = executor.submit(self._prefetch, doc_type, batch)
+                        future = executor.submit(
+                            self._fetch, document_id, doc_type, primary_ids, prefetch
+                        )
+                        pending[future] = document_id
+                        n_submitted += 1
+                        if len(pending) + len(committing) >= max_pending:
+                            break
+                    if not pending and not committing:
+                        break
+
+                    finished, _ = wait(
+                        [*pending, *committing], return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        if future in committing:
+                            committing.pop(future)
+                            committed = future.exception() is None and future.result()
+                        elif writer is not None:
+                            document_id = pending.pop(future)
+                            commit = writer.submit(
+                                self._commit, future, document_id, doc_type
+                            )
+                            committing[commit] = document_id
+                            continue
+                        else:
+                            document_id = pending.pop(future)
+                            committed = self._commit(future, document_id, doc_type)
+                        if not committed:
+                            failed += 1
+                        done += 1
+                        self._report(gen_progress(done, failed, total, start_time))
+
+        progress = gen_progress(done, failed, total, start_time)
+        logger.info(f"ingest finished: {progress}")
+        return progress
@@ -0,0 +1,168 @@
+"""
+Background jobs for long-running operations requested through the REST server.
+
+A job runs on a worker pool and is tracked by id: its status, progress (documents
+done, docs/sec, eta; see ingest.gen_progress) and result summary are reported by the
+job endpoints, e.g. for the CLI to follow.  Cancellation is cooperative: a cancelled
+job stops at its next progress report (JobCancelled is raised), and queued jobs never
+start.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from tsar import LOG_FOLDER
+
+JOB_WORKERS = 2
+# finished jobs kept for status requests, at most
+MAX_FINISHED_JOBS = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "jobs.log"))
+logger.addHandler(handler)
+
+
+class JobCancelled(Exception):
+    """Raised in a job when it reports progress after being cancelled."""
+
+
+class Job(object):
+    """A function run by JobManager; see module docstring."""
+
+    def __init__(self, name, func, args=(), kwargs=None, collection_id=None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.collection_id = collection_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.status = QUEUED
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    def __repr__(self):
+        return f"Job({self.job_id}, {self.name}, {self.status})"
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Request cancellation; return False if the job already finished."""
+        if self.status in FINISHED_STATUSES:
+            return False
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+        return True
+
+    def report(self, progress):
+        """Record a progress dict; raise JobCancelled if cancellation was requested."""
+        self.progress = progress
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+    def run(self):
+        if self.cancelled:
+            self._finish(CANCELLED)
+            return
+        self.status = RUNNING
+        self.started = time.time()
+        try:
+            self.result = self.func(*self.args, progress=self.report, **self.kwargs)
+        except JobCancelled:
+            self._finish(CANCELLED)
+        except Exception as e:
+            logger.exception(f"job {self.job_id} ({self.name}) failed")
+            self.error = f"{type(e).__name__}: {e}"
+            self._finish(FAILED)
+        else:
+            self._finish(DONE)
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        logger.info(f"job {self.job_id} ({self.name}) {status}")
+
+    def to_dict(self):
+        """Return json serializable job state."""
+        job_dict = {
+            "job_id": self.job_id,
+            "name": self.name,
+            "collection_id": self.collection_id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        return job_dict
+
+
+class JobManager(object):
+    """Run jobs on a worker pool and keep them (by id) for status requests."""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tsar-job"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name, func, *args, collection_id=None, **kwargs):
+        """Run func(*args, progress=callable, **kwargs) as a job; return the Job.
+
+        func should pass `progress` on (e.g. to Collection.add_from_source), so the
+        job reports progress and can be cancelled.
+        """
+        job = Job(name, func, args, kwargs, collection_id=collection_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        job.future = self._executor.submit(job.run)
+        logger.info(f"job {job.job_id} ({name}) queued")
+        return job
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATUSES]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.job_id]
+
+    def __getitem__(self, job_id):
+        """Return job; KeyError if unknown (or pruned)."""
+        with self._lock:
+            return self._jobs[job_id]
+
+    def jobs(self):
+        """Return jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Request cancellation of a job; return False if it already finished."""
+        return self[job_id].cancel()
+
+    def shutdown(self, wait=True):
+        """Cancel jobs and stop the worker pool."""
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=wait)
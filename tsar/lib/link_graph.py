@@ -0,0 +1,197 @@
+"""
+Link graph of collection documents: forward links and backlinks as integer arrays.
+
+Document ids are numbered (nodes), and links are stored in compressed sparse row (CSR)
+arrays: node j links to `indices[indptr[j]:indptr[j + 1]]`; backlinks are the same
+arrays for the reversed edges.  Updated nodes go to an overlay (O(degree) per update),
+which is merged into the arrays once it outgrows them (compact), so lookups stay
+O(degree).  Graphs are persisted as npz files next to the collection records.
+"""
+import json
+import os
+import numpy as np
+
+GRAPH_NAME = "links.npz"
+# overlay nodes before compaction, at least
+COMPACT_MIN_NODES = 1000
+
+
+def _csr(n_nodes, sources, targets):
+    """Return (indptr, indices) arrays of edges (sources, targets) by source node."""
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def _empty_csr(n_nodes):
+    return np.zeros(n_nodes + 1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+
+
+class LinkGraph(object):
+    """Forward/back link adjacency of document ids; see module docstring."""
+
+    def __init__(self, ids=(), fwd=None, back=None):
+        """fwd, back: (indptr, indices) CSR arrays over the nodes of ids."""
+        self.ids = list(ids)
+        self.id_map = {document_id: j for j, document_id in enumerate(self.ids)}
+        self._fwd = fwd if fwd is not None else _empty_csr(len(self.ids))
+        self._back = back if back is not None else _empty_csr(len(self.ids))
+        # {node: targets} of nodes whose links changed since compaction
+        self._fwd_overlay = {}
+        # {node: set of overlay nodes linking to it}
+        self._back_overlay = {}
+        # position of the records the graph was written from (see Data.position)
+        self.position = None
+
+    def __repr__(self):
+        return f"LinkGraph(n_nodes={len(self)}, n_edges={self.n_edges})"
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def _n_base(self):
+        """Number of nodes in the CSR arrays."""
+        return len(self._fwd[0]) - 1
+
+    @property
+    def n_edges(self):
+        n_base_edges = sum(
+            len(self._base_slice(self._fwd, node)) for node in self._fwd_overlay
+        )
+        n_overlay_edges = sum(len(targets) for targets in self._fwd_overlay.values())
+        return len(self._fwd[1]) - n_base_edges + n_overlay_edges
+
+    @classmethod
+    def build(cls, links_by_id):
+        """Return graph from (document_id, links) pairs, e.g. records' links."""
+        ids, id_map = [], {}
+
+        def node(document_id):
+            if document_id not in id_map:
+                id_map[document_id] = len(ids)
+                ids.append(document_id)
+            return id_map[document_id]
+
+        sources, targets = [], []
+        for document_id, links in links_by_id:
+            source = node(document_id)
+            for link in dict.fromkeys(links):
+                sources.append(source)
+                targets.append(node(link))
+        sources = np.array(sources, dtype=np.int64)
+        targets = np.array(targets, dtype=np.int64)
+        fwd = _csr(len(ids), sources, targets)
+        back = _csr(len(ids), targets, sources)
+        return cls(ids=ids, fwd=fwd, back=back)
+
+    def _node(self, document_id, add=False):
+        """Return node of document_id (added if add), else None."""
+        node = self.id_map.get(document_id)
+        if node is None and add:
+            node = len(self.ids)
+            self.id_map[document_id] = node
+            self.ids.append(document_id)
+        return node
+
+    def _base_slice(self, csr, node):
+        if node >= self._n_base:
+            return csr[1][:0]
+        indptr, indices = csr
+        return indices[indptr[node] : indptr[node + 1]]
+
+    def _targets(self, node):
+        if node in self._fwd_overlay:
+            return self._fwd_overlay[node]
+        return self._base_slice(self._fwd, node)
+
+    def _sources(self, node):
+        # base backlinks of nodes whose links changed are stale
+        sources = [
+            s for s in self._base_slice(self._back, node) if s not in self._fwd_overlay
+        ]
+        sources.extend(self._back_overlay.get(node, ()))
+        return sources
+
+    def links(self, document_id):
+        """Return document_ids linked from document_id."""
+        node = self._node(document_id)
+        if node is None:
+            return []
+        return [self.ids[target] for target in self._targets(node)]
+
+    def backlinks(self, document_id):
+        """Return document_ids linking to document_id."""
+        node = self._node(document_id)
+        if node is None:
+            return []
+        return [self.ids[source] for source in sorted(self._sources(node))]
+
+    def set_links(self, document_id, links):
+        """Set (replace) the links of document_id."""
+        node = self._node(document_id, add=True)
+        for target in self._fwd_overlay.get(node, ()):
+            self._back_overlay[target].discard(node)
+        targets = np.array(
+            [self._node(link, add=True) for link in dict.fromkeys(links)],
+            dtype=np.int32,
+        )
+        self._fwd_overlay[node] = targets
+        for target in targets:
+            self._back_overlay.setdefault(int(target), set()).add(node)
+        if len(self._fwd_overlay) > max(COMPACT_MIN_NODES, self._n_base):
+            self.compact()
+
+    def remove(self, document_id):
+        """Remove links of document_id; links to it are kept."""
+        if self._node(document_id) is not None:
+            self.set_links(document_id, [])
+
+    def compact(self):
+        """Merge the overlay into the CSR arrays."""
+        if not self._fwd_overlay and self._n_base == len(self.ids):
+            return
+        indptr, indices = self._fwd
+        base_sources = np.repeat(np.arange(self._n_base), np.diff(indptr))
+        keep = ~np.isin(base_sources, list(self._fwd_overlay))
+        overlay_nodes = list(self._fwd_overlay)
+        overlay_sources = np.repeat(
+            np.array(overlay_nodes, dtype=np.int64),
+            [len(self._fwd_overlay[node]) for node in overlay_nodes],
+        )
+        overlay_targets = [self._fwd_overlay[node] for node in overlay_nodes]
+        sources = np.concatenate([base_sources[keep], overlay_sources])
+        targets = np.concatenate([indices[keep], *overlay_targets]).astype(np.int64)
+        self._fwd = _csr(len(self.ids), sources, targets)
+        self._back = _csr(len(self.ids), targets, sources)
+        self._fwd_overlay = {}
+        self._back_overlay = {}
+
+    def write(self, path):
+        """Compact and write graph (atomically) to path."""
+        self.compact()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            np.savez(
+                fp,
+                ids=np.array(self.ids, dtype=str),
+                fwd_indptr=self._fwd[0],
+                fwd_indices=self._fwd[1],
+                back_indptr=self._back[0],
+                back_indices=self._back[1],
+                position=np.array(json.dumps(self.position)),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path):
+        with np.load(path) as arrays:
+            graph = cls(
+                ids=arrays["ids"].tolist(),
+                fwd=(arrays["fwd_indptr"], arrays["fwd_indices"]),
+                back=(arrays["back_indptr"], arrays["back_indices"]),
+            )
+            if "position" in arrays.files:
+                graph.position = json.loads(str(arrays["position"]))
+        return graph
@@ -0,0 +1,93 @@
+"""
+Per-source manifests for incremental sync (see Collection.sync_from_source).
+
+A manifest maps each document_id of a source to the file metadata (mtime, size) and
+content hash seen when it was last synced.  Comparing a new scan of the source against
+the manifest gives the documents added, (possibly) changed and removed since then;
+documents with unknown metadata are always treated as possibly changed, and are skipped
+after parsing if their content hash is unchanged.
+"""
+import hashlib
+import json
+import os
+
+MANIFESTS_FOLDER = "manifests"
+# file_meta_data fields compared between syncs
+META_FIELDS = ("st_mtime", "st_size")
+
+
+def content_hash(content):
+    """Return sha256 hex digest of (string) document content."""
+    return hashlib.sha256(str(content).encode()).hexdigest()
+
+
+def source_key(doc_type_name, source_id):
+    """Return file-safe key for a source."""
+    return hashlib.sha1(f"{doc_type_name}:{source_id}".encode()).hexdigest()[:16]
+
+
+def manifest_meta(meta):
+    """Return the compared subset of file metadata (None if unknown)."""
+    if meta is None:
+        return None
+    return {field: meta[field] for field in META_FIELDS}
+
+
+class SourceManifest(object):
+    """{document_id: {"meta": file metadata or None, "hash": content hash}}."""
+
+    def __init__(self, entries=None, path=None):
+        self.entries = entries or {}
+        self.path = path
+
+    def __repr__(self):
+        return f"SourceManifest({self.path}, n_entries={len(self.entries)})"
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def read(cls, path):
+        """Read manifest from path; empty if path doesn't exist."""
+        if path is None or not os.path.exists(path):
+            return cls(path=path)
+        with open(path, "r") as fp:
+            entries = json.load(fp)
+        return cls(entries=entries, path=path)
+
+    def write(self, path=None):
+        """Write manifest (atomically) to path, default self.path."""
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(self.entries, fp)
+        os.replace(tmp_path, path)
+        self.path = path
+
+    def diff(self, metas):
+        """Return (added, changed, removed) document_ids given a scan of the source.
+
+        metas: {document_id: file metadata or None}; changed ids are those whose
+        metadata differs from the manifest, or is unknown.
+        """
+        added, changed = [], []
+        for document_id, meta in metas.items():
+            entry = self.entries.get(document_id)
+            if entry is None:
+                added.append(document_id)
+            elif meta is None or entry["meta"] != manifest_meta(meta):
+                changed.append(document_id)
+        removed = [d for d in self.entries if d not in metas]
+        return added, changed, removed
+
+    def content_hash(self, document_id):
+        """Return content hash of document_id, None if not in manifest."""
+        entry = self.entries.get(document_id)
+        return None if entry is None else entry["hash"]
+
+    def update(self, document_id, meta, digest):
+        self.entries[document_id] = {"meta": manifest_meta(meta), "hash": digest}
+
+    def remove(self, document_id):
+        self.entries.pop(document_id, None)
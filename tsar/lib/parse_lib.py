@@ -3,7 +3,11 @@ library of parsing functions and utilities.
 
 """
 import os
+import io
+import json
+import mmap
 from collections import Counter
+from contextlib import contextmanager
 import numpy as np
 import pandas as pd
 import re
@@ -12,15 +16,29 @@ from stat import S_ISDIR, S_ISREG
 from datetime import datetime
 
 import fsspec
-from requests.utils import urlparse, urlunparse
+import requests
+from tsar.lib.cache import LRUCache
+from requests.utils import urlparse, urlunparse, unquote, quote
 from os import path
 
 # host fileserver root
 ROOT_DIR = os.environ.get("HOST_HOME")
 
 FILE_HOST_PORT = 8139
+FILE_HOST = f"host.docker.internal:{FILE_HOST_PORT}"
+# file server (file_server.py) endpoints streaming a subtree listing, file contents
+TREE_ROUTE = "_tree"
+BULK_ROUTE = "_bulk"
+# max paths per bulk content request
+BULK_MAX_PATHS = 500
+READ_CHUNK_BYTES = 256 * 1024
+# file contents fetched ahead of use, by host path
+PREFETCH_CACHE_SIZE = 2048
 # file system client; get folder contents at server ROOT_DIR
 fs = fsspec.filesystem(protocol="http")
+# pooled connections to the file server
+session = requests.Session()
+prefetched = LRUCache(maxsize=PREFETCH_CACHE_SIZE)
 
 
 def url_to_host_path(path_url):
@@ -35,17 +53,43 @@ def host_path_to_url(host_path):
     """Formats host (absolute) path to url"""
     host_path = resolve_path(host_path)
     rel_path = os.path.relpath(host_path, ROOT_DIR)
-    url = urlunparse(
-        ("http", f"host.docker.internal:{FILE_HOST_PORT}", rel_path, None, None, None)
-    )
+    url = urlunparse(("http", FILE_HOST, rel_path, None, None, None))
     return url
 
 
+def host_path_to_tree_url(host_path):
+    """Return file server url listing the subtree at host path."""
+    rel_path = os.path.relpath(resolve_path(host_path), ROOT_DIR)
+    return f"http://{FILE_HOST}/{TREE_ROUTE}/{quote(rel_path)}"
+
+
 def exists_on_fs(path_url, fs=fs):
     # does the file/folder path url exist on the (host) file server?
     return fs.exists(path_url)
 
 
+def files_exist(paths, fs=fs):
+    """Return list of bools: does each (host) path exist on the file server?
+
+    Makes one folder listing request per folder, rather than one request per path.
+    """
+    paths = [resolve_path(path) for path in paths]
+    folder_names = {}
+    for folder in set(os.path.dirname(path) for path in paths):
+        folder_url = host_path_to_url(folder).rstrip("/") + "/"
+        try:
+            urls = fs.ls(folder_url, detail=False)
+        except FileNotFoundError:
+            urls = []
+        folder_names[folder] = set(
+            unquote(os.path.basename(url.rstrip("/"))) for url in urls
+        )
+    exist = [
+        os.path.basename(path) in folder_names[os.path.dirname(path)] for path in paths
+    ]
+    return exist
+
+
 def return_links(text):
     """Return markdown-formatted links in text body."""
     links = re.findall(r"\[[^\]]+\]\(<?([^)<>]+)>?\)", text)
@@ -69,15 +113,109 @@ def resolve_path(path_str, source_path=None):
     return path_str
 
 
-def return_file_contents(path_string, fs=fs):
+def return_file_contents(path_string, session=session):
     """Return string of file contents on remote host.
 
     e.g.: path_string = "~/test.py" -> string of file contents.
+    Read from a memory map if the host path is mounted locally, else streamed from the
+    file server (over pooled connections), unless prefetched.
+    """
+    contents = prefetched.pop(resolve_path(path_string))
+    if contents is not None:
+        return contents
+    chunks = iter_file_chunks(path_string, session=session)
+    return b"".join(chunks).decode(errors="replace")
+
+
+def prefetch_file_contents(paths):
+    """Fetch contents of remote (not locally mounted) files in bulk, for later reads.
+
+    Prefetched contents are used (once) by return_file_contents.
     """
-    file_url = host_path_to_url(path_string)
-    with fs.open(file_url, "r") as fp:
-        contents_str = fp.read()
-    return contents_str
+    host_paths = [resolve_path(path) for path in paths]
+    remote_paths = [path for path in host_paths if not os.path.isfile(path)]
+    for path, contents in return_files_contents(remote_paths).items():
+        if isinstance(contents, str):
+            prefetched.put(path, contents)
+
+
+@contextmanager
+def open_mmap(path):
+    """Memory-map a local file (read only); yields b"" for empty files."""
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def iter_file_chunks(path_string, chunk_size=READ_CHUNK_BYTES, session=session):
+    """Yield contents of a (host) file in chunks of bytes.
+
+    Chunks are slices of a memory map if the host path is mounted locally, else read
+    from a streamed file server response.
+    """
+    host_path = resolve_path(path_string)
+    if os.path.isfile(host_path):
+        with open_mmap(host_path) as mm:
+            for start in range(0, len(mm), chunk_size):
+                yield mm[start : start + chunk_size]
+        return
+    with session.get(host_path_to_url(host_path), stream=True) as res:
+        res.raise_for_status()
+        yield from res.iter_content(chunk_size=chunk_size)
+
+
+def return_files_contents(paths, session=session, max_paths=BULK_MAX_PATHS):
+    """Return {path: string contents or exception} for (host) file paths.
+
+    Locally mounted files are read from memory maps; others are fetched from the file
+    server in bulk (max_paths per streamed request), or per file (over pooled
+    connections) if the file server has no bulk endpoint.
+    """
+    contents = {}
+    remote_paths = []
+    for path in paths:
+        host_path = resolve_path(path)
+        if os.path.isfile(host_path):
+            with open_mmap(host_path) as mm:
+                contents[path] = mm[:].decode(errors="replace")
+        else:
+            remote_paths.append(path)
+
+    for start in range(0, len(remote_paths), max_paths):
+        batch = remote_paths[start : start + max_paths]
+        try:
+            contents.update(_fetch_bulk(batch, session=session))
+        except requests.HTTPError:
+            for path in batch:
+                try:
+                    contents[path] = return_file_contents(path, session=session)
+                except Exception as e:
+                    contents[path] = e
+    return contents
+
+
+def _fetch_bulk(paths, session=session):
+    """Return {path: contents or exception} from one bulk file server request."""
+    rel_paths = {os.path.relpath(resolve_path(path), ROOT_DIR): path for path in paths}
+    url = f"http://{FILE_HOST}/{BULK_ROUTE}"
+    contents = {}
+    with session.post(url, json={"paths": list(rel_paths)}, stream=True) as res:
+        res.raise_for_status()
+        # keep raw open at end of stream, so the buffered reader sees EOF
+        res.raw.auto_close = False
+        reader = io.BufferedReader(res.raw, buffer_size=READ_CHUNK_BYTES)
+        for line in iter(reader.readline, b""):
+            header = json.loads(line)
+            path = rel_paths[header["path"]]
+            if "error" in header:
+                contents[path] = FileNotFoundError(header["error"])
+                continue
+            data = reader.read(header["size"])
+            contents[path] = data.decode(errors="replace")
+    return contents
 
 
 def return_files(path, fs=fs, extensions=[]):
@@ -85,6 +223,14 @@ def return_files(path, fs=fs, extensions=[]):
 
     All input/output format as local (host) filepaths, not fs urls.
     """
+    return list(return_files_meta(path, fs=fs, extensions=extensions))
+
+
+def _walk_files(path, fs=fs, extensions=[]):
+    """Return list of files in folder with extension, walking the file server.
+
+    One request per folder; used if the file server has no tree endpoint.
+    """
     extensions = set([ex.rsplit(".", 1)[-1] for ex in extensions])
 
     # recursively walk through folders to get all files with extension
@@ -112,6 +258,62 @@ def return_files(path, fs=fs, extensions=[]):
     return files
 
 
+def return_files_meta(path, fs=fs, extensions=[]):
+    """Return {file path: file_meta_data} for files in folder (or file) with extension.
+
+    - local fast path: if the host home is bind-mounted (at the same path), files are
+    listed and stat'ed in the container
+    - else the file server streams the listing of the subtree in one request
+    - else (file server without a tree endpoint) the file server is walked, without
+    metadata (None)
+    """
+    host_path = resolve_path(path)
+    if os.path.exists(host_path):
+        return dict(scan_local_files(host_path, extensions=extensions))
+    try:
+        return dict(scan_host_files(host_path, extensions=extensions))
+    except requests.HTTPError:
+        files = _walk_files(path, fs=fs, extensions=extensions)
+        return {fn: None for fn in files}
+
+
+def scan_local_files(path, extensions=[]):
+    """Yield (file path, file_meta_data) for files under local path, recursively."""
+    extensions = set([ex.rsplit(".", 1)[-1] for ex in extensions])
+    if os.path.isfile(path):
+        yield path, file_meta_data(path)
+        return
+    folders = [path]
+    while folders:
+        folder = folders.pop()
+        try:
+            entries = list(os.scandir(folder))
+        except (PermissionError, FileNotFoundError):
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(entry.path)
+            elif not extensions or entry.name.split(".")[-1] in extensions:
+                yield entry.path, stat_meta(entry.stat())
+
+
+def scan_host_files(path, extensions=[], session=session):
+    """Yield (file path, file_meta_data) for files under host path, recursively.
+
+    The file server streams the listing as newline-delimited json; raises HTTPError if
+    the path (or the tree endpoint) isn't found.
+    """
+    url = host_path_to_tree_url(path)
+    with session.get(url, params={"ext": extensions}, stream=True) as res:
+        res.raise_for_status()
+        for line in res.iter_lines():
+            if not line:
+                continue
+            entry = json.loads(line)
+            file_path = os.path.join(ROOT_DIR, entry.pop("path"))
+            yield file_path, entry
+
+
 def return_local_files(path, extensions=[]):
     """Return list of files in folder with extension."""
     extensions = set([ex.rsplit(".", 1)[-1] for ex in extensions])
@@ -202,7 +404,11 @@ def file_meta_data(path):
     st_size: in bytes
     st_ctime: last change to file metadata
     """
-    info = os.stat(path)
+    return stat_meta(os.stat(path))
+
+
+def stat_meta(info):
+    """Return file meta data from an os.stat_result; see file_meta_data."""
     info_dict = {
         "st_atime": info.st_atime,
         "st_mtime": info.st_mtime,
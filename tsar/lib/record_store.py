@@ -0,0 +1,311 @@
+"""
+Storage for collection records: columnar snapshots and an append-only log.
+
+Snapshots are uncompressed arrow (IPC) files that are memory-mapped, so columns are
+read individually and large columns (e.g. `content`) are only loaded when used.  Each
+snapshot has a unique id (in its metadata), so assets derived from the records can
+record which snapshot they describe.  Legacy pickled DataFrame snapshots are still
+readable, and are migrated by Data.read.
+
+Record upserts/removals are appended to a log next to the records snapshot, so a write
+costs time proportional to the record rather than the collection.  The log is replayed
+on read and truncated whenever a new snapshot is written (compaction); entries appended
+while a snapshot is written are kept.
+
+Log entries are framed as: 4 byte payload length | 4 byte crc32 | pickled payload.  A
+partially written (torn) entry at the end of the log is detected and discarded.
+"""
+import json
+import logging
+import os
+import pickle
+import struct
+import uuid
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from tsar.doctypes import DOCTYPES
+
+HEADER = struct.Struct(">II")
+LOG_SUFFIX = ".log"
+SNAPSHOT_SUFFIX = ".arrow"
+ARROW_MAGIC = b"ARROW1"
+# PROTO opcode starting pickles of protocol 2+ (e.g. pandas to_pickle)
+PICKLE_MAGIC = b"\x80"
+LEGACY_SNAPSHOT_SUFFIX = ".pkl"
+# schema metadata key for pandas dtypes of the snapshot columns
+DTYPES_KEY = b"tsar_dtypes"
+# schema metadata key for a unique id of each written snapshot
+SNAPSHOT_ID_KEY = b"tsar_snapshot_id"
+
+# columns read only when first used
+LAZY_COLUMNS = ("content",)
+# rows per record batch of written snapshots; bounds memory used by lazy columns
+SNAPSHOT_BATCH_ROWS = 256
+
+# compact when log entries exceed both this and the number of records
+COMPACT_MIN_ENTRIES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def log_path(snapshot_path):
+    """Return record log path associated with a snapshot path."""
+    return snapshot_path + LOG_SUFFIX
+
+
+def is_arrow(path):
+    """Return True if path is an arrow snapshot (vs. legacy pickle)."""
+    with open(path, "rb") as fp:
+        return fp.read(len(ARROW_MAGIC)) == ARROW_MAGIC
+
+
+def is_pickle(path):
+    """Return True if path is a (legacy) pickled snapshot, protocol 2 or later."""
+    with open(path, "rb") as fp:
+        return fp.read(len(PICKLE_MAGIC)) == PICKLE_MAGIC
+
+
+def write_snapshot(df, path, columns=None, table=None, table_index=None, overlay=None):
+    """Write records to an (uncompressed) arrow snapshot at path; return its id.
+
+    document_type classes are stored by name; the index is stored as a column.
+    columns (default: df's) missing from df are copied from a snapshot `table` (its
+    rows are document_ids table_index), with the values of records changed since
+    from overlay ({document_id: {column: value}}).  Rows are written in batches of
+    SNAPSHOT_BATCH_ROWS, so those columns are never read into memory all at once.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    overlay = overlay or {}
+    df = df.copy(deep=False)
+    if "document_type" in df.columns:
+        df["document_type"] = df["document_type"].map(lambda x: x.__name__)
+    dtypes = {col: str(dtype) for col, dtype in df.dtypes.items()}
+    base = pa.Table.from_pandas(df, preserve_index=True)
+    index_field = df.index.name
+
+    lazy_fields = {}
+    if table is not None:
+        table_dtypes = json.loads(table.schema.metadata.get(DTYPES_KEY, b"{}"))
+        for col in columns:
+            if col not in df.columns:
+                lazy_fields[col] = _lazy_field(table, col, overlay)
+                dtypes[col] = table_dtypes.get(col, "object")
+    fields = [
+        lazy_fields[col] if col in lazy_fields else base.schema.field(col)
+        for col in columns
+    ]
+    fields.append(base.schema.field(index_field))
+    metadata = dict(base.schema.metadata or {})
+    metadata[DTYPES_KEY] = json.dumps(dtypes).encode()
+    snapshot_id = uuid.uuid4().hex
+    metadata[SNAPSHOT_ID_KEY] = snapshot_id.encode()
+    schema = pa.schema(fields, metadata=metadata)
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for start in range(0, len(df), SNAPSHOT_BATCH_ROWS):
+                rows = base.slice(start, SNAPSHOT_BATCH_ROWS)
+                document_ids = df.index[start : start + SNAPSHOT_BATCH_ROWS]
+                if lazy_fields:
+                    positions = table_index.get_indexer(document_ids)
+                arrays = []
+                for field in schema:
+                    if field.name in lazy_fields:
+                        values = _lazy_values(
+                            table, field, positions, document_ids, overlay
+                        )
+                    else:
+                        values = rows.column(field.name).combine_chunks()
+                    arrays.append(values)
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+    return snapshot_id
+
+
+def _lazy_field(table, column, overlay):
+    """Return snapshot field of a column copied from table (see write_snapshot)."""
+    field = table.schema.field(column)
+    if pa.types.is_null(field.type):
+        # e.g. written without records; typed by the values added since
+        values = [v[column] for v in overlay.values() if not _is_null(v[column])]
+        field = field.with_type(pa.array(values).type)
+    return field
+
+
+def _lazy_values(table, field, positions, document_ids, overlay):
+    """Return arrow array of a column copied from table for a batch of rows."""
+    column = table.column(field.name)
+    changed = [j for j, d in enumerate(document_ids) if d in overlay]
+    if not changed and (positions >= 0).all():
+        return column.take(pa.array(positions)).combine_chunks().cast(field.type)
+    mask = positions < 0
+    values = column.take(pa.array(np.where(mask, 0, positions), mask=mask))
+    values = values.to_pylist()
+    for j in changed:
+        value = overlay[document_ids[j]][field.name]
+        values[j] = None if _is_null(value) else value
+    return pa.array(values, type=field.type)
+
+
+def _is_null(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def snapshot_id(table):
+    """Return id of a snapshot table (see write_snapshot); None for older snapshots."""
+    value = (table.schema.metadata or {}).get(SNAPSHOT_ID_KEY)
+    return None if value is None else value.decode()
+
+
+def open_snapshot(path):
+    """Return memory-mapped arrow table; column data is read from disk when used."""
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def snapshot_columns(table, index_field="document_id"):
+    """Return record columns of a snapshot table."""
+    return [name for name in table.column_names if name != index_field]
+
+
+def snapshot_value_bytes(table, column):
+    """Return utf-8 sizes of a snapshot column's values (0 for non-strings).
+
+    Computed from the arrow string offsets, so values aren't read or converted.
+    """
+    values = table.column(column)
+    if not (pa.types.is_string(values.type) or pa.types.is_large_string(values.type)):
+        return np.zeros(len(values), dtype=np.int64)
+    return pc.binary_length(values).fill_null(0).to_numpy()
+
+
+def arrow_to_py(value):
+    """Convert arrow scalar to a record value (nulls as NaN, as in pandas)."""
+    value = value.as_py()
+    return np.nan if value is None else value
+
+
+def _column_values(column, dtype):
+    """Convert an arrow column to pandas values."""
+    if pa.types.is_list(column.type) or pa.types.is_null(column.type):
+        # lists stay python lists; nulls mirror pandas' NaN fill
+        values = [np.nan if v is None else v for v in column.to_pylist()]
+        return pd.Series(values, dtype=object)
+    values = column.to_pandas()
+    if dtype == "object":
+        values = values.astype(object).where(values.notna(), np.nan)
+    return values
+
+
+def read_snapshot(path, columns=None, index_field="document_id", table=None):
+    """Read a records df (optionally a subset of columns) from a snapshot.
+
+    Arrow snapshots are memory-mapped so only the requested columns are read.
+    """
+    if table is None:
+        if not is_arrow(path):
+            df = pd.read_pickle(path)
+            return df if columns is None else df[list(columns)]
+        table = open_snapshot(path)
+
+    dtypes = json.loads(table.schema.metadata.get(DTYPES_KEY, b"{}"))
+    if columns is None:
+        columns = snapshot_columns(table, index_field)
+
+    index = pd.Index(table.column(index_field).to_pylist(), name=index_field)
+    data = {}
+    for col in columns:
+        values = _column_values(table.column(col), dtypes.get(col, "object"))
+        if col == "document_type":
+            values = values.map(DOCTYPES.get)
+        data[col] = values.values
+    return pd.DataFrame(data, index=index, columns=list(columns))
+
+
+class RecordLog(object):
+    """Append-only log of (op, document_id, record) entries.
+
+    op is "upsert" (record is the record dict) or "remove" (record is None).
+    """
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.n_entries = 0
+        self._fp = None
+
+    def __repr__(self):
+        return f"RecordLog({self.path}, n_entries={self.n_entries})"
+
+    def replay(self):
+        """Yield log entries; discard a torn entry at the end of the log."""
+        self.n_entries = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as fp:
+            data = fp.read()
+
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            length, crc = HEADER.unpack_from(data, offset)
+            start = offset + HEADER.size
+            payload = data[start : start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset = start + length
+            self.n_entries += 1
+            yield pickle.loads(payload)
+
+        if offset < len(data):
+            n_torn = len(data) - offset
+            logger.warning(f"discarding {n_torn} bytes of torn entry in {self.path}")
+            with open(self.path, "r+b") as fp:
+                fp.truncate(offset)
+
+    def append(self, op, document_id, record=None):
+        """Append an entry; flushed to the OS (and fsynced if self.fsync)."""
+        payload = pickle.dumps((op, document_id, record))
+        if self._fp is None:
+            self._fp = open(self.path, "ab")
+        self._fp.write(HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._fp.flush()
+        if self.fsync:
+            os.fsync(self._fp.fileno())
+        self.n_entries += 1
+
+    def truncate(self):
+        """Empty the log, e.g. after its entries are written to a snapshot."""
+        self.close()
+        with open(self.path, "wb"):
+            pass
+        self.n_entries = 0
+
+    def offset(self):
+        """Return size (bytes) of the entries appended so far."""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def drop_head(self, offset, n_entries):
+        """Remove the first n_entries (offset bytes), e.g. written to a snapshot while
+        later entries were appended.  The log is replaced atomically.
+        """
+        self.close()
+        with open(self.path, "rb") as fp:
+            fp.seek(offset)
+            tail = fp.read()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            fp.write(tail)
+        os.replace(tmp_path, self.path)
+        self.n_entries -= n_entries
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def remove(self):
+        """Remove log file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
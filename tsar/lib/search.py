@@ -2,8 +2,11 @@
 Elasticsearch server, client classes.
 """
 import subprocess
+import threading
 import time
 import os
+import json
+import logging
 import requests
 import pandas as pd
 from requests.exceptions import ConnectionError, HTTPError
@@ -17,6 +20,23 @@ BASE_URL = f"http://{HOST}:{ELASTICSEARCH_PORT}"
 
 ELASTICSEARCH_PATH = "/usr/local/bin/elasticsearch"
 SERVER_FILE = os.path.join(REPO_PATH, "server.txt")
+# server readiness: cluster health polled with exponential backoff, up to a timeout
+SERVER_START_TIMEOUT = 120
+SERVER_POLL_SECONDS = 0.1
+SERVER_POLL_MAX_SECONDS = 2.0
+SERVER_READY_STATUSES = ("yellow", "green")
+
+# bulk api defaults: batches are cut at whichever limit is reached first.
+BULK_BATCH_SIZE = 500
+BULK_MAX_BYTES = 5 * 1024 * 1024
+BULK_MAX_RETRIES = 3
+BULK_BACKOFF_SECONDS = 0.5
+# item/request statuses that indicate a rejection that is worth retrying
+BULK_RETRY_STATUSES = (429, 503)
+# collection indices are versions `{name}_v{N}`, searched and written through an alias
+VERSION_SEP = "_v"
+
+logger = logging.getLogger(__name__)
 
 
 def return_index_name(collection_name, doc_type_str, sep="__"):
@@ -25,6 +45,20 @@ def return_index_name(collection_name, doc_type_str, sep="__"):
     return index_name
 
 
+def versioned_index_name(index_name, version, sep=VERSION_SEP):
+    """Return name of version N of an index."""
+    return f"{index_name}{sep}{version}"
+
+
+def index_version(versioned_name, index_name, sep=VERSION_SEP):
+    """Return N if versioned_name is `{index_name}_v{N}`, else None."""
+    prefix = f"{index_name}{sep}"
+    suffix = versioned_name[len(prefix) :]
+    if versioned_name.startswith(prefix) and suffix.isdigit():
+        return int(suffix)
+    return None
+
+
 def encode_url_str(raw_url_string):
     """Standard substitutions for url strings.
 
@@ -34,32 +68,115 @@ def encode_url_str(raw_url_string):
     return quoted_url_string
 
 
+def gen_bulk_lines(action):
+    """Return NDJSON lines for a bulk action (op_type, index_name, document_id, source).
+
+    op_type is "index" or "delete"; source is ignored for deletes.
+    """
+    op_type, index_name, document_id, source = action
+    lines = json.dumps({op_type: {"_index": index_name, "_id": document_id}}) + "\n"
+    if op_type != "delete":
+        lines += json.dumps(source) + "\n"
+    return lines
+
+
+def gen_bulk_batches(
+    actions, batch_size=BULK_BATCH_SIZE, max_bytes=BULK_MAX_BYTES,
+):
+    """Yield (actions, ndjson_body) batches limited by action count and body bytes.
+
+    A single action larger than max_bytes is sent in a batch of its own.
+    """
+    batch, body, n_bytes = [], [], 0
+    for action in actions:
+        lines = gen_bulk_lines(action)
+        line_bytes = len(lines.encode())
+        if batch and (len(batch) >= batch_size or n_bytes + line_bytes > max_bytes):
+            yield batch, "".join(body)
+            batch, body, n_bytes = [], [], 0
+        batch.append(action)
+        body.append(lines)
+        n_bytes += line_bytes
+    if batch:
+        yield batch, "".join(body)
+
+
 class Server(object):
-    """ElasticSearch Server. """
+    """ElasticSearch Server, started lazily.
+
+    `start_background` starts the server (if not running) in a thread, so callers
+    (app, REST server) aren't blocked; clients created with `server` wait for it on
+    their first request (see `wait_ready`).
+    """
 
     def __init__(
-        self, server_file=SERVER_FILE,
+        self, server_file=SERVER_FILE, timeout=SERVER_START_TIMEOUT,
     ):
         self.server_file = server_file
+        self.timeout = timeout
+        self._ready = False
+        self._error = None
+        self._thread = None
+        self._lock = threading.Lock()
 
-    def start(self, timeout=5):
-        """Start elasticsearch server if not running.
+    @property
+    def ready(self):
+        return self._ready
+
+    def start(self, timeout=None):
+        """Start elasticsearch server if not running; return once the cluster is up.
 
-        timeout is used for when a connection but hasn't finished initializing the indexes.  It would
-        be preferable to check the health of the nodes.
+        Raises TimeoutError if the cluster isn't healthy (yellow or green) within
+        timeout seconds.
         """
+        timeout = self.timeout if timeout is None else timeout
         client = Client()
-        if client.test_connection():
+        if client.cluster_health() in SERVER_READY_STATUSES:
             return
-        else:
+        if not client.test_connection():
             _ = subprocess.run(
                 "service elasticsearch start".split(), capture_output=False
             )
-            while True:
-                res = client.test_connection()
-                if res:
-                    time.sleep(timeout)
-                    return
+        deadline = time.monotonic() + timeout
+        delay = SERVER_POLL_SECONDS
+        while client.cluster_health() not in SERVER_READY_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"elasticsearch not ready after {timeout}s")
+            time.sleep(min(delay, remaining))
+            delay = min(2 * delay, SERVER_POLL_MAX_SECONDS)
+
+    def _start(self):
+        try:
+            self.start()
+        except Exception as e:
+            logger.exception("elasticsearch server failed to start")
+            self._error = e
+
+    def start_background(self):
+        """Start the server in a thread (once); return the thread."""
+        with self._lock:
+            if self._thread is None:
+                self._error = None
+                self._thread = threading.Thread(
+                    target=self._start, name="elasticsearch-start", daemon=True
+                )
+                self._thread.start()
+            return self._thread
+
+    def wait_ready(self):
+        """Block until the server is started, starting it if needed.
+
+        Re-raises the start error (e.g. TimeoutError); the next call starts again.
+        """
+        if self._ready:
+            return
+        self.start_background().join()
+        with self._lock:
+            if self._error is not None:
+                self._thread = None
+                raise self._error
+            self._ready = True
 
     def stop(self):
         """shutdown service."""
@@ -73,11 +190,26 @@ class Server(object):
 class Client(object):
     """Elasticsearch client used by tsar, uses rest API."""
 
-    def __init__(self, host=HOST, port=ELASTICSEARCH_PORT):
-        self.session = requests.Session()
+    def __init__(self, host=HOST, port=ELASTICSEARCH_PORT, server=None):
+        self._session = requests.Session()
+        # requests wait for the server to be ready, if given
+        self.server = server
         self.host = host
         self.port = port
         self.base_url = f"http://{host}:{port}"
+        # {index or alias: mapped fields}; cleared when indices/aliases change, or
+        # records with new fields are indexed (dynamic mapping)
+        self._fields = {}
+
+    @property
+    def session(self):
+        if self.server is not None:
+            self.server.wait_ready()
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
 
     @property
     def summary(self):
@@ -100,6 +232,7 @@ class Client(object):
         url = f"{self.base_url}/{index_name}/_doc/{encoded_id}"
         res = self.session.put(url, json=record_index)
         res.raise_for_status()
+        self._check_fields(index_name, [record_index])
         return res
 
     def return_record_index(self, document_id, collection_name):
@@ -110,16 +243,91 @@ class Client(object):
         res.raise_for_status()
         return res
 
-    def index_records(self, document_ids, document_indexes, collection_name):
-        """Index a list of records.
+    def index_records(self, document_ids, record_indexes, index_name, **bulk_kwargs):
+        """Index a list of records with the bulk api; see Client.bulk for kwargs."""
+        actions = [
+            ("index", index_name, d_id, d_ind)
+            for d_id, d_ind in zip(document_ids, record_indexes)
+        ]
+        return self.bulk(actions, **bulk_kwargs)
+
+    def bulk(
+        self,
+        actions,
+        refresh=None,
+        batch_size=BULK_BATCH_SIZE,
+        max_bytes=BULK_MAX_BYTES,
+        max_retries=BULK_MAX_RETRIES,
+        backoff=BULK_BACKOFF_SECONDS,
+    ):
+        """Send (op_type, index_name, document_id, source) actions with the bulk api.
+
+        - actions are batched as NDJSON by count and byte budget
+        - rejected items (429, full write queue) are retried with exponential backoff
+        - returns summary dict: {"succeeded": int, "failed": {document_id: error}}
 
-        Optimize with bulk api:
-        https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html
+        see: https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html
         """
-        for d_id, d_ind in zip(document_ids, document_indexes):
-            self.index_record(
-                document_id=d_id, document_index=d_ind, collection_name=collection_name
-            )
+        url = f"{self.base_url}/_bulk"
+        params = {} if refresh is None else {"refresh": str(refresh).lower()}
+        headers = {"Content-Type": "application/x-ndjson"}
+        summary = {"succeeded": 0, "failed": {}}
+
+        for batch, body in gen_bulk_batches(actions, batch_size, max_bytes):
+            sent = batch
+            for attempt in range(max_retries + 1):
+                res = self.session.post(
+                    url, data=body.encode(), params=params, headers=headers
+                )
+                if res.status_code in BULK_RETRY_STATUSES:
+                    retry_actions = batch
+                    errors = {a[2]: f"bulk rejected: {res.status_code}" for a in batch}
+                else:
+                    res.raise_for_status()
+                    retry_actions, errors = [], {}
+                    for action, item in zip(batch, res.json()["items"]):
+                        result = next(iter(item.values()))
+                        status = result.get("status", 500)
+                        # deleting a missing document is not a failure
+                        if status < 300 or (action[0] == "delete" and status == 404):
+                            summary["succeeded"] += 1
+                        elif status in BULK_RETRY_STATUSES:
+                            retry_actions.append(action)
+                            errors[action[2]] = result.get("error")
+                        else:
+                            summary["failed"][action[2]] = result.get("error")
+                if not retry_actions:
+                    break
+                if attempt == max_retries:
+                    summary["failed"].update(errors)
+                    break
+                time.sleep(backoff * 2 ** attempt)
+                batch = retry_actions
+                body = "".join(gen_bulk_lines(a) for a in batch)
+            sources = {}
+            for op_type, index_name, _, source in sent:
+                if op_type != "delete":
+                    sources.setdefault(index_name, []).append(source)
+            for index_name, index_sources in sources.items():
+                self._check_fields(index_name, index_sources)
+
+        for document_id, error in summary["failed"].items():
+            logger.error(f"bulk action failed for {document_id}: {error}")
+        return summary
+
+    def set_refresh_interval(self, index_name, interval):
+        """Set index refresh interval; "-1" disables refresh, None restores default."""
+        url = f"{self.base_url}/{index_name}/_settings"
+        res = self.session.put(url, json={"index": {"refresh_interval": interval}})
+        res.raise_for_status()
+        return res
+
+    def refresh(self, index_name):
+        """Make recent index operations visible to search."""
+        url = f"{self.base_url}/{index_name}/_refresh"
+        res = self.session.post(url)
+        res.raise_for_status()
+        return res
 
     def delete_record(self, document_id, index_name):
         """Remove record from index."""
@@ -130,10 +338,24 @@ class Client(object):
         return res
 
     def query(
-        self, index_list, query_str="*", default_fields="*", num_results=20,
+        self,
+        index_list,
+        query_str="*",
+        default_fields="*",
+        num_results=20,
+        filters=None,
+        sort=None,
+        search_after=None,
     ):
         """Basic query using the lucene search syntax.
 
+        - filters: query clauses results must match, not affecting scores
+        - sort, search_after: results sorted by sort, after the sort values of the
+            last hit of the previous page
+
+        search_after:
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html
+
         multi-index query:
         https://www.elastic.co/guide/en/elasticsearch/reference/current/multi-index.html
 
@@ -142,16 +364,23 @@ class Client(object):
         """
         index_str = ",".join(index_list)
         url = f"{self.base_url}/{index_str}/_search"
-        json_params = {
-            "query": {
-                "query_string": {
-                    "query": query_str,
-                    "default_field": default_fields,
-                    "analyze_wildcard": "true",
-                },
+        query = {
+            "query_string": {
+                "query": query_str,
+                "default_field": default_fields,
+                "analyze_wildcard": "true",
             },
+        }
+        if filters:
+            query = {"bool": {"must": query, "filter": filters}}
+        json_params = {
+            "query": query,
             "size": str(num_results),
         }
+        if sort is not None:
+            json_params["sort"] = sort
+        if search_after is not None:
+            json_params["search_after"] = list(search_after)
         try:
             res = self.session.get(url, json=json_params)
             results = res.json()
@@ -161,18 +390,95 @@ class Client(object):
 
     def new_index(self, index_name, mapping):
         """Crate elasticsearch index by name."""
+        self.invalidate_fields()
         url = f"{self.base_url}/{index_name}"
         res = self.session.put(url, json=mapping)
         res.raise_for_status()
         return res
 
     def drop_index(self, index_name):
-        """Delete an index by name."""
-        url = f"{self.base_url}/{index_name}"
+        """Delete an index by name; for an alias, the indices it points to.
+
+        Wildcards match both aliases and index names.
+        """
+        self.invalidate_fields()
+        indices = list(self.return_aliases(index_name))
+        if "*" in index_name or not indices:
+            indices.append(index_name)
+        url = f"{self.base_url}/{','.join(indices)}"
         res = self.session.delete(url)
         res.raise_for_status()
         return res
 
+    def return_aliases(self, alias):
+        """Return {index: [aliases]} of indices with an alias matching alias."""
+        res = self.session.get(f"{self.base_url}/_alias/{alias}")
+        if res.status_code == 404:
+            return {}
+        res.raise_for_status()
+        return {index: list(value["aliases"]) for index, value in res.json().items()}
+
+    def update_aliases(self, actions):
+        """Apply alias actions (add, remove, remove_index) atomically."""
+        self.invalidate_fields()
+        url = f"{self.base_url}/_aliases"
+        res = self.session.post(url, json={"actions": actions})
+        res.raise_for_status()
+        return res
+
+    def return_index_aliases(self, index_name):
+        """Return {index: [aliases]} of indices named index_name (wildcards allowed)."""
+        res = self.session.get(f"{self.base_url}/{index_name}/_alias")
+        if res.status_code == 404:
+            return {}
+        res.raise_for_status()
+        return {index: list(value["aliases"]) for index, value in res.json().items()}
+
+    def index_versions(self, index_name):
+        """Return {N: [aliases]} of the versioned indices `{index_name}_v{N}`."""
+        indices = self.return_index_aliases(versioned_index_name(index_name, "*"))
+        versions = {}
+        for versioned_name, aliases in indices.items():
+            version = index_version(versioned_name, index_name)
+            if version is not None:
+                versions[version] = aliases
+        return versions
+
+    def new_index_version(self, index_name, mapping, alias=None):
+        """Create the next version of index_name, optionally with alias; return it."""
+        version = max(self.index_versions(index_name), default=0) + 1
+        versioned_name = versioned_index_name(index_name, version)
+        if alias is not None:
+            mapping = {**mapping, "aliases": {alias: {}}}
+        self.new_index(versioned_name, mapping)
+        return versioned_name
+
+    def swap_alias(self, alias, index_name):
+        """Point alias at index_name only, atomically; return indices it pointed to.
+
+        An unversioned (legacy) index named alias is deleted in the same step.
+        """
+        old_indices = [i for i in self.return_aliases(alias) if i != index_name]
+        actions = [{"add": {"index": index_name, "alias": alias}}]
+        actions += [{"remove": {"index": i, "alias": alias}} for i in old_indices]
+        if not old_indices and self.index_exists(alias):
+            actions.append({"remove_index": {"index": alias}})
+        self.update_aliases(actions)
+        return old_indices
+
+    def drop_old_versions(self, index_name):
+        """Delete versions of index_name that no alias points to; return their names."""
+        unused = [
+            versioned_index_name(index_name, version)
+            for version, aliases in self.index_versions(index_name).items()
+            if not aliases
+        ]
+        if unused:
+            self.invalidate_fields()
+            res = self.session.delete(f"{self.base_url}/{','.join(unused)}")
+            res.raise_for_status()
+        return unused
+
     def return_index(self, index_name):
         """Return index info for collection."""
         url = f"{self.base_url}/{index_name}?pretty"
@@ -183,7 +489,7 @@ class Client(object):
     def index_exists(self, index_name):
         """Return True if index_name exists."""
         url = f"{self.base_url}/{index_name}"
-        res = requests.head(url)
+        res = self.session.head(url)
         if res.status_code == 200:
             return True
         elif res.status_code == 404:
@@ -193,11 +499,22 @@ class Client(object):
 
     def rename_index(self, index_name, new_index_name):
         """Rename an index.
+
+        An alias is moved to new_index_name in one (atomic) alias update.  Otherwise:
         see: https://stackoverflow.com/questions/28626803/how-to-rename-an-index-in-a-cluster
         - make index writable
         - clone original to new
         - delete original
         """
+        indices = list(self.return_aliases(index_name))
+        if indices:
+            actions = []
+            for index in indices:
+                actions.append({"remove": {"index": index, "alias": index_name}})
+                actions.append({"add": {"index": index, "alias": new_index_name}})
+            return self.update_aliases(actions)
+
+        self.invalidate_fields()
         url_writeable = f"{self.base_url}/{index_name}/_settings"
         self.session.put(
             url=url_writeable, json={"settings": {"index.blocks.write": True,}}
@@ -218,13 +535,48 @@ class Client(object):
         return mapping
 
     def return_fields(self, collection_name):
-        """Return fields, types for an index.
+        """Return fields, types for an index (cached).
 
         Use pd.DataFrame.from_dict(properties)
         """
+        properties = self._fields.get(collection_name)
+        if properties is None:
+            properties = self._read_fields(collection_name)
+            self._fields[collection_name] = properties
+        return properties
+
+    def load_fields(self, index_names):
+        """Read fields of indices into the cache."""
+        for index_name in index_names:
+            self.return_fields(index_name)
+
+    def merged_fields(self, index_names):
+        """Return sorted field names of indices, merged."""
+        fields = set()
+        for index_name in index_names:
+            fields.update(self.return_fields(index_name))
+        return sorted(fields)
+
+    def invalidate_fields(self):
+        """Clear cached fields, after indices or aliases change."""
+        self._fields.clear()
+
+    def _check_fields(self, index_name, sources):
+        """Clear cached fields if indexed sources have fields not in the cached mapping.
+
+        Indexing records with new fields updates the (dynamic) mapping.
+        """
+        properties = self._fields.get(index_name)
+        if properties is None:
+            return
+        if any(not set(source) <= set(properties) for source in sources):
+            self.invalidate_fields()
+
+    def _read_fields(self, collection_name):
         mapping = self.return_mapping(collection_name=collection_name)
-        # extract fields, types from mapping:
-        properties = mapping[collection_name]["mappings"]["properties"]
+        # extract fields, types from mapping, keyed by the index an alias points to:
+        index_mapping = mapping.get(collection_name) or next(iter(mapping.values()))
+        properties = index_mapping["mappings"]["properties"]
         return properties
 
     def test_connection(self):
@@ -236,3 +588,12 @@ class Client(object):
         except ConnectionError:
             connection_status = False
         return connection_status
+
+    def cluster_health(self):
+        """Return cluster health status (green, yellow, red), None if unreachable."""
+        try:
+            res = self.session.get(self.base_url + "/_cluster/health")
+            res.raise_for_status()
+        except (ConnectionError, HTTPError):
+            return None
+        return res.json()["status"]
@@ -7,15 +7,33 @@
 from functools import partial
 import inspect
 import json
+import logging
 import sys
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 import time
 import os
 import importlib
-from tsar import tasks
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+from tsar import tasks, LOG_FOLDER
+from tsar.config import WATCH_POLLING
+from tsar.lib import parse_lib
 from tsar.tasks import bind_func
 
+# seconds without new events before changes are applied
+DEBOUNCE_SECONDS = 0.2
+# max seconds changes wait while events keep arriving
+MAX_DELAY_SECONDS = 1.0
+# doc types whose (folder) sources are watched: {doc_type: default extensions}
+WATCHED_DOCTYPES = {"MarkdownDoc": [".md"]}
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "services.log"))
+logger.addHandler(handler)
+
 
 class TaskManager(object):
     def __init__(self, collection, scheduler=None):
@@ -69,6 +87,8 @@ class TaskManager(object):
         task_func = bind_func(
             self.collection, func, *task["func_args"], **task["func_kwargs"]
         )
+        # applied by the collection's writer, in order with other changes
+        task_func = partial(self.collection.writer.call, task_func)
         self.scheduler.add_job(
             id=task_id,
             name=func.__name__,
@@ -90,6 +110,7 @@ class TaskManager(object):
         """Add task to task config dict.  All arguments must be serializable."""
         # record is constructed from passed arguments.
         task_func = bind_func(self.collection, func, *func_args, **func_kwargs)
+        task_func = partial(self.collection.writer.call, task_func)
         job = self.scheduler.add_job(
             name=func.__name__,
             func=task_func,
@@ -115,3 +136,197 @@ class TaskManager(object):
         """Modify in place so it stays bound with collection config."""
         self.scheduler.remove_all_jobs()
         self.tasks.clear()
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward file system events to a FolderWatcher."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        if event.is_directory and event.event_type in ("modified", "closed"):
+            return
+        self.watcher.add_event(event.src_path, event.is_directory)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.add_event(dest_path, event.is_directory)
+
+
+class FolderWatcher(object):
+    """Watch folders of a collection's sources, and sync changed documents.
+
+    Events are debounced and coalesced per path: changes are applied once no events
+    arrived for `debounce` seconds (or after `max_delay`), as one
+    Collection.sync_documents call per source.  File state is read when changes are
+    applied, so e.g. a file created then deleted is a no-op.  Uses inotify (via
+    watchdog) where available, else (or with polling=True) polls.
+    """
+
+    def __init__(
+        self,
+        collection,
+        debounce=DEBOUNCE_SECONDS,
+        max_delay=MAX_DELAY_SECONDS,
+        polling=WATCH_POLLING,
+    ):
+        self.collection = collection
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.polling = polling
+        # watched folder -> (doc_type, source_id, extensions)
+        self.sources = {}
+        self.observer = None
+        self._pending = {}
+        self._first_event = None
+        self._last_event = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def watch_sources(self):
+        """Watch folder sources recorded in the collection config; return folders."""
+        for source in self.collection.configd.get("sources", []):
+            self.watch_source(source)
+        return list(self.sources)
+
+    def watch_source(self, source):
+        """Watch a collection config source (see Collection._add_source), if a folder
+        of a watched doc type.
+        """
+        if source["doc_type"] not in WATCHED_DOCTYPES:
+            return
+        extensions = source["kwargs"].get(
+            "extensions", WATCHED_DOCTYPES[source["doc_type"]]
+        )
+        self.watch(source["doc_type"], source["source_id"], extensions)
+
+    def watch(self, doc_type, source_id, extensions):
+        """Watch a (locally visible) folder source."""
+        folder = parse_lib.resolve_path(source_id)
+        if not os.path.isdir(folder):
+            logger.warning(f"not watching {source_id}: not a local folder")
+            return
+        is_new = folder not in self.sources
+        self.sources[folder] = (doc_type, source_id, extensions)
+        if is_new and self.observer is not None:
+            self.observer.schedule(_EventHandler(self), folder, recursive=True)
+
+    def start(self):
+        """Start observing watched folders, and the thread applying changes."""
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="tsar-watcher", daemon=True
+        )
+        self._thread.start()
+        try:
+            observer_cls = PollingObserver if self.polling else Observer
+            self.observer = self._start_observer(observer_cls)
+        except OSError:
+            # e.g. inotify watch limit reached
+            logger.exception("inotify unavailable; polling for changes")
+            self.observer = self._start_observer(PollingObserver)
+
+    def _start_observer(self, observer_cls):
+        observer = observer_cls()
+        for folder in self.sources:
+            observer.schedule(_EventHandler(self), folder, recursive=True)
+        observer.start()
+        return observer
+
+    def stop(self):
+        """Stop observing, then apply pending changes."""
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_event(self, path, is_directory=False):
+        """Queue a changed path (file or directory)."""
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            self._pending[path] = self._pending.get(path, False) or is_directory
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                while not self._stopped:
+                    apply_at = min(
+                        self._last_event + self.debounce,
+                        self._first_event + self.max_delay,
+                    )
+                    wait = apply_at - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                pending, self._pending = self._pending, {}
+                stopped = self._stopped
+            if pending:
+                try:
+                    # applied by the collection's writer, in order with other changes
+                    self.collection.writer.call(self.apply, pending)
+                except Exception:
+                    logger.exception("failed to apply file changes")
+            if stopped:
+                return
+
+    def _source(self, path):
+        """Return watched folder containing path (innermost), else None."""
+        folders = [
+            folder
+            for folder in self.sources
+            if path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+        ]
+        return max(folders, key=len) if folders else None
+
+    def apply(self, pending):
+        """Sync documents for {path: is_directory} changes; return summaries."""
+        changes = {}
+        for path, is_directory in pending.items():
+            folder = self._source(path)
+            if folder is None:
+                continue
+            doc_type, source_id, extensions = self.sources[folder]
+            metas, removed = changes.setdefault(folder, ({}, set()))
+            manifest = self.collection.source_manifest(doc_type, source_id)
+            # documents added without a manifest (add_from_source) are in the index
+            index = self.collection.records_db.index
+            if is_directory:
+                prefix = path.rstrip(os.sep) + os.sep
+                removed.update(d for d in manifest.entries if d.startswith(prefix))
+                removed.update(d for d in index if d.startswith(prefix))
+                if os.path.isdir(path):
+                    metas.update(
+                        parse_lib.return_files_meta(path, extensions=extensions)
+                    )
+            elif os.path.splitext(path)[-1] in extensions:
+                if os.path.isfile(path):
+                    metas[path] = parse_lib.file_meta_data(path)
+                elif path in manifest.entries or path in index:
+                    removed.add(path)
+
+        summaries = {}
+        for folder, (metas, removed) in changes.items():
+            doc_type, source_id, _ = self.sources[folder]
+            removed = removed - set(metas)
+            if not metas and not removed:
+                continue
+            summaries[folder] = self.collection.sync_documents(
+                doc_type, source_id, metas, removed=removed
+            )
+            logger.info(f"synced changes in {folder}: {summaries[folder]}")
+        return summaries
@@ -0,0 +1,137 @@
+"""
+Collection statistics, maintained incrementally as records are added and removed.
+
+Counts per doctype, the distribution of link counts (a histogram, so its median and
+mean cost O(distinct counts)) and total content bytes.  Statistics are persisted as
+json next to the collection records.
+"""
+import json
+import os
+
+STATS_NAME = "stats.json"
+
+
+def content_bytes(content):
+    """Return utf-8 size of (string) document content."""
+    if not isinstance(content, str):
+        return 0
+    return len(content.encode())
+
+
+def record_stats(record):
+    """Return (doctype name, link count, content bytes) of a record.
+
+    Records without content may give its size as content_bytes (see Data.value_bytes).
+    """
+    doc_type = record["document_type"]
+    doc_type_name = doc_type if isinstance(doc_type, str) else doc_type.__name__
+    links = record["links"]
+    n_links = 0 if links is None else len(links)
+    if "content" in record:
+        n_bytes = content_bytes(record["content"])
+    else:
+        n_bytes = record["content_bytes"]
+    return doc_type_name, n_links, n_bytes
+
+
+class CollectionStats(object):
+    """Document counts, link count distribution and content size of a collection."""
+
+    def __init__(
+        self, doc_type_counts=None, link_counts=None, content_bytes=0, position=None
+    ):
+        # {doctype name: documents}
+        self.doc_type_counts = doc_type_counts or {}
+        # {links per document: documents}
+        self.link_counts = link_counts or {}
+        self.content_bytes = content_bytes
+        # (json) position of the records described when written (see Data.position)
+        self.position = position
+
+    def __repr__(self):
+        return f"CollectionStats(n_docs={self.n_docs})"
+
+    @property
+    def n_docs(self):
+        return sum(self.doc_type_counts.values())
+
+    @classmethod
+    def build(cls, records):
+        """Return stats of records (dicts: document_type, links, content[_bytes])."""
+        stats = cls()
+        for record in records:
+            stats.add(record)
+        return stats
+
+    def _update(self, record, sign):
+        doc_type_name, n_links, n_bytes = record_stats(record)
+        for counts, key in [
+            (self.doc_type_counts, doc_type_name),
+            (self.link_counts, n_links),
+        ]:
+            counts[key] = counts.get(key, 0) + sign
+            if counts[key] <= 0:
+                del counts[key]
+        self.content_bytes += sign * n_bytes
+
+    def add(self, record):
+        self._update(record, 1)
+
+    def remove(self, record):
+        self._update(record, -1)
+
+    def link_count_median(self):
+        n_docs = sum(self.link_counts.values())
+        if not n_docs:
+            return float("nan")
+        # mean of the middle value(s), by position in sorted order
+        middle = [(n_docs - 1) // 2, n_docs // 2]
+        values, seen = [], 0
+        for n_links in sorted(self.link_counts):
+            seen += self.link_counts[n_links]
+            values += [n_links for position in middle if seen - 1 >= position]
+            middle = [position for position in middle if seen - 1 < position]
+        return sum(values) / len(values)
+
+    def link_count_mean(self):
+        n_docs = sum(self.link_counts.values())
+        if not n_docs:
+            return float("nan")
+        return sum(k * v for k, v in self.link_counts.items()) / n_docs
+
+    def summary(self):
+        """Return stats as a json serializable dict."""
+        summary = {
+            "n_docs": self.n_docs,
+            "doc_types_count": dict(self.doc_type_counts),
+            "link_count_median": self.link_count_median(),
+            "link_count_mean": self.link_count_mean(),
+            "content_bytes": self.content_bytes,
+        }
+        return summary
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "r") as fp:
+            data = json.load(fp)
+        link_counts = {int(k): v for k, v in data["link_counts"].items()}
+        stats = cls(
+            data["doc_type_counts"],
+            link_counts,
+            data["content_bytes"],
+            position=data.get("position"),
+        )
+        return stats
+
+    def write(self, path):
+        """Write stats (atomically) to path."""
+        data = {
+            "doc_type_counts": self.doc_type_counts,
+            "link_counts": self.link_counts,
+            "content_bytes": self.content_bytes,
+            "position": self.position,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(data, fp)
+        os.replace(tmp_path, path)
@@ -0,0 +1,152 @@
+"""
+Single writer for collection changes made from several threads (REST server,
+scheduled tasks, folder watchers, the app).
+
+Changes are submitted as commands to a queue and applied, in order, by one writer
+thread per collection.  Commands queued together are applied as a batch: their search
+index actions are sent in one bulk request, and the collection summary is persisted
+once.  Readers don't wait for queued commands: the writer holds the collection lock
+(Collection.lock) only while it changes a document, not while index batches are sent
+or snapshots written, so queries, previews and the summary stay responsive during
+long ingests and never see a document half committed.
+"""
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from tsar import LOG_FOLDER
+
+# commands applied per batch, at most
+WRITER_BATCH_SIZE = 64
+
+logger = logging.getLogger(__name__)
+handler = logging.FileHandler(os.path.join(LOG_FOLDER, "writer.log"))
+logger.addHandler(handler)
+
+
+class CollectionWriter(object):
+    """Command queue applied to a collection by one thread; see module docstring."""
+
+    def __init__(self, collection, batch_size=WRITER_BATCH_SIZE):
+        self.collection = collection
+        self.batch_size = batch_size
+        # set by stop: no commands are accepted afterwards
+        self.closed = False
+        self._queue = queue.Queue()
+        self._thread = None
+        # commands submitted and not yet applied
+        self._n_pending = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"CollectionWriter({self.collection.collection_id})"
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def current(self):
+        """True if called from the writer thread (e.g. by a command)."""
+        return threading.current_thread() is self._thread
+
+    @property
+    def busy(self):
+        """True while commands are queued or being applied."""
+        return self._n_pending > 0
+
+    def start(self):
+        """Start the writer thread (if not running)."""
+        with self._lock:
+            self._start()
+
+    def _start(self):
+        if self.closed:
+            raise RuntimeError(f"{self} is stopped")
+        if not self.running:
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"tsar-writer-{self.collection.collection_id}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        """Apply queued commands, then stop the writer thread; later submits raise."""
+        with self._lock:
+            self.closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._thread = None
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs); return a Future of its result.
+
+        Raises RuntimeError once the writer is stopped (e.g. the collection closed).
+        """
+        future = Future()
+        with self._lock:
+            self._start()
+            self._n_pending += 1
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """Queue func and wait for its result (called directly on the writer thread)."""
+        if self.current:
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def _next_batch(self):
+        """Wait for a command; return it with the commands queued behind it."""
+        commands = [self._queue.get()]
+        while len(commands) < self.batch_size:
+            try:
+                commands.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return commands
+
+    def _run(self):
+        while True:
+            commands = self._next_batch()
+            stopped = None in commands
+            commands = [command for command in commands if command is not None]
+            running = [
+                command
+                for command in commands
+                if command[0].set_running_or_notify_cancel()
+            ]
+            results = self._apply(running) if running else []
+            with self._lock:
+                self._n_pending -= len(commands)
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            if stopped:
+                return
+
+    def _apply(self, commands):
+        """Apply a batch of commands; return (future, result, error) once indexed."""
+        results = []
+        try:
+            with self.collection.bulk_indexing(refresh=True):
+                for future, func, args, kwargs in commands:
+                    try:
+                        results.append((future, func(*args, **kwargs), None))
+                    except Exception as e:
+                        logger.exception(f"command {func} failed")
+                        results.append((future, None, e))
+            if self.collection.registered:
+                self.collection.commit()
+        except Exception as e:
+            logger.exception(f"failed to commit {len(commands)} commands")
+            results = [(future, None, e) for future, *_ in commands]
+        return results
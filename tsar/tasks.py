@@ -32,3 +32,15 @@ def add_source(collection, doc_type, source_id, *source_args, **source_kwargs):
         *source_args,
         **source_kwargs,
     )
+
+
+def sync_source(collection, doc_type, source_id, *source_args, **source_kwargs):
+    """Incrementally sync source with collection; see Collection.sync_from_source."""
+    source_id = DOCTYPES[doc_type].resolve_source_id(source_id)
+    Collection.sync_from_source(
+        collection,
+        doc_type=doc_type,
+        source_id=source_id,
+        *source_args,
+        **source_kwargs,
+    )